@@ -0,0 +1,4 @@
+"""
+Benchmarks for the salary calculator, run from the repository root with
+`python -m benchmarks.run_benchmarks`.
+"""
@@ -0,0 +1,175 @@
+"""
+Load test for the payroll service, entirely on localhost.
+
+    python -m benchmarks.load_test --requests 5000 --concurrency 50
+    python -m benchmarks.load_test --port 8765 --shifts-per-request 20
+
+Without --port a service is started in this process on a free port. Every simulated
+client keeps one connection open and sends its requests one after another. The
+report has the throughput and the latency percentiles, and how many batches the
+service calculated the requests in.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from payroll_client import DEFAULT_HOST
+from payroll_service import PayrollService
+
+PERCENTILES = (50, 90, 99)
+
+
+
+def random_shifts(rng, count):
+    """
+    Random shift dicts like the ones the service takes.
+    """
+    shifts = []
+    for _ in range(count):
+        start = rng.randrange(0, 1440, 15)
+        length = rng.choice((240, 360, 480, 600, 720))
+        shifts.append({
+            'date': str(date(2024, 1, 1) + timedelta(days=rng.randrange(366))),
+            'start': f"{start // 60:02d}:{start % 60:02d}",
+            'end': f"{(start + length) % 1440 // 60:02d}:{(start + length) % 60:02d}",
+            'control_room': rng.random() < 0.3,
+        })
+    return shifts
+
+
+
+def start_local_service():
+    """
+    Run a PayrollService on a free port on a background thread, returns the port.
+    """
+    ready = threading.Event()
+    port = []
+
+    def run():
+        async def main():
+            server = await PayrollService().start(DEFAULT_HOST, 0)
+            port.append(server.sockets[0].getsockname()[1])
+            ready.set()
+            await server.serve_forever()
+        asyncio.run(main())
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return port[0]
+
+
+
+async def _request(reader, writer, method, path, payload=None):
+    body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {DEFAULT_HOST}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    response = await reader.readexactly(length)
+    return int(status_line.split()[1]), json.loads(response)
+
+
+
+async def _client(host, port, payloads, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for payload in payloads:
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, 'POST', '/calculate', payload)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+
+async def run_load_test(host, port, requests, concurrency, shifts_per_request, seed=0):
+    """
+    Send the requests from concurrency clients and return the results as a dict.
+    """
+    rng = random.Random(seed)
+    payloads = [{'shifts': random_shifts(rng, shifts_per_request)} for _ in range(requests)]
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, before = await _request(reader, writer, 'GET', '/health')
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, payloads[client::concurrency], latencies, errors) for client in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    _, after = await _request(reader, writer, 'GET', '/health')
+    writer.close()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'shifts_per_request': shifts_per_request,
+        'errors': len(errors),
+        'seconds': elapsed,
+        'requests_per_second': requests / elapsed,
+        'shifts_per_second': requests * shifts_per_request / elapsed,
+        'batches': after['batches'] - before['batches'],
+        'latency_ms': {
+            **{f"p{percentile}": float(np.percentile(latencies_ms, percentile)) for percentile in PERCENTILES},
+            'max': float(latencies_ms.max()),
+        },
+    }
+
+
+
+def print_report(result):
+    print(f"{result['requests']} requests of {result['shifts_per_request']} shifts from "
+          f"{result['concurrency']} clients in {result['seconds']:.2f} s, {result['errors']} errors")
+    print(f"  {result['requests_per_second']:.0f} requests/s, {result['shifts_per_second']:.0f} shifts/s, "
+          f"{result['batches']} batches")
+    print("  latency " + ', '.join(f"{name} {value:.2f} ms" for name, value in result['latency_ms'].items()))
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the payroll service')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, help='port of a running service (default: start one in this process)')
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    parser.add_argument('-c', '--concurrency', type=int, default=50)
+    parser.add_argument('-s', '--shifts-per-request', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    port = args.port or start_local_service()
+    result = asyncio.run(run_load_test(args.host, port, args.requests, args.concurrency,
+                                       args.shifts_per_request, args.seed))
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    return 1 if result['errors'] else 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Time the pay pipeline stage by stage on synthetic workbooks.
+
+    python -m benchmarks.run_benchmarks --sizes 1k,100k --output bench_results.json
+    python -m benchmarks.run_benchmarks --compare bench_results.json
+
+Stages:
+- parse: read the workbook into ShiftRecords
+- normalize: build the ShiftTable from the records
+- calculate: price every shift
+- total: read the pay and hours totals
+The results are written as JSON, and --compare prints the change against an earlier run.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.workbook_generator import GENERATOR_VERSION, generate_workbook, parse_row_count
+from salary_calc import SalaryCalculator
+from shift_reader import iter_shift_records
+from shift_table import ShiftTable
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+STAGES = ['parse', 'normalize', 'calculate', 'total']
+
+
+
+def workbook_for(size, data_dir):
+    """
+    Path of the synthetic workbook with the given number of rows, generated on first use.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"shifts_{size}_v{GENERATOR_VERSION}.xlsx")
+    if not os.path.exists(path):
+        print(f"Generating {path} ...", file=sys.stderr)
+        generate_workbook(path, size)
+    return path
+
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+
+def run_pipeline(path, engine):
+    """
+    Run every stage once and return {stage: seconds} and the number of shifts.
+    """
+    timings = {}
+    timings['parse'], records = _timed(lambda: list(iter_shift_records(path, engine)))
+    timings['normalize'], shifts = _timed(ShiftTable.from_records, records)
+    timings['calculate'], _ = _timed(shifts.calculate, SalaryCalculator())
+    timings['total'], _ = _timed(lambda: (shifts.total_pay(), shifts.total_hours(), shifts.total_travel_charge()))
+    return timings, len(shifts)
+
+
+
+def benchmark_size(size, repeat, engine, data_dir):
+    """
+    Run the pipeline `repeat` times on one workbook and summarize each stage.
+    """
+    path = workbook_for(size, data_dir)
+    runs = []
+    for _ in range(repeat):
+        timings, shift_count = run_pipeline(path, engine)
+        runs.append(timings)
+
+    results = []
+    for stage in STAGES:
+        seconds = [run[stage] for run in runs]
+        results.append({
+            'rows': size,
+            'shifts': shift_count,
+            'stage': stage,
+            'seconds': seconds,
+            'min': min(seconds),
+            'median': statistics.median(seconds),
+            'shifts_per_second': shift_count / min(seconds) if min(seconds) else None,
+        })
+    return results
+
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+
+def environment_info(engine):
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'engine': engine,
+    }
+
+
+
+def compare(results, baseline):
+    """
+    Print each stage's median next to the baseline's, matched by rows and stage.
+    """
+    baseline_medians = {(entry['rows'], entry['stage']): entry['median'] for entry in baseline['results']}
+    print(f"{'rows':>9} {'stage':<10} {'baseline':>10} {'now':>10} {'change':>8}")
+    for entry in results:
+        before = baseline_medians.get((entry['rows'], entry['stage']))
+        if before is None:
+            continue
+        change = (entry['median'] - before) / before * 100 if before else 0.0
+        print(f"{entry['rows']:>9} {entry['stage']:<10} {before:>10.4f} {entry['median']:>10.4f} {change:>+7.1f}%")
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the salary calculator pipeline.')
+    parser.add_argument('--sizes', default='1k,100k', help='comma separated row counts, e.g. 1k,100k,1m')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per size, the median and min are reported')
+    parser.add_argument('--engine', default='auto', help='Excel reader: auto, calamine, openpyxl or pandas')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='where the generated workbooks are kept')
+    parser.add_argument('--output', default='bench_results.json', help='JSON file to write the results to')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in (parse_row_count(size) for size in args.sizes.split(',')):
+        for entry in benchmark_size(size, args.repeat, args.engine, args.data_dir):
+            results.append(entry)
+            print(f"{entry['rows']:>9} rows  {entry['stage']:<10} median {entry['median']:.4f}s  min {entry['min']:.4f}s")
+
+    report = {'environment': environment_info(args.engine), 'results': results}
+
+    # read the baseline first, it may be the file we're about to overwrite
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if baseline is not None:
+        compare(results, baseline)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Generate synthetic ShiftOrganizer exports for benchmarking.
+The workbooks have the same layout as the real ones: 4 title rows, the Hebrew
+header row and one row per day, with overnight shifts, days off and missing times.
+Like a real export each workbook is one employee's, so shifts never overlap: a
+day whose shift would start before the previous one ended plus a rest is a day off.
+
+    python -m benchmarks.workbook_generator shifts.xlsx --rows 100k
+"""
+import argparse
+import random
+from datetime import datetime, time, timedelta
+
+import openpyxl
+
+HEADER = ['תאריך', 'תפקיד', 'כניסה', 'יציאה', 'סיכום']
+ROLES = ['מוקדן', 'אחראי משמרת', 'מוקדן חדר בקרה', 'סייר']
+
+# typical shift starts, the hours are picked around them
+SHIFT_STARTS = [time(7, 0), time(15, 0), time(23, 0)]
+
+# the least time off between the end of a shift and the start of the next
+MIN_REST = timedelta(hours=8)
+
+# changes whenever the generated files change, so older cached workbooks aren't reused
+GENERATOR_VERSION = 2
+
+
+
+def parse_row_count(text):
+    """
+    Parse a row count like 1000, 1k, 100k or 1m.
+    """
+    text = str(text).strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+
+def _day_off(rng, day):
+    return [day, rng.choice([None, 'N/A']), None, None, None]
+
+
+
+def _shift_row(rng, day, missing_rate, overnight_rate, day_off_rate, rested_from=None):
+    """
+    One worksheet row for a day: a shift, a day off or a shift with a missing time.
+    A shift that would start before rested_from becomes a day off. Returns the row
+    and when its shift ends (None for a day off).
+    """
+    if rng.random() < day_off_rate:
+        return _day_off(rng, day), None
+
+    role = rng.choice(ROLES)
+    if rng.random() < overnight_rate:
+        start = time(rng.randint(20, 23), rng.choice([0, 15, 30, 45]))
+    else:
+        typical = rng.choice(SHIFT_STARTS[:2])
+        start = time(typical.hour + rng.randint(-1, 1), rng.choice([0, 0, 15, 30]))
+    length = timedelta(minutes=rng.choice([240, 360, 480, 480, 480, 600, 720]))
+    start_at = datetime.combine(day, start)
+    if rested_from is not None and start_at < rested_from:
+        return _day_off(rng, day), None
+    end_at = start_at + length
+    end = end_at.time()
+
+    if rng.random() < missing_rate:
+        # forgot to clock out, or in
+        if rng.random() < 0.5:
+            end = None
+        else:
+            start = None
+
+    summary = f"{length.seconds // 3600}:{length.seconds // 60 % 60:02d}" if start and end else None
+    return [day, role, start, end, summary], end_at
+
+
+
+def generate_workbook(path, rows, seed=0, start_date=datetime(2024, 1, 1),
+                      missing_rate=0.03, overnight_rate=0.15, day_off_rate=0.1):
+    """
+    Write a ShiftOrganizer-format workbook with the given number of data rows.
+    Uses openpyxl's write-only mode so a million rows fit in memory.
+    """
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('דוח נוכחות')
+
+    sheet.append(['דוח נוכחות'])
+    sheet.append(['עובד: עובד לדוגמה'])
+    sheet.append([f"תקופה: {start_date:%d/%m/%Y}"])
+    sheet.append([])
+    sheet.append(HEADER)
+
+    # one employee, one row per day, so the biggest files run centuries into the future,
+    # which the calculation handles like any other dates
+    day = start_date
+    rested_from = None
+    for _ in range(rows):
+        row, end_at = _shift_row(rng, day, missing_rate, overnight_rate, day_off_rate, rested_from)
+        sheet.append(row)
+        if end_at is not None:
+            rested_from = end_at + MIN_REST
+        day += timedelta(days=1)
+
+    workbook.save(path)
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic ShiftOrganizer export.')
+    parser.add_argument('path', help='the .xlsx file to write')
+    parser.add_argument('--rows', default='1k', help='number of data rows, e.g. 1k, 100k or 1m')
+    parser.add_argument('--seed', type=int, default=0, help='random seed, the same seed gives the same file')
+    args = parser.parse_args(argv)
+
+    generate_workbook(args.path, parse_row_count(args.rows), args.seed)
+    print(f"Wrote {args.path}")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,31 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 # Define the paths to your Python files and resources
 main_script = os.path.join(current_dir, 'gui.py')
 salary_calc = os.path.join(current_dir, 'salary_calc.py')
+shift_reader = os.path.join(current_dir, 'shift_reader.py')
+shift_cache = os.path.join(current_dir, 'shift_cache.py')
+virtual_tree = os.path.join(current_dir, 'virtual_tree.py')
+shift_table = os.path.join(current_dir, 'shift_table.py')
+holiday_calendar = os.path.join(current_dir, 'holiday_calendar.py')
+travel_rules = os.path.join(current_dir, 'travel_rules.py')
+travel_rules_config = os.path.join(current_dir, 'travel_rules.json')
+resources = os.path.join(current_dir, 'resources.py')
+rate_tables = os.path.join(current_dir, 'rate_tables.py')
+rate_tables_config = os.path.join(current_dir, 'rate_tables.json')
+units = os.path.join(current_dir, 'units.py')
+shift_flags = os.path.join(current_dir, 'shift_flags.py')
+startup_profile = os.path.join(current_dir, 'startup_profile.py')
+payroll_store = os.path.join(current_dir, 'payroll_store.py')
+payroll_export = os.path.join(current_dir, 'payroll_export.py')
+perf_trace = os.path.join(current_dir, 'perf_trace.py')
+diagnostics_panel = os.path.join(current_dir, 'diagnostics_panel.py')
+file_watcher = os.path.join(current_dir, 'file_watcher.py')
+session_store = os.path.join(current_dir, 'session_store.py')
+payroll_batch = os.path.join(current_dir, 'payroll_batch.py')
+shift_normalize = os.path.join(current_dir, 'shift_normalize.py')
+payroll_archive = os.path.join(current_dir, 'payroll_archive.py')
+scenarios = os.path.join(current_dir, 'scenarios.py')
+scenario_panel = os.path.join(current_dir, 'scenario_panel.py')
+shift_validation = os.path.join(current_dir, 'shift_validation.py')
 icon_file = os.path.join(current_dir, 'Celery.ico')
 
 # Define PyInstaller arguments
@@ -19,9 +44,33 @@ args = [
     '--name', 'SalaryCalculator',  # Name of the output executable
     '--add-data', f'{icon_file};.',  # Include the icon file in the executable
     '--add-data', f'{salary_calc};.',  # Include the salary_calc.py file
+    '--add-data', f'{shift_reader};.',  # Include the shift_reader.py file
+    '--add-data', f'{shift_cache};.',  # Include the shift_cache.py file
+    '--add-data', f'{virtual_tree};.',  # Include the virtual_tree.py file
+    '--add-data', f'{shift_table};.',  # Include the shift_table.py file
+    '--add-data', f'{holiday_calendar};.',  # Include the holiday_calendar.py file
+    '--add-data', f'{travel_rules};.',  # Include the travel_rules.py file
+    '--add-data', f'{travel_rules_config};.',  # Include the travel rules config
+    '--add-data', f'{resources};.',  # Include the resources.py file
+    '--add-data', f'{rate_tables};.',  # Include the rate_tables.py file
+    '--add-data', f'{rate_tables_config};.',  # Include the pay rates config
+    '--add-data', f'{units};.',  # Include the units.py file
+    '--add-data', f'{shift_flags};.',  # Include the shift_flags.py file
+    '--add-data', f'{startup_profile};.',  # Include the startup_profile.py file
+    '--add-data', f'{payroll_store};.',  # Include the payroll_store.py file
+    '--add-data', f'{payroll_export};.',  # Include the payroll_export.py file
+    '--add-data', f'{perf_trace};.',  # Include the perf_trace.py file
+    '--add-data', f'{diagnostics_panel};.',  # Include the diagnostics_panel.py file
+    '--add-data', f'{file_watcher};.',  # Include the file_watcher.py file
+    '--add-data', f'{session_store};.',  # Include the session_store.py file
+    '--add-data', f'{payroll_batch};.',  # Include the payroll_batch.py file
+    '--add-data', f'{shift_normalize};.',  # Include the shift_normalize.py file
+    '--add-data', f'{payroll_archive};.',  # Include the payroll_archive.py file
+    '--add-data', f'{scenarios};.',  # Include the scenarios.py file
+    '--add-data', f'{scenario_panel};.',  # Include the scenario_panel.py file
+    '--add-data', f'{shift_validation};.',  # Include the shift_validation.py file
     # Add required packages
     '--hidden-import', 'tkinter',
-    '--hidden-import', 'pandas',
     '--hidden-import', 'openpyxl',
     '--hidden-import', 'ttkthemes',
     '--hidden-import', 'tkinter.font',
@@ -34,6 +83,7 @@ args = [
     '--clean',
     # Exclude unnecessary packages to reduce size
     '--exclude-module', 'matplotlib',
+    '--exclude-module', 'pandas',  # openpyxl reads the files, pandas only made the executable slower to unpack
     '--exclude-module', 'PyQt5',
     '--exclude-module', 'PyQt6',
     '--exclude-module', 'PySide2',
@@ -0,0 +1,95 @@
+"""
+Diagnostics window: the perf_trace spans and counters, refreshed while it's open,
+with buttons to save them as JSON or as a Chrome trace.
+"""
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+import perf_trace
+
+REFRESH_MS = 1000
+
+
+
+class DiagnosticsPanel(tk.Toplevel):
+    """
+    Shows how long each instrumented stage took so far (count, total, mean and max)
+    and the counters. Timing can be switched on and off from here too.
+    """
+
+    def __init__(self, master=None):
+        super().__init__(master)
+        self.title('Diagnostics')
+        self.geometry('640x420')
+
+        self.enabled_var = tk.BooleanVar(value=perf_trace.enabled())
+        ttk.Checkbutton(self, text="Collect timings", variable=self.enabled_var,
+                        command=lambda: perf_trace.set_enabled(self.enabled_var.get())).pack(anchor='w', padx=10, pady=5)
+
+        self.tree = ttk.Treeview(self, columns=("Name", "Count", "Total ms", "Mean ms", "Max ms"),
+                                 show='headings', height=14)
+        for column, width in (("Name", 180), ("Count", 90), ("Total ms", 110), ("Mean ms", 110), ("Max ms", 110)):
+            self.tree.heading(column, text=column, anchor='center')
+            self.tree.column(column, anchor='center' if column != "Name" else 'w', width=width)
+        self.tree.pack(fill='both', expand=True, padx=10)
+
+        buttons = ttk.Frame(self)
+        buttons.pack(fill='x', padx=10, pady=10)
+        ttk.Button(buttons, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Save JSON", command=self.save_json).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Save Chrome Trace", command=self.save_chrome_trace).pack(side=tk.LEFT, padx=5)
+
+        self.refresh()
+
+
+
+
+    def refresh(self):
+        """
+        Redraw the table, and schedule the next refresh while the window is open.
+        """
+        if not self.winfo_exists():
+            return
+        stats = perf_trace.stats()
+        self.tree.delete(*self.tree.get_children())
+        for name, span in stats['spans'].items():
+            self.tree.insert('', 'end', values=(name, span['count'], f"{span['total_ms']:.1f}",
+                                                f"{span['mean_ms']:.2f}", f"{span['max_ms']:.2f}"))
+        for name, value in stats['counters'].items():
+            self.tree.insert('', 'end', values=(name, value, "", "", ""))
+        if not stats['spans'] and not stats['counters']:
+            hint = "Nothing collected yet" if stats['enabled'] else "Timing is off"
+            self.tree.insert('', 'end', values=(hint, "", "", "", ""))
+        self.after(REFRESH_MS, self.refresh)
+
+
+
+
+    def reset(self):
+        perf_trace.reset()
+        self.tree.delete(*self.tree.get_children())
+
+
+
+
+    def save_json(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json", filetypes=[("JSON files", "*.json")])
+        if path:
+            self._save(perf_trace.dump_json, path)
+
+
+
+
+    def save_chrome_trace(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+        if path:
+            self._save(perf_trace.dump_chrome_trace, path)
+
+
+
+
+    def _save(self, dump, path):
+        try:
+            dump(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save {path}: {e}", parent=self)
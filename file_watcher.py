@@ -0,0 +1,45 @@
+"""
+Notices when a file changes on disk, by polling its modification time and size.
+Polling is plenty for a file that's replaced a few times a month and works the same
+on every platform and on network drives, with nothing extra to install.
+"""
+import os
+
+
+
+class FileWatcher:
+    """
+    Call poll() every so often. It returns True once the file changed since the last
+    change it reported, and then looked the same on two polls in a row, so a download
+    that's still being written isn't picked up half way.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seen = self._signature()
+        self.pending = None
+
+
+
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None  # missing for now, for example while it's being replaced
+        return stat.st_mtime_ns, stat.st_size
+
+
+
+
+    def poll(self):
+        signature = self._signature()
+        if signature is None or signature == self.seen:
+            self.pending = None
+            return False
+        if signature != self.pending:
+            self.pending = signature  # wait one more poll for it to settle
+            return False
+        self.seen = signature
+        self.pending = None
+        return True
@@ -1,13 +1,34 @@
+import startup_profile
+startup_profile.start_from_env()  # before the other imports, so their cost is measured
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import tkinter.font as tkFont
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 from ttkthemes import ThemedTk
-from salary_calc import SalaryCalculator
+from shift_reader import InvalidShiftFileError
+from virtual_tree import VirtualTreeview
+from shift_flags import FLAG_CONTROL_ROOM, FLAG_HOLIDAY_EVE, FLAG_HOLIDAY, FLAG_LAST_DAY_OF_HOLIDAY
+from units import parse_clock, format_agorot
+import copy
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import os, sys
 
+# numpy and the calculation modules (salary_calc, shift_cache, shift_table, holiday_calendar)
+# are imported on a background thread once the window is up, see _load_calculation_modules
+
+
+# rows per chunk of background pay calculation, and how often the GUI checks for finished chunks
+CALCULATION_CHUNK_ROWS = 5000
+CALCULATION_POLL_MS = 50
+
+# how long after startup the calculation modules are loaded in the background, so the first window paints first
+PRELOAD_DELAY_MS = 300
+
+# how often a watched file is checked for changes
+WATCH_POLL_MS = 2000
+
 
 class SalaryGui:
     def __init__(self, root):
@@ -38,12 +59,21 @@ class SalaryGui:
         self.root.minsize(800, 600)
 
         self.root.set_theme("arc")
-        self.df = None # DataFrame to store the loaded Excel data
-        self.salary_calculator = SalaryCalculator()
-
-        self.holiday_eve_stat = {}
-        self.holiday_stat = {}
-        self.last_day_holiday_stat = {}
+        self.shifts = None # ShiftTable with the shifts of the loaded Excel file
+        self.pay_calculated = False # once pay is calculated, edits recalculate their rows right away
+        self.calculation_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+        self.calculation_jobs = [] # (rows, versions, future) of the chunks still being calculated
+        self.calculation_id = 0 # changes on every start and cancel, so stale polls stop
+        self.shift_cache = None # parsed files, so reopening an unchanged file skips the parse
+        self.session_store = None # the control room and holiday marks set by hand, kept between runs
+        self.employee = None # whose file is loaded, the marks are saved under this name
+        self.salary_calculator = None
+        self.diagnostics_panel = None # the diagnostics window, while it is open
+        self.scenario_panel = None # the what-if window, while it is open
+        self.file_path = None # the Excel file the shifts were loaded from
+        self.file_watcher = None # FileWatcher on file_path while "Watch File" is checked
+        self.reloading = False # a changed file is being parsed in the background
+        self.calculation_modules_lock = threading.Lock() # the modules are loaded once, by whichever thread needs them first
 
         # Define a custom font for widgets with increased size and bold weight
         self.custom_font = tkFont.Font(family="Rubik", size=14)
@@ -57,6 +87,9 @@ class SalaryGui:
 
         self.create_widgets()
 
+        # Load the heavy modules in the background while the user picks a file
+        self.root.after(PRELOAD_DELAY_MS, lambda: threading.Thread(target=self._load_calculation_modules, daemon=True).start())
+
 
 
 
@@ -86,7 +119,17 @@ class SalaryGui:
         # Frame for loading the Excel file
         load_frame = ttk.Frame(frame_inside_canvas)
         load_frame.grid(row=0, column=0, pady=15, sticky="ew")
-        ttk.Button(load_frame, text="Load Excel File", command=self.load_excel_file, style="Custom.TButton").pack()
+        ttk.Button(load_frame, text="Load Excel File", command=self.load_excel_file, style="Custom.TButton").pack(side=tk.LEFT, padx=10)
+        ttk.Button(load_frame, text="Export Results", command=self.export_results, style="Custom.TButton").pack(side=tk.LEFT, padx=10)
+        ttk.Button(load_frame, text="Archive Month", command=self.archive_results, style="Custom.TButton").pack(side=tk.LEFT, padx=10)
+        ttk.Button(load_frame, text="Pay Between Dates", command=self.show_archive_totals, style="Custom.TButton").pack(side=tk.LEFT, padx=10)
+        ttk.Button(load_frame, text="What If", command=self.show_scenarios, style="Custom.TButton").pack(side=tk.LEFT, padx=10)
+        ttk.Button(load_frame, text="Diagnostics", command=self.show_diagnostics, style="Custom.TButton").pack(side=tk.LEFT, padx=10)
+        self.watch_var = tk.BooleanVar()
+        ttk.Checkbutton(load_frame, text="Watch File", variable=self.watch_var, command=self.toggle_watch,
+                        style="Custom.TCheckbutton").pack(side=tk.LEFT, padx=10)
+        self.watch_status_var = tk.StringVar()
+        ttk.Label(load_frame, textvariable=self.watch_status_var, style="Custom.TLabel").pack(side=tk.LEFT, padx=10)
 
         # Frame for Treeview (with a scrollbar)
         tree_frame = ttk.Frame(frame_inside_canvas)
@@ -96,9 +139,10 @@ class SalaryGui:
         tree_scroll = ttk.Scrollbar(tree_frame)
         tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
 
-        # Treeview to display data
-        self.tree = ttk.Treeview(tree_frame, columns=("Date", "Day of Week", "Role", "Entry Time", "Exit Time", "Control Room", "Pay", "Travel Charge", "Hours Worked"),
-                                show='headings', selectmode='browse', yscrollcommand=tree_scroll.set)
+        # Treeview to display data, only the visible rows are created and they're filled from self.shifts
+        self.tree = VirtualTreeview(tree_frame, row_getter=lambda index: self.shifts.display_row(index),
+                                    columns=("Date", "Day of Week", "Role", "Entry Time", "Exit Time", "Control Room", "Pay", "Travel Charge", "Hours Worked"),
+                                    show='headings', selectmode='browse', height=20, yscrollcommand=tree_scroll.set)
         self.tree.heading("Date", text="Date", anchor='center')
         self.tree.heading("Day of Week", text="Day of Week", anchor='center')
         self.tree.heading("Role", text="Role", anchor='center')
@@ -122,8 +166,8 @@ class SalaryGui:
         self.tree.pack(fill='both', expand=True, padx=15)
         tree_scroll.config(command=self.tree.yview)
 
-        # Bind the TreeviewSelect event to the on_row_select method, thats why we need event parameter in on_row_select method
-        self.tree.bind('<<TreeviewSelect>>', self.on_row_select)
+        # Bind the RowSelect event to the on_row_select method, thats why we need event parameter in on_row_select method
+        self.tree.bind('<<RowSelect>>', self.on_row_select)
 
         # Frame for editing selected row
         edit_frame = ttk.LabelFrame(frame_inside_canvas, text="Edit Selected Row", style="Custom.TLabelframe")
@@ -196,6 +240,16 @@ class SalaryGui:
         select_all_button.grid(row=5, column=3, padx=10, pady=20, sticky="w")
 
 
+        # Progress of the pay calculation, which runs on worker threads
+        self.progress_var = tk.DoubleVar(value=0.0)
+        self.progress_bar = ttk.Progressbar(edit_frame, variable=self.progress_var, maximum=100)
+        self.progress_bar.grid(row=6, column=0, columnspan=3, padx=10, pady=10, sticky="ew")
+
+        # Button to cancel a running pay calculation
+        self.cancel_button = ttk.Button(edit_frame, text="Cancel", command=self.cancel_calculation, style="Custom.TButton", state="disabled")
+        self.cancel_button.grid(row=6, column=3, padx=10, pady=10, sticky="w")
+
+
         # Label to display the total pay
         ttk.Label(edit_frame, text="Total Pay:", style="Custom.TLabel").grid(row=5, column=3, padx=10, pady=20, sticky="e")
         self.total_pay_var = tk.StringVar(value="0.00")
@@ -213,45 +267,17 @@ class SalaryGui:
     
     def update_control_room(self):
         """
-        Update the 'In Control Room' value in the selected row based on the checkbox state
-        and persist the change in both the Treeview and the underlying data structure.
+        Update the 'In Control Room' flag of the selected row based on the checkbox state.
         """
-        selected_item = self.tree.selection()  # Get the selected item in the Treeview
-        if not selected_item:
+        row_index = self.tree.selected_index  # Get the selected row in the table
+        if row_index is None:
             messagebox.showerror("No Selection", "Please select a row to update.")
             return
 
-        # Get the value of the checkbox and set it as "Yes" or "No"
-        in_control_room = "Yes" if self.control_room_var.get() else "No"
-
-        # Get existing values from the selected item in the Treeview
-        values = self.tree.item(selected_item, 'values')
-
-        # Ensure there are 8 values (in case Travel Charge or Pay columns are missing)
-        if len(values) < 8:
-            values = list(values) + [''] * (8 - len(values))
-
-        # Create a new tuple with the updated "In Control Room" value
-        updated_values = (
-            values[0],  # Date
-            values[1],  # Day of Week
-            values[2],  # Role
-            values[3],  # Entry Time
-            values[4],  # Exit Time
-            in_control_room,  # Updated Control Room value (Yes/No based on checkbox)
-            values[6],  # Pay
-            values[7],   # Travel Charge
-            values[8]   # Hours Worked
-        )
-
-        # Update the Treeview with the new values
-        self.tree.item(selected_item, values=updated_values)
-
-        # Persist the change in the underlying data structure (e.g., self.daily_records)
-        row_index = self.tree.index(selected_item)  # Get the index of the selected row
-        if row_index < len(self.daily_records):
-            self.daily_records[row_index]['control_room'] = in_control_room
-        
+        self.shifts.set_flag(FLAG_CONTROL_ROOM, self.control_room_var.get(), row_index)
+        self._save_marks(row_index, FLAG_CONTROL_ROOM)
+        self._apply_edits()
+
 
 
 
@@ -260,45 +286,63 @@ class SalaryGui:
         """
         Save the holiday and last-day-of-holiday status for the selected row as soon as the checkbox is toggled.
         """
-        selected_item = self.tree.selection()
-        if not selected_item:
+        row_index = self.tree.selected_index
+        if row_index is None:
             return
 
-        # Get the index of the selected row
-        row_index = self.tree.index(selected_item)
-
-        
-        # Save the current checkbox states as True or False in the dictionaries
-        self.holiday_eve_stat[row_index] = self.holiday_eve_var.get()
-        self.holiday_stat[row_index] = self.holiday_var.get()
-        self.last_day_holiday_stat[row_index] = self.last_day_holiday_var.get()
+        # Save the current checkbox states in the row's flags
+        self.shifts.set_flag(FLAG_HOLIDAY_EVE, self.holiday_eve_var.get(), row_index)
+        self.shifts.set_flag(FLAG_HOLIDAY, self.holiday_var.get(), row_index)
+        self.shifts.set_flag(FLAG_LAST_DAY_OF_HOLIDAY, self.last_day_holiday_var.get(), row_index)
+        self._save_marks(row_index, FLAG_HOLIDAY_EVE | FLAG_HOLIDAY | FLAG_LAST_DAY_OF_HOLIDAY)
+        self._apply_edits()
 
 
 
     def select_all_in_control_room(self):
         """
-        Set the 'In Control Room' checkbox to 'Yes' for all rows in the Treeview.
+        Set the 'In Control Room' flag for all rows.
         """
-        for item in self.tree.get_children():
-            values = self.tree.item(item, 'values')
+        if self.shifts is None:
+            return
+
+        self.shifts.set_flag(FLAG_CONTROL_ROOM, True)
+        self._save_marks(slice(None), FLAG_CONTROL_ROOM)
+        self._apply_edits()
+
+
 
-            if len(values) < 9:
-                values = list(values) + [''] * (9 - len(values))
 
-            # update control room value to "Yes"
-            updated_values = (
-                values[0],  # Date
-                values[1],  # Day of Week
-                values[2],  # Role
-                values[3],  # Entry Time
-                values[4],  # Exit Time
-                "Yes",      # Set 'In Control Room' to "Yes"
-                values[6],  # Pay
-                values[7],   # Travel Charge
-                values[8]   # Hours Worked
-            )
 
-            self.tree.item(item, values=updated_values)
+    def _save_marks(self, rows, mask):
+        """
+        Remember the flags in mask of the given rows, which were just set by hand, so they
+        come back the next time this employee's file is opened.
+        """
+        if self.session_store is None or self.employee is None:
+            return
+        try:
+            self.session_store.save_table_marks(self.employee, self.shifts, rows, mask)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not save the marks, they will be lost when the app closes: {e}")
+
+
+
+
+
+
+    def _move_mark(self, old_date, old_entry_minute, date, entry_minute):
+        """
+        Marks are saved by date and entry time, so when an edit changes either of them
+        the saved mark follows the shift instead of staying under the old one.
+        """
+        if self.session_store is None or self.employee is None:
+            return
+        try:
+            self.session_store.move_mark(self.employee, old_date, old_entry_minute, date, entry_minute)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not move the saved marks of the edited shift: {e}")
+
 
 
 
@@ -328,96 +372,209 @@ class SalaryGui:
 
 
 
+    def _load_calculation_modules(self):
+        """
+        Import numpy and the calculation modules, and create the parse cache, the calculator
+        and the session store.
+        Runs on a background thread, so they don't slow down the first window. Returns the
+        ShiftTable class and apply_holiday_flags for the loader.
+        """
+        with self.calculation_modules_lock:
+            from salary_calc import SalaryCalculator
+            from shift_cache import ShiftCache
+            from shift_table import ShiftTable
+            from holiday_calendar import apply_holiday_flags
+            from session_store import SessionStore
+
+            if self.salary_calculator is None:
+                self.shift_cache = ShiftCache()
+                self.salary_calculator = SalaryCalculator()
+                try:
+                    self.session_store = SessionStore()
+                except Exception as e:
+                    print(f"Marks won't be saved, could not open the session database: {e}")
+            return ShiftTable, apply_holiday_flags
+
+
+
+
     def _load_file_thread(self, file_path):
         """
         Load the Excel file in a separate thread to keep the GUI responsive.
         """
         try:
-            # Load the file and rename columns
-            self.df = pd.read_excel(file_path, skiprows=4, header=0, engine='openpyxl')
-
-            column_mapping = {
-                'תאריך': 'Date',
-                'תפקיד': 'Role',
-                'כניסה': 'Entry Time',
-                'יציאה': 'Exit Time',
-                'סיכום': 'Summary'
-            }
-            self.df.rename(columns=column_mapping, inplace=True)
-
-            # Check for required columns
-            required_columns = {'Date', 'Role'}
-            if not required_columns.issubset(self.df.columns):
-                messagebox.showerror("Invalid Format", f"Excel file must contain columns: {', '.join(required_columns)}. Current columns are: {', '.join(self.df.columns)}")
-                return
+            ShiftTable, apply_holiday_flags = self._load_calculation_modules()
+            records = self.shift_cache.load(file_path)
+            shifts = ShiftTable.from_records(records)
+            apply_holiday_flags(shifts)  # holidays are marked from the calendar, the checkboxes can still override them
+            self._restore_marks(file_path, shifts)
+            from shift_validation import check_shift_table
+            issues = check_shift_table(shifts)
 
             # Update the Treeview on the main thread
-            self.root.after(0, self._update_treeview)
-
+            self.root.after(0, self._update_treeview, shifts, file_path)
+            if len(issues.kind):
+                self.root.after(0, self._report_shift_issues, shifts, issues)
+
+            # rows that were left out, and why
+            from shift_normalize import rejection_report, format_rejections
+            rejected = rejection_report(records)
+            if rejected:
+                self.root.after(0, messagebox.showwarning, "Skipped Rows", format_rejections(rejected))
+
+        # Message boxes must be shown from the main thread
+        except InvalidShiftFileError as e:
+            self.root.after(0, messagebox.showerror, "Invalid Format", str(e))
         except Exception as e:
-            messagebox.showerror("Error", f"Error loading Excel file: {e}")
+            self.root.after(0, messagebox.showerror, "Error", f"Error loading Excel file: {e}")
 
 
 
 
-    def _format_time(self, time_value):
+    def _restore_marks(self, file_path, shifts):
         """
-        Format the time value to HH:MM if it's a valid time string, otherwise return "Missing".
+        Put the marks saved for this file's employee back on freshly loaded shifts.
+        Runs on the loader thread, a database problem only means the marks aren't restored.
         """
+        from session_store import employee_name
+
+        if self.session_store is None:
+            return
         try:
-            return datetime.strptime(str(time_value), "%H:%M:%S").strftime("%H:%M")
-        except (ValueError, TypeError):
-            return "Missing"
+            self.session_store.restore(employee_name(file_path), shifts)
+        except Exception as e:
+            print(f"Could not restore the saved marks: {e}")
 
 
 
 
+    def _update_treeview(self, shifts, file_path):
+        """
+        Show a newly loaded table in the Treeview.
+        """
+        from session_store import employee_name
+
+        self.cancel_calculation()
+        self.shifts = shifts
+        self.file_path = file_path
+        self.employee = employee_name(file_path)
+        self.watch_status_var.set("")
+        if self.watch_var.get():
+            self.toggle_watch()  # watch the new file instead
+        self.pay_calculated = False
+        self.total_pay_var.set("0.00")
+
+        # Only the visible rows are drawn, the rest are filled in while scrolling
+        self.tree.selected_index = None
+        self.tree.set_row_count(len(self.shifts))
+        self.total_hours_var.set(f"Total Hours: {self.shifts.total_hours():.2f}")
+
+
+
 
-    def _update_treeview(self):
+
+
+
+    def _report_shift_issues(self, shifts, issues):
         """
-        Update the Treeview with the data from the loaded Excel file.
+        Warn about duplicate, overlapping and suspiciously close shifts in a newly loaded table,
+        and offer to merge the duplicates and overlaps so they aren't paid twice.
         """
+        from shift_validation import format_shift_issues, merge_shift_table, SHORT_GAP
 
-        # Clear any existing data in the Treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        if shifts is not self.shifts:
+            return  # another file was loaded meanwhile
+        message = format_shift_issues(issues, shifts.date, shifts.start_minute, shifts.end_minute)
+        if not (issues.kind != SHORT_GAP).any():
+            messagebox.showwarning("Check Shifts", message)
+            return
+        if messagebox.askyesno("Check Shifts", f"{message}\n\nMerge the duplicate and overlapping shifts into one?"):
+            self._update_treeview(merge_shift_table(shifts), self.file_path)
 
-        total_hours = 0.0 
 
-        # Populate the Treeview
-        for index, row in self.df.iterrows():
-            if pd.isna(row['Role']) or row['Role'] == 'N/A':
-                continue
 
-            date_obj = pd.to_datetime(row['Date'], format='%Y-%m-%d', errors='coerce')
-            if pd.notna(date_obj):
-                date_str = date_obj.strftime('%Y-%m-%d')
-                day_of_week = date_obj.strftime('%A')
-            else:
-                date_str = "Missing"
-                day_of_week = "Missing"
 
-            role = row['Role']
 
-            # Format entry and exit times to HH:MM, handle potential parsing issues
-            entry_time = self._format_time(row['Entry Time'])
-            exit_time = self._format_time(row['Exit Time'])
 
-            if date_str == "Missing" or entry_time == "Missing" or exit_time == "Missing":
-                continue
+    def toggle_watch(self):
+        """
+        Start or stop watching the loaded file. While it's watched, a new version of the file
+        is merged into the table without losing the control room and holiday marks.
+        """
+        if not self.watch_var.get() or self.file_path is None:
+            self.file_watcher = None
+            return
+
+        from file_watcher import FileWatcher
+        self.file_watcher = FileWatcher(self.file_path)
+        self.root.after(WATCH_POLL_MS, self._poll_watch, self.file_watcher)
+
 
-            # Calculate hours worked if both entry and exit times are valid
-            entry_dt = datetime.strptime(entry_time, "%H:%M")
-            exit_dt = datetime.strptime(exit_time, "%H:%M")
-            if exit_dt <= entry_dt:
-                exit_dt += timedelta(days=1)  # Handle overnight shifts
-            hours_worked = (exit_dt - entry_dt).total_seconds() / 3600
-            total_hours += hours_worked
 
-            # Insert the row into the Treeview, including the calculated hours worked
-            self.tree.insert("", "end", values=(date_str, day_of_week, role, entry_time, exit_time, "No", "", "", f"{hours_worked:.2f}"))
 
-        self.total_hours_var.set(f"Total Hours: {total_hours:.2f}")
+    def _poll_watch(self, watcher):
+        """
+        Check the watched file, and reload it in the background when it changed.
+        Runs on the main thread through root.after, until the watcher is replaced or stopped.
+        """
+        if watcher is not self.file_watcher:
+            return
+        if watcher.poll() and not self.reloading:
+            self.reloading = True
+            threading.Thread(target=self._reload_file_thread, args=(watcher.path,), daemon=True).start()
+        self.root.after(WATCH_POLL_MS, self._poll_watch, watcher)
+
+
+
+
+    def _reload_file_thread(self, file_path):
+        """
+        Parse the changed file, the same way as loading it, and hand it to the main thread to merge.
+        """
+        try:
+            ShiftTable, apply_holiday_flags = self._load_calculation_modules()
+            shifts = ShiftTable.from_records(self.shift_cache.load(file_path))
+            apply_holiday_flags(shifts)
+            self._restore_marks(file_path, shifts)
+            self.root.after(0, self._merge_reloaded, shifts, file_path)
+        except Exception as e:
+            # most likely caught while it was being written, the next change tries again
+            self.root.after(0, self.watch_status_var.set, f"Reload failed: {e}")
+            self.reloading = False
+
+
+
+
+    def _merge_reloaded(self, reloaded, file_path):
+        """
+        Merge the reloaded shifts into the table. Only added and changed rows are recalculated,
+        everything else keeps its flags and pay, and the selection follows its row.
+        """
+        from shift_table import merge_reloaded
+
+        self.reloading = False
+        if file_path != self.file_path:
+            return  # another file was loaded meanwhile
+
+        self.cancel_calculation()
+        self.shifts, diff = merge_reloaded(self.shifts, reloaded)
+
+        selected = self.tree.selected_index
+        self.tree.selected_index = None
+        previous_index = diff.previous_index.tolist()
+        if selected is not None and selected in previous_index:
+            self.tree.selected_index = previous_index.index(selected)
+        self.tree.set_row_count(len(self.shifts))
+        if self.tree.selected_index is not None:
+            self.on_row_select(None)
+
+        self.total_hours_var.set(f"Total Hours: {self.shifts.total_hours():.2f}")
+        self.watch_status_var.set(f"Reloaded at {datetime.now():%H:%M}: {diff.added} added, "
+                                  f"{diff.changed} changed, {diff.removed} removed")
+        if self.pay_calculated:
+            self.total_pay_var.set(f"{format_agorot(self.shifts.total_pay())} shekels")
+            if len(self.shifts.dirty_rows()):
+                self.calculate_pay()
 
 
 
@@ -430,13 +587,11 @@ class SalaryGui:
         Handle the event when a row is selected in the Treeview.
         Populate the selected row's data into the input fields.
         """
-        selected_item = self.tree.selection()
-        if not selected_item:
+        row_index = self.tree.selected_index
+        if row_index is None:
             return
 
-        values = self.tree.item(selected_item, 'values')
-        if len(values) < 8:
-            values = list(values) + [''] * (8 - len(values))
+        values = self.shifts.display_row(row_index)
 
         # Populate the fields with the respective values from the selected row
         self.date_var.set(values[0])
@@ -444,15 +599,12 @@ class SalaryGui:
         self.role_var.set(values[2])
         self.entry_time_var.set(values[3])
         self.exit_time_var.set(values[4])
-        self.control_room_var.set(True if values[5] == "Yes" else False)
 
-        # Retrieve row index
-        row_index = self.tree.index(selected_item)
-
-        # Set checkbox values based on the saved status for this row, defaulting to False if not set
-        self.holiday_eve_var.set(self.holiday_eve_stat.get(row_index, False))
-        self.holiday_var.set(self.holiday_stat.get(row_index, False))
-        self.last_day_holiday_var.set(self.last_day_holiday_stat.get(row_index, False))
+        # Set checkbox values based on the row's flags
+        self.control_room_var.set(bool(self.shifts.has_flag(FLAG_CONTROL_ROOM, row_index)))
+        self.holiday_eve_var.set(bool(self.shifts.has_flag(FLAG_HOLIDAY_EVE, row_index)))
+        self.holiday_var.set(bool(self.shifts.has_flag(FLAG_HOLIDAY, row_index)))
+        self.last_day_holiday_var.set(bool(self.shifts.has_flag(FLAG_LAST_DAY_OF_HOLIDAY, row_index)))
 
 
 
@@ -463,52 +615,54 @@ class SalaryGui:
         """
         Update the selected row in the Treeview with the values from the entry fields and checkboxes.
         """
-        selected_item = self.tree.selection()
-        if not selected_item:
+        row_index = self.tree.selected_index
+        if row_index is None:
             messagebox.showerror("No Selection", "Please select a row to update.")
             return
 
-        # Get the updated values from the entry fields and checkbox
-        date_str = self.date_var.get()
-        role = self.role_var.get()
-        entry_time = self.entry_time_var.get()
-        exit_time = self.exit_time_var.get()
-        in_control_room = "Yes" if self.control_room_var.get() else "No"
-        
-        # Retrieve the existing "Hours Worked" value from the selected row
-        current_values = self.tree.item(selected_item, 'values')
-        hours_worked = current_values[8]  # Assuming "Hours Worked" is the 9th column (index 8)
+        # Parse the updated values from the entry fields, the only place the table gets strings
+        try:
+            date = datetime.strptime(self.date_var.get(), "%Y-%m-%d").date()
+            entry_minute = parse_clock(self.entry_time_var.get())
+            exit_minute = parse_clock(self.exit_time_var.get())
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Please enter the date as YYYY-MM-DD and the times as HH:MM.")
+            return
+
+        old_date, old_entry_minute = self.shifts.date[row_index], int(self.shifts.start_minute[row_index])
+        self.shifts.update_shift(row_index, date, self.role_var.get(), entry_minute, exit_minute)
+        self._move_mark(old_date, old_entry_minute, date, entry_minute)
+        self.shifts.set_flag(FLAG_CONTROL_ROOM, self.control_room_var.get(), row_index)
+        self._save_marks(row_index, FLAG_CONTROL_ROOM)
+        self._apply_edits()
 
-        # Update Treeview with new values while preserving "Hours Worked"
-        day_of_week = self.get_day_of_week(date_str)  # Get the day of the week for the updated date
-        self.tree.item(selected_item, values=(date_str, day_of_week, role, entry_time, exit_time, in_control_room, current_values[6], current_values[7], hours_worked))
+        # The day of the week follows the date
+        self.date_of_week_var.set(self.shifts.display_row(row_index)[1])
 
 
 
 
-    def get_day_of_week(self, date_str):
+    def _apply_edits(self):
         """
-        Get the day of the week from a given date string
+        After an edit, recalculate just the rows that changed (once pay has been calculated)
+        and refresh the totals, which the table keeps up to date without a full pass.
+        While a calculation is running, the edited rows are picked up when it finishes.
         """
-        try:
-            return datetime.strptime(date_str, "%Y-%m-%d").strftime('%A')
-        except ValueError:
-            return "Missing"
+        if self.pay_calculated and not self.calculation_jobs:
+            self.shifts.recalculate(self.salary_calculator)
+            self.total_pay_var.set(f"{format_agorot(self.shifts.total_pay())} shekels")
+
+        self.tree.refresh()
+        self.total_hours_var.set(f"Total Hours: {self.shifts.total_hours():.2f}")
 
 
 
 
     def calculate_total_hours(self):
         """
-        Calculate the total hours worked for all days in the treeview.
+        Calculate the total hours worked for all days in the table.
         """
-        total_hours = 0.0
-        for item in self.tree.get_children():
-            values = self.tree.item(item, 'values')
-            try:
-                total_hours += float(values[8])  # 'Hours Worked' column index
-            except (ValueError, IndexError):
-                continue
+        total_hours = self.shifts.total_hours() if self.shifts is not None else 0.0
         self.total_hours_var.set(f"{total_hours:.2f} hours")
 
 
@@ -517,64 +671,227 @@ class SalaryGui:
 
     def calculate_pay(self):
         """
-        Calculate the pay for each row in the treeview and update the 'Pay' and 'Travel Charge' columns.
+        Calculate the pay for each row in the table and update the 'Pay' and 'Travel Charge' columns.
+        Only rows that are new or changed since the last calculation are priced. They are split into
+        chunks that are calculated on worker threads, and the results are applied on the main thread
+        as they come in, so the window stays responsive.
         """
-        if self.df is None:
+        if self.shifts is None:
             messagebox.showerror("No Data", "Please load an Excel file first.")
             return
+        if self.calculation_jobs:
+            return  # already calculating
 
         try:
-            for item in self.tree.get_children():
-                values = self.tree.item(item, 'values')
-
-                # Ensure the row has the correct number of values (9 including 'Hours Worked')
-                if len(values) < 9:
-                    values = list(values) + [''] * (9 - len(values))
-
-                # Unpack the values
-                date_str, day_of_week, role, entry_time_str, exit_time_str, in_control_room, _, _, _ = values
-
-                if entry_time_str == "Missing" or exit_time_str == "Missing":
-                    total_pay_day = 0.0
-                    travel_charge_day = 0.0
-                else:
-                    # Parse the date, start time, and end time
-                    date = datetime.strptime(date_str, "%Y-%m-%d").date()
-                    start_time = datetime.strptime(entry_time_str, "%H:%M").time()
-                    end_time = datetime.strptime(exit_time_str, "%H:%M").time()
-                    in_control_room_flag = True if in_control_room == "Yes" else False
-
-                    # Determine if the workday is a Friday, Saturday, holiday, or last day of a holiday
-                    is_friday = date.weekday() == 4  # 0 = Monday, 4 = Friday
-                    is_saturday = date.weekday() == 5  # 5 = Saturday
-                    row_index = self.tree.index(item)
-                    is_holiday_eve = self.holiday_stat.get(row_index, False)
-                    is_holiday = self.holiday_stat.get(row_index, False)
-                    is_last_day_of_holiday = self.last_day_holiday_stat.get(row_index, False)
-
-                    # Use a temporary instance of SalaryCalculator to avoid accumulating pay
-                    temp_calculator = SalaryCalculator()
-                    temp_calculator.add_work_day(
-                        date=date,
-                        start_time=start_time,
-                        end_time=end_time,
-                        in_control_room=in_control_room_flag,
-                        is_holiday_eve=is_holiday_eve,
-                        is_friday=is_friday,
-                        is_saturday=is_saturday,
-                        is_holiday=is_holiday,
-                        is_last_day_of_holiday=is_last_day_of_holiday
-                    )
-                    total_pay_day = temp_calculator.total_pay()
-
-                    # Calculate the travel charge for the day
-                    travel_charge_day = temp_calculator.calculate_travel_charge(date, start_time, end_time, is_friday, is_saturday)
-
-                # Update Treeview with the calculated pay and travel charge for that specific day
-                self.tree.item(item, values=(date_str, day_of_week, role, entry_time_str, exit_time_str, in_control_room, f"{total_pay_day:.2f}", f"{travel_charge_day:.2f}", values[8]))
-
+            dirty_rows = self.shifts.dirty_rows()
+            for start in range(0, len(dirty_rows), CALCULATION_CHUNK_ROWS):
+                rows = dirty_rows[start:start + CALCULATION_CHUNK_ROWS]
+                # the inputs are copied here, so the workers never touch the table itself
+                future = self.calculation_executor.submit(self.salary_calculator.compute_batch, *self.shifts.batch_inputs(rows))
+                self.calculation_jobs.append((rows, self.shifts.version[rows].copy(), future))
         except Exception as e:
+            self.cancel_calculation()
             messagebox.showerror("Error", f"Error calculating pay: {e}")
+            return
+
+        self.calculation_id += 1
+        self.calculation_total_chunks = len(self.calculation_jobs)
+        self.progress_var.set(0.0)
+        self.cancel_button.config(state="normal")
+        self._poll_calculation(self.calculation_id)
+
+
+
+
+    def _poll_calculation(self, calculation_id):
+        """
+        Apply the chunks that are done, in order, and check again shortly while any are left.
+        Runs on the main thread through root.after.
+        """
+        if calculation_id != self.calculation_id:
+            return  # cancelled or replaced by a newer calculation
+
+        while self.calculation_jobs and self.calculation_jobs[0][2].done():
+            rows, versions, future = self.calculation_jobs.pop(0)
+            try:
+                pay, travel_charge = future.result()
+            except Exception as e:
+                self.cancel_calculation()
+                messagebox.showerror("Error", f"Error calculating pay: {e}")
+                return
+            self.shifts.apply_results(rows, versions, pay, travel_charge)
+
+        done_chunks = self.calculation_total_chunks - len(self.calculation_jobs)
+        self.progress_var.set(100.0 * done_chunks / max(1, self.calculation_total_chunks))
+        self.tree.refresh()
+
+        if self.calculation_jobs:
+            self.root.after(CALCULATION_POLL_MS, self._poll_calculation, calculation_id)
+            return
+
+        self.pay_calculated = True
+        self.cancel_button.config(state="disabled")
+        self.total_pay_var.set(f"{format_agorot(self.shifts.total_pay())} shekels")
+
+        # rows edited while the calculation was running
+        if len(self.shifts.dirty_rows()):
+            self.calculate_pay()
+
+
+
+
+    def cancel_calculation(self):
+        """
+        Stop a running pay calculation. Chunks that already finished keep their results,
+        the rest of the rows stay uncalculated.
+        """
+        for _, _, future in self.calculation_jobs:
+            future.cancel()
+        self.calculation_jobs = []
+        self.calculation_id += 1
+        self.cancel_button.config(state="disabled")
+        self.progress_var.set(0.0)
+
+
+
+
+
+
+    def export_results(self):
+        """
+        Export the calculated shifts and the total to a CSV, Excel or Parquet file.
+        The file is written on a background thread, in chunks, so large tables don't freeze the window.
+        """
+        if self.shifts is None:
+            messagebox.showerror("No Data", "Please load an Excel file first.")
+            return
+        if self.calculation_jobs or len(self.shifts.dirty_rows()):
+            messagebox.showerror("Not Calculated", "Please calculate the pay for each day before exporting.")
+            return
+
+        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[
+            ("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet")])
+        if not file_path:
+            return
+
+        try:
+            from payroll_export import export_format
+            export_format(file_path)
+        except (ValueError, ImportError) as e:
+            messagebox.showerror("Export Error", str(e))
+            return
+
+        # the thread writes a snapshot, so edits made while it runs don't end up half exported
+        threading.Thread(target=self._export_thread, args=(file_path, copy.deepcopy(self.shifts), self.employee or ''),
+                         daemon=True).start()
+
+
+
+
+    def _export_thread(self, file_path, shifts, employee):
+        try:
+            from payroll_export import export_shift_table
+            export_shift_table(file_path, shifts, employee)
+            self.root.after(0, messagebox.showinfo, "Export", f"Exported {len(shifts)} shifts to {file_path}")
+        except Exception as e:
+            self.root.after(0, messagebox.showerror, "Export Error", f"Error exporting results: {e}")
+
+
+
+
+
+
+    def archive_results(self):
+        """
+        Add the calculated shifts to the payroll archive, so they count in date-range and
+        year-to-date totals later without loading this file again.
+        """
+        if self.shifts is None:
+            messagebox.showerror("No Data", "Please load an Excel file first.")
+            return
+        if self.calculation_jobs or len(self.shifts.dirty_rows()):
+            messagebox.showerror("Not Calculated", "Please calculate the pay for each day before archiving.")
+            return
+
+        try:
+            from payroll_archive import PayrollArchive
+            PayrollArchive().add_shift_table(self.employee, self.shifts)
+        except Exception as e:
+            messagebox.showerror("Archive Error", f"Error archiving results: {e}")
+            return
+        messagebox.showinfo("Archive", f"Archived {len(self.shifts)} shifts of {self.employee}.")
+
+
+
+
+    def show_archive_totals(self):
+        """
+        Ask for two dates (this year so far by default) and show the archived totals between
+        them, of the loaded file's employee or of everyone if no file is loaded.
+        """
+        from tkinter import simpledialog
+
+        today = datetime.now().date()
+        first_date = simpledialog.askstring("Pay Between Dates", "From date (YYYY-MM-DD):",
+                                            initialvalue=f"{today.year}-01-01", parent=self.root)
+        if not first_date:
+            return
+        last_date = simpledialog.askstring("Pay Between Dates", "To date (YYYY-MM-DD):",
+                                           initialvalue=str(today), parent=self.root)
+        if not last_date:
+            return
+        try:
+            datetime.strptime(first_date, "%Y-%m-%d")
+            datetime.strptime(last_date, "%Y-%m-%d")
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Please enter the dates as YYYY-MM-DD.")
+            return
+
+        try:
+            from payroll_archive import PayrollArchive
+            totals = PayrollArchive().totals(first_date, last_date, self.employee)
+        except Exception as e:
+            messagebox.showerror("Archive Error", f"Error reading the archive: {e}")
+            return
+        messagebox.showinfo("Pay Between Dates", (
+            f"{self.employee or 'Everyone'}, {first_date} to {last_date}:\n"
+            f"{totals.shifts} shifts, {totals.minutes / 60:.2f} hours\n"
+            f"Pay: {format_agorot(totals.pay)} shekels\n"
+            f"Travel charge: {format_agorot(totals.travel_charge)} shekels\n"
+            f"Total: {format_agorot(totals.pay + totals.travel_charge)} shekels"))
+
+
+
+
+
+
+    def show_scenarios(self):
+        """
+        Open the what-if window, to compare the pay of the loaded shifts under other flags and rates.
+        """
+        if self.shifts is None:
+            messagebox.showerror("No Data", "Please load an Excel file first.")
+            return
+        if self.scenario_panel is not None and self.scenario_panel.winfo_exists():
+            self.scenario_panel.lift()
+            return
+        from scenario_panel import ScenarioPanel
+        self.scenario_panel = ScenarioPanel(self.root, self)
+
+
+
+
+
+
+    def show_diagnostics(self):
+        """
+        Open the diagnostics window with the timings of loading and calculating, or bring it to the front.
+        """
+        if self.diagnostics_panel is not None and self.diagnostics_panel.winfo_exists():
+            self.diagnostics_panel.lift()
+            return
+        from diagnostics_panel import DiagnosticsPanel
+        self.diagnostics_panel = DiagnosticsPanel(self.root)
 
 
 
@@ -583,32 +900,23 @@ class SalaryGui:
 
     def calculate_total_pay(self):
         """
-        Calculate the total pay for all days in the treeview.
+        Calculate the total pay for all days in the table.
         """
-        total_pay = 0.0  
+        if self.shifts is None:
+            return
 
         try:
-            for item in self.tree.get_children():
-                values = self.tree.item(item, 'values')
-                pay = values[6]  # Assuming 'Pay' is the seventh column (index 6)
-
-                # Attempt to convert the pay value to float if it's not "Missing" or empty
-                if pay != "Missing" and pay != "" and pay != "No":
-                    try:
-                        total_pay += float(pay)
-                    except ValueError:
-                        # Ignore any value that cannot be converted to a float
-                        continue
-
-            # Show the total pay in a message box
-            self.total_pay_var.set(f"{total_pay:.2f} shekels")
+            self.total_pay_var.set(f"{format_agorot(self.shifts.total_pay())} shekels")
         except Exception as e:
             messagebox.showerror("Error", f"Error calculating total pay: {e}")
 
 
 if __name__ == "__main__":
+    startup_profile.mark('imports done')
     root = ThemedTk(theme="arc")
     app = SalaryGui(root)
+    startup_profile.mark('widgets created')
+    startup_profile.report_when_shown(root)
     root.mainloop()
 
     
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+Israeli holiday calendar, computed offline from the rules of the Hebrew calendar.
+
+The paid holidays are Rosh Hashana (2 days), Yom Kippur, Sukkot, Shemini Atzeret,
+Pesach (first and seventh day), Shavuot and Yom Ha'atzmaut. For pay purposes:
+- HOLIDAY is set on each of those days.
+- HOLIDAY_EVE is set on the day before a holiday (unless it's a holiday itself),
+  premium from 4 PM like a Friday.
+- LAST_DAY_OF_HOLIDAY is set on the day after a holiday ends, premium before 4 AM
+  like a Sunday after Saturday.
+
+HolidayCalendar builds a date -> flag bitmask array once, so flagging a whole
+import is a single vectorized lookup.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+import perf_trace
+from shift_flags import FLAG_HOLIDAY_EVE, FLAG_HOLIDAY, FLAG_LAST_DAY_OF_HOLIDAY
+
+HOLIDAY_FLAGS = FLAG_HOLIDAY_EVE | FLAG_HOLIDAY | FLAG_LAST_DAY_OF_HOLIDAY
+
+# date.toordinal() of 1 Tishrei of year 1
+HEBREW_EPOCH = -1373427
+
+# the Hebrew year that starts in the autumn of a Gregorian year
+HEBREW_YEAR_OFFSET = 3761
+
+# 1 Tishrei is always this many days after 15 Nisan of the previous Hebrew year
+DAYS_FROM_PESACH_TO_ROSH_HASHANA = 163
+
+
+
+def _elapsed_days(hebrew_year):
+    """
+    Days from the epoch to the molad of Tishrei, moved off Sunday, Wednesday and Friday.
+    """
+    months_elapsed = (235 * hebrew_year - 234) // 19
+    parts_elapsed = 12084 + 13753 * months_elapsed
+    days = 29 * months_elapsed + parts_elapsed // 25920
+    if (3 * (days + 1)) % 7 < 3:
+        days += 1
+    return days
+
+
+
+def _year_length_correction(hebrew_year):
+    """
+    Delay of the new year that keeps year lengths valid (the last two dechiyot).
+    """
+    previous_year = _elapsed_days(hebrew_year - 1)
+    this_year = _elapsed_days(hebrew_year)
+    next_year = _elapsed_days(hebrew_year + 1)
+    if next_year - this_year == 356:
+        return 2
+    if this_year - previous_year == 382:
+        return 1
+    return 0
+
+
+
+def rosh_hashana(hebrew_year):
+    """
+    Gregorian date of 1 Tishrei of a Hebrew year.
+    """
+    return date.fromordinal(HEBREW_EPOCH + _elapsed_days(hebrew_year) + _year_length_correction(hebrew_year))
+
+
+
+def _yom_haatzmaut(pesach):
+    """
+    5 Iyar, moved to Thursday when it falls on Friday or Saturday and to Tuesday
+    when it falls on Monday.
+    """
+    day = pesach + timedelta(days=20)
+    move = {4: -1, 5: -2, 0: 1}.get(day.weekday(), 0)
+    return day + timedelta(days=move)
+
+
+
+def holidays_in_year(year):
+    """
+    The paid holidays in a Gregorian year, as a sorted list of (date, name).
+    """
+    holidays = []
+
+    # spring holidays belong to the Hebrew year that started the previous autumn
+    pesach = rosh_hashana(year + HEBREW_YEAR_OFFSET) - timedelta(days=DAYS_FROM_PESACH_TO_ROSH_HASHANA)
+    holidays.append((pesach, 'Pesach'))
+    holidays.append((pesach + timedelta(days=6), 'Last Day of Pesach'))
+    holidays.append((_yom_haatzmaut(pesach), "Yom Ha'atzmaut"))
+    holidays.append((pesach + timedelta(days=50), 'Shavuot'))
+
+    new_year = rosh_hashana(year + HEBREW_YEAR_OFFSET)
+    holidays.append((new_year, 'Rosh Hashana'))
+    holidays.append((new_year + timedelta(days=1), 'Rosh Hashana'))
+    holidays.append((new_year + timedelta(days=9), 'Yom Kippur'))
+    holidays.append((new_year + timedelta(days=14), 'Sukkot'))
+    holidays.append((new_year + timedelta(days=21), 'Shemini Atzeret'))
+
+    return sorted(holidays)
+
+
+
+class HolidayCalendar:
+    """
+    Date -> flag bitmask index for a range of Gregorian years.
+    """
+
+    def __init__(self, first_year, last_year):
+        self.first_year = first_year
+        self.last_year = last_year
+        self.first_day = np.datetime64(date(first_year, 1, 1), 'D')
+        day_count = (date(last_year + 1, 1, 1) - date(first_year, 1, 1)).days
+        self.flags = np.zeros(day_count, dtype=np.uint8)
+
+        # one year more on each side, so eves and last days at the edges of the range are right
+        holiday_days = np.array([
+            np.datetime64(day, 'D') for year in range(first_year - 1, last_year + 2)
+            for day, _ in holidays_in_year(year)
+        ])
+        holiday_offsets = (holiday_days - self.first_day).astype(np.int64)
+
+        is_holiday = np.zeros(day_count + 2, dtype=bool)  # padded by a day on each side
+        in_range = (holiday_offsets >= -1) & (holiday_offsets <= day_count)
+        is_holiday[holiday_offsets[in_range] + 1] = True
+
+        holiday = is_holiday[1:-1]
+        eve = is_holiday[2:] & ~holiday  # tomorrow is a holiday
+        last_day = is_holiday[:-2] & ~holiday  # yesterday was a holiday
+        self.flags[holiday] |= FLAG_HOLIDAY
+        self.flags[eve] |= FLAG_HOLIDAY_EVE
+        self.flags[last_day] |= FLAG_LAST_DAY_OF_HOLIDAY
+
+
+
+
+    def flags_for(self, dates):
+        """
+        Holiday flags for an array of dates. Dates outside the calendar's years get no flags.
+        """
+        offsets = (np.asarray(dates, dtype='datetime64[D]') - self.first_day).astype(np.int64)
+        in_range = (offsets >= 0) & (offsets < len(self.flags))
+        return np.where(in_range, self.flags[np.clip(offsets, 0, len(self.flags) - 1)], 0).astype(np.uint8)
+
+
+
+@lru_cache(maxsize=8)
+def holiday_calendar(first_year, last_year):
+    """
+    Shared calendar for a range of years, built once.
+    """
+    return HolidayCalendar(first_year, last_year)
+
+
+
+def apply_holiday_flags(shifts):
+    """
+    Set the holiday flags of every shift in a ShiftTable from the calendar, replacing
+    any holiday flags it had. Only shifts whose flags change need recalculating.
+    """
+    if not len(shifts):
+        return
+    with perf_trace.span('holidays'):
+        years = shifts.date.astype('datetime64[Y]').astype(np.int64) + 1970
+        calendar = holiday_calendar(int(years.min()), int(years.max()))
+        shifts.set_flags(calendar.flags_for(shifts.date), HOLIDAY_FLAGS)
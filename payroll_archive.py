@@ -0,0 +1,332 @@
+"""
+Archive of calculated shifts, for pay between two dates and year-to-date figures
+without importing every month's Excel file again.
+
+Each employee has one binary file of fixed-size shift records sorted by date. Every
+record also holds the running totals of pay, minutes and travel charge up to and
+including itself, so the total of any date range is two binary searches on the
+date column and one subtraction. The files are memory-mapped, so a query only
+reads the few pages its searches touch, however many years are archived.
+
+Archiving a month that comes after everything archived so far only appends to the
+file, so it costs the size of the month, not of the history. A crash while
+appending can leave a record cut short at the end, which is left out when the file
+is read and written over by the next append. Archiving dates that are already
+there (a corrected export of the same month) replaces the archived shifts of those
+dates and works the running totals out again from that point on. That rewrites the
+file, next to the old one, and swaps it in so a crash never leaves it half written.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from payroll_store import PayrollTotals, EMPTY_TOTALS, TEAM_TOTAL_LABEL
+from units import MINUTES_PER_DAY, format_agorot
+
+ARCHIVE_SUFFIX = '.shifts'
+MAGIC = b'SALARCH1'
+HEADER_BYTES = 16
+
+RECORD_DTYPE = np.dtype([
+    ('day', '<i4'),  # days since 1970-01-01
+    ('start_minute', '<i2'),
+    ('end_minute', '<i2'),
+    ('worked_minutes', '<i2'),
+    ('flags', 'u1'),
+    ('pad', 'u1'),
+    ('pay', '<i8'),  # agorot
+    ('travel_charge', '<i8'),
+    # running totals up to and including this record
+    ('total_pay', '<i8'),
+    ('total_minutes', '<i8'),
+    ('total_travel_charge', '<i8'),
+])
+
+
+
+def default_archive_dir():
+    """
+    Where the archive lives: $SALARY_CALC_ARCHIVE_DIR if set, otherwise the user's data directory.
+    """
+    if os.environ.get('SALARY_CALC_ARCHIVE_DIR'):
+        return os.environ['SALARY_CALC_ARCHIVE_DIR']
+    if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+        return os.path.join(os.environ['LOCALAPPDATA'], 'SalaryCalculator', 'archive')
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(data_home, 'salary-calculator', 'archive')
+
+
+
+def _day(value):
+    """
+    Days since 1970-01-01 of a date, or None for no date.
+    """
+    return None if value is None else int(np.datetime64(value, 'D').astype(np.int64))
+
+
+
+class PayrollArchive:
+    """
+    The archive directory. Files are mapped when they're first queried, and mapped
+    again if they changed on disk since.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_archive_dir()
+        self._maps = {}  # employee -> (file size, memmap)
+
+
+
+
+    def _path(self, employee):
+        # employee names are file names of exports, quoted so any name is a safe file name
+        return os.path.join(self.directory, quote(employee, safe='') + ARCHIVE_SUFFIX)
+
+
+
+
+    def employees(self):
+        """
+        The archived employees, sorted by name.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(unquote(name[:-len(ARCHIVE_SUFFIX)]) for name in os.listdir(self.directory)
+                      if name.endswith(ARCHIVE_SUFFIX))
+
+
+
+
+    def records(self, employee):
+        """
+        All of an employee's archived records as a read-only memory-mapped array,
+        sorted by day. Nothing is read from disk until it's indexed.
+        """
+        path = self._path(employee)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        cached = self._maps.get(employee)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a payroll archive file")
+        # a record cut short by a crash while appending is left out
+        count = (size - HEADER_BYTES) // RECORD_DTYPE.itemsize
+        records = (np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_BYTES, shape=(count,))
+                   if count else np.zeros(0, dtype=RECORD_DTYPE))
+        self._maps[employee] = (size, records)
+        return records
+
+
+
+
+    def _range(self, records, first_day, last_day):
+        """
+        Where the records between two days (both included) start and stop, found by binary search.
+        """
+        days = records['day']
+        start = 0 if first_day is None else int(np.searchsorted(days, first_day, 'left'))
+        stop = len(records) if last_day is None else int(np.searchsorted(days, last_day, 'right'))
+        return start, max(start, stop)
+
+
+
+
+    def shifts(self, employee, first_date=None, last_date=None):
+        """
+        An employee's archived records between two dates, both included.
+        """
+        records = self.records(employee)
+        start, stop = self._range(records, _day(first_date), _day(last_date))
+        return records[start:stop]
+
+
+
+
+    def employee_totals(self, employee, first_date=None, last_date=None):
+        """
+        PayrollTotals of an employee's shifts between two dates, both included, from the running totals.
+        """
+        records = self.records(employee)
+        start, stop = self._range(records, _day(first_date), _day(last_date))
+        if start == stop:
+            return EMPTY_TOTALS
+        last = records[stop - 1]
+        before = records[start - 1] if start else None
+
+        def total(field):
+            return int(last[field]) - (int(before[field]) if before is not None else 0)
+
+        return PayrollTotals(stop - start, total('total_minutes'), total('total_pay'), total('total_travel_charge'))
+
+
+
+
+    def totals(self, first_date=None, last_date=None, employee=None):
+        """
+        PayrollTotals between two dates, both included, of one employee or of everyone archived.
+        """
+        if employee is not None:
+            return self.employee_totals(employee, first_date, last_date)
+        team = [self.employee_totals(name, first_date, last_date) for name in self.employees()]
+        return PayrollTotals(*(sum(values) for values in zip(*team))) if team else EMPTY_TOTALS
+
+
+
+
+    def year_to_date(self, on_date=None, employee=None):
+        """
+        PayrollTotals from January 1st of on_date's year (today by default) up to on_date.
+        """
+        on_date = np.datetime64('today', 'D') if on_date is None else np.datetime64(on_date, 'D')
+        return self.totals(on_date.astype('datetime64[Y]'), on_date, employee)
+
+
+
+
+    def add(self, employee, dates, start_minutes, end_minutes, pay, travel_charge, flags=None):
+        """
+        Archive calculated shifts of one employee, taking the place of whatever was archived
+        for the days from the first to the last of them. Takes the same columns as
+        PayrollStore.add_shifts, without the roles.
+        """
+        days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+        if not len(days):
+            return
+        new = np.zeros(len(days), dtype=RECORD_DTYPE)
+        new['day'] = days
+        new['start_minute'] = start_minutes
+        new['end_minute'] = end_minutes
+        worked = (new['end_minute'].astype(np.int32) - new['start_minute']) % MINUTES_PER_DAY
+        new['worked_minutes'] = np.where(worked == 0, MINUTES_PER_DAY, worked)
+        new['flags'] = 0 if flags is None else flags
+        new['pay'] = pay
+        new['travel_charge'] = travel_charge
+        new = new[np.argsort(new['day'], kind='stable')]
+
+        records = self.records(employee)
+        start, stop = self._range(records, int(new['day'][0]), int(new['day'][-1]))
+        # what comes after the replaced days has to move, usually nothing
+        merged = np.concatenate([new, np.array(records[stop:])])
+
+        for field, running in (('pay', 'total_pay'), ('worked_minutes', 'total_minutes'),
+                               ('travel_charge', 'total_travel_charge')):
+            before = int(records[start - 1][running]) if start else 0
+            merged[running] = np.cumsum(merged[field], dtype=np.int64) + before
+
+        path = self._path(employee)
+        # let go of the mapping before the file changes, Windows won't replace or resize a mapped file
+        self._maps.pop(employee, None)
+        append = start == len(records) and os.path.exists(path)
+        kept = b'' if append else records[:start].tobytes()
+        del records
+        if append:
+            self._append(path, start, merged)
+        else:
+            self._rewrite(path, kept, merged)
+
+
+
+
+    def _append(self, path, count, new):
+        """
+        Write records after the first count records of an archive file, over a record cut
+        short by an earlier crash if there is one.
+        """
+        with open(path, 'r+b') as f:
+            f.seek(HEADER_BYTES + count * RECORD_DTYPE.itemsize)
+            f.write(new.tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+
+
+
+    def _rewrite(self, path, kept, new):
+        """
+        Write a whole archive file, the bytes of the records kept and then the new ones,
+        and swap it in for the old file.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(MAGIC.ljust(HEADER_BYTES, b'\0'))
+                f.write(kept)
+                f.write(new.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+
+
+    def add_shift_table(self, employee, shifts):
+        """
+        Archive every row of a calculated ShiftTable.
+        """
+        if len(shifts.dirty_rows()):
+            raise ValueError("Calculate the pay of every shift before archiving.")
+        self.add(employee, shifts.date, shifts.start_minute, shifts.end_minute, shifts.pay,
+                 shifts.travel_charge, shifts.flags)
+
+
+
+
+    def add_payroll_store(self, store):
+        """
+        Archive the shifts of every employee in a PayrollStore.
+        """
+        employee_ids = store.column('employee')
+        for employee_id, employee in enumerate(store.employees):
+            rows = employee_ids == employee_id
+            self.add(employee, store.column('day')[rows].astype('datetime64[D]'), store.column('start_minute')[rows],
+                     store.column('end_minute')[rows], store.column('pay')[rows],
+                     store.column('travel_charge')[rows], store.column('flags')[rows])
+
+
+
+
+def run_query(first_date=None, last_date=None, employee=None, year_to_date=False, directory=None):
+    """
+    Print the archived totals between two dates (or year to date) for `python -m salary_calc query`,
+    one line per employee and the team total.
+    """
+    try:
+        first_date, last_date = (datetime.strptime(value, '%Y-%m-%d').date() if isinstance(value, str) else value
+                                 for value in (first_date, last_date))
+    except ValueError:
+        print("Dates must be real dates written as YYYY-MM-DD", file=sys.stderr)
+        return 2
+
+    archive = PayrollArchive(directory)
+    if year_to_date:
+        on_date = np.datetime64('today', 'D') if last_date is None else np.datetime64(last_date, 'D')
+        first_date, last_date = on_date.astype('datetime64[Y]').astype('datetime64[D]'), on_date
+
+    employees = [employee] if employee is not None else archive.employees()
+    if not employees:
+        print(f"Nothing is archived in {archive.directory}")
+        return 1
+
+    print(f"{'Employee':<24} {'Shifts':>7} {'Hours':>10} {'Pay':>12} {'Travel':>10} {'Total':>12}")
+    rows = [(name, archive.employee_totals(name, first_date, last_date)) for name in employees]
+    if employee is None:
+        rows.append((TEAM_TOTAL_LABEL, PayrollTotals(*(sum(values) for values in zip(*(totals for _, totals in rows))))))
+    for name, totals in rows:
+        print(f"{name:<24} {totals.shifts:>7} {totals.minutes / 60:>10.2f} {format_agorot(totals.pay):>12} "
+              f"{format_agorot(totals.travel_charge):>10} {format_agorot(totals.pay + totals.travel_charge):>12}")
+    return 0
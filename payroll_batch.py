@@ -0,0 +1,174 @@
+"""
+Headless payroll runs over a directory of ShiftOrganizer exports.
+Every file is one employee, and files are spread across a process pool so a
+month-end run uses every core. The calculated shifts are collected in a
+PayrollStore, which the summaries are read from.
+"""
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from salary_calc import SalaryCalculator
+from shift_reader import iter_shift_records
+from shift_cache import ShiftCache
+from shift_normalize import rejection_report, format_rejections
+from shift_table import ShiftTable
+from shift_flags import FLAG_CONTROL_ROOM
+from holiday_calendar import apply_holiday_flags
+from shift_validation import find_shift_issues, merge_shift_table, format_shift_issues
+from payroll_store import PayrollStore, TEAM_TOTAL_LABEL
+from session_store import employee_name
+from units import format_agorot
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+SUMMARY_FIELDS = ['Employee', 'Shifts', 'Hours Worked', 'Pay', 'Travel Charge', 'Total']
+
+
+
+def find_shift_files(directory):
+    """
+    List the Excel files in a directory, sorted by name.
+    """
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith(EXCEL_EXTENSIONS) and not name.startswith('~$')  # skip Excel lock files
+    )
+
+
+
+def calculate_file(file_path, in_control_room=False, engine='auto', use_cache=True, holidays=True,
+                   merge_overlaps=False):
+    """
+    Calculate the pay for every shift in one export, with duplicate and overlapping
+    shifts merged first if merge_overlaps is set.
+    Runs in a worker process, so it only takes and returns picklable values: the
+    employee's name, the PayrollStore.add_shifts columns of the calculated shifts and
+    the RejectedRows that were left out.
+    """
+    records = ShiftCache().load(file_path, engine) if use_cache else list(iter_shift_records(file_path, engine))
+    shifts = ShiftTable.from_records(records)
+    if merge_overlaps:
+        shifts = merge_shift_table(shifts)
+    shifts.set_flag(FLAG_CONTROL_ROOM, in_control_room)
+    if holidays:
+        apply_holiday_flags(shifts)
+    shifts.recalculate(SalaryCalculator())
+
+    return employee_name(file_path), {
+        'dates': shifts.date,
+        'start_minutes': shifts.start_minute,
+        'end_minutes': shifts.end_minute,
+        'pay': shifts.pay,
+        'travel_charge': shifts.travel_charge,
+        'flags': shifts.flags,
+        'roles': shifts.role,
+    }, rejection_report(records)
+
+
+
+def _summary_row(employee, totals, period=None):
+    """
+    Format one line of the summary CSV from PayrollTotals.
+    """
+    row = {
+        'Employee': employee,
+        'Shifts': totals.shifts,
+        'Hours Worked': f"{totals.minutes / 60:.2f}",
+        'Pay': format_agorot(totals.pay),
+        'Travel Charge': format_agorot(totals.travel_charge),
+        'Total': format_agorot(totals.pay + totals.travel_charge),
+    }
+    if period is not None:
+        row['Period'] = period
+    return row
+
+
+
+def write_summary(output_path, store, group_by='employee'):
+    """
+    Write the totals of a PayrollStore to a CSV file: one row per employee, or per
+    employee and week or month, plus the team total.
+    """
+    if group_by == 'employee':
+        fieldnames = SUMMARY_FIELDS
+        rows = [_summary_row(employee, totals) for employee, totals in store.employee_totals().items()]
+    else:
+        fieldnames = SUMMARY_FIELDS[:1] + ['Period'] + SUMMARY_FIELDS[1:]
+        groups = store.weekly_totals() if group_by == 'week' else store.monthly_totals()
+        rows = [_summary_row(employee, totals, str(period)) for (employee, period), totals in groups.items()]
+    rows.append(_summary_row(TEAM_TOTAL_LABEL, store.total(), '' if group_by != 'employee' else None))
+
+    with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+
+def report_shift_issues(store, limit=10):
+    """
+    Check every employee's shifts in a PayrollStore for duplicates, overlaps and short gaps
+    in one sweep, and print what was found on stderr. Returns the ShiftIssues.
+    """
+    employee_ids = store.column('employee')
+    dates = store.column('day').astype('datetime64[D]')
+    issues = find_shift_issues(dates, store.column('start_minute'), store.column('end_minute'), employee_ids)
+    if len(issues.kind):
+        print(format_shift_issues(issues, dates, store.column('start_minute'), store.column('end_minute'), limit,
+                                  lambda row: store.employees[employee_ids[row]]), file=sys.stderr)
+    return issues
+
+
+
+def run_batch(directory, output_path=None, workers=None, in_control_room=False, engine='auto', use_cache=True,
+              holidays=True, group_by='employee', export_path=None, archive=False, merge_overlaps=False):
+    """
+    Calculate every export in a directory on a process pool and write the team summary,
+    grouped by employee, week or month. With export_path, every calculated shift is
+    also exported there (CSV, XLSX or Parquet by extension), and with archive they're
+    added to the payroll archive for later date-range queries.
+    Duplicate, overlapping and suspiciously close shifts are reported on stderr, and with
+    merge_overlaps the duplicates and overlaps are merged before they're calculated.
+    Files that fail to load are reported on stderr and left out of the summary.
+    Returns the number of failed files.
+    """
+    if export_path:
+        # fail before calculating anything if the format isn't supported
+        from payroll_export import export_format
+        export_format(export_path)
+    file_paths = find_shift_files(directory)
+    if output_path is None:
+        output_path = os.path.join(directory, 'team_summary.csv')
+
+    store = PayrollStore()
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(calculate_file, path, in_control_room, engine, use_cache, holidays,
+                                   merge_overlaps) for path in file_paths]
+        for path, future in zip(file_paths, futures):
+            try:
+                employee, columns, rejected = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"Error processing {path}: {e}", file=sys.stderr)
+                continue
+            if rejected:
+                print(f"{path}: {format_rejections(rejected, limit=3)}", file=sys.stderr)
+            store.employee_id(employee)  # employees without shifts still get a row
+            store.add_shifts(employee, **columns)
+
+    report_shift_issues(store)
+    write_summary(output_path, store, group_by)
+    print(f"Wrote {len(store.employees)} employee summaries to {output_path}")
+    if export_path:
+        # imported here so runs without an export don't load it
+        from payroll_export import export_payroll_store
+        export_payroll_store(export_path, store)
+        print(f"Exported {len(store)} shifts to {export_path}")
+    if archive:
+        from payroll_archive import PayrollArchive
+        payroll_archive = PayrollArchive()
+        payroll_archive.add_payroll_store(store)
+        print(f"Archived {len(store)} shifts in {payroll_archive.directory}")
+    return failures
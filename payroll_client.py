@@ -0,0 +1,97 @@
+"""
+Client for the local payroll service (payroll_service.py), using only the standard library.
+
+    client = PayrollClient(port=8765)
+    client.calculate_shift('2024-05-10', '16:00', '23:30')
+    -> {'pay_agorot': 57713, 'travel_charge_agorot': 4000}
+"""
+import http.client
+import json
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+
+class PayrollServiceError(Exception):
+    """
+    Raised when the service answers with an error.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+
+class PayrollClient:
+    """
+    Keeps one keep-alive connection to the service. Not thread safe, use one client per thread.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=30):
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            # the server closed the idle connection, try once more on a new one
+            self.connection.close()
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+
+        result = json.loads(response.read() or b'null')
+        if response.status != 200:
+            raise PayrollServiceError(response.status, (result or {}).get('error', response.reason))
+        return result
+
+
+
+
+    def health(self):
+        return self._request('GET', '/health')
+
+
+
+
+    def calculate(self, shifts):
+        """
+        Pay and travel charge in agorot of a list of shift dicts, in the same order.
+        """
+        return self._request('POST', '/calculate', {'shifts': list(shifts)})['shifts']
+
+
+
+
+    def calculate_shift(self, date, start, end, control_room=False, **holiday_flags):
+        """
+        Pay and travel charge in agorot of a single shift. The holiday flags
+        (holiday_eve, holiday, last_day_of_holiday) default to the holiday calendar.
+        """
+        shift = {'date': str(date), 'start': start, 'end': end, 'control_room': control_room, **holiday_flags}
+        return self._request('POST', '/calculate', shift)
+
+
+
+
+    def close(self):
+        self.connection.close()
+
+
+
+
+    def __enter__(self):
+        return self
+
+
+
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,247 @@
+"""
+Export calculated shifts and their totals to CSV, XLSX or Parquet.
+
+The shifts are read from a ShiftTable or a PayrollStore in chunks and each chunk
+is written out before the next one is formatted, so memory stays the same for a
+thousand rows or a year-end report with hundreds of thousands:
+- CSV is written row by row, with the totals after the shifts
+- XLSX uses openpyxl's write_only mode, with the totals on a second sheet
+- Parquet needs pyarrow and is written one row group per chunk. It keeps the raw
+  types (minutes and agorot), and the totals go in the file's metadata.
+"""
+import calendar
+import csv
+import importlib.util
+import json
+import os
+
+import numpy as np
+
+from payroll_store import PayrollTotals, TEAM_TOTAL_LABEL
+from shift_flags import FLAG_CONTROL_ROOM
+from units import format_agorot, format_minutes, AGOROT_PER_SHEKEL
+
+CHUNK_ROWS = 10000
+
+SHIFT_FIELDS = ['Employee', 'Date', 'Day of Week', 'Role', 'Entry Time', 'Exit Time', 'Control Room',
+                'Hours Worked', 'Pay', 'Travel Charge']
+TOTAL_FIELDS = ['Name', 'Shifts', 'Hours Worked', 'Pay', 'Travel Charge', 'Total']
+
+DAY_NAMES = np.array([calendar.day_name[weekday] for weekday in range(7)])
+TIME_LABELS = np.array([format_minutes(minute) for minute in range(1440)])
+
+
+
+def shift_table_chunks(shifts, employee='', chunk_rows=CHUNK_ROWS):
+    """
+    Yield the rows of a ShiftTable as export chunks. Every row must be calculated.
+    """
+    if len(shifts.dirty_rows()):
+        raise ValueError("Calculate the pay of every shift before exporting.")
+    for start in range(0, len(shifts), chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        yield {
+            'employee': [employee] * len(shifts.date[rows]),
+            'date': shifts.date[rows],
+            'role': shifts.role[rows],
+            'start_minute': shifts.start_minute[rows],
+            'end_minute': shifts.end_minute[rows],
+            'worked_minutes': shifts.worked_minutes(rows),
+            'control_room': shifts.has_flag(FLAG_CONTROL_ROOM, rows),
+            'pay': shifts.pay[rows],
+            'travel_charge': shifts.travel_charge[rows],
+        }
+
+
+
+def shift_table_totals(shifts, label='Total'):
+    return [(label, PayrollTotals(len(shifts), shifts.total_minutes(), shifts.total_pay(), shifts.total_travel_charge()))]
+
+
+
+def payroll_store_chunks(store, chunk_rows=CHUNK_ROWS):
+    """
+    Yield the shifts of a PayrollStore as export chunks.
+    """
+    names = np.array(store.employees, dtype=object)
+    roles = np.array(store.roles, dtype=object)
+    for start in range(0, len(store), chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        yield {
+            'employee': names[store.column('employee')[rows]].tolist(),
+            'date': store.column('day')[rows].astype('datetime64[D]'),
+            'role': roles[store.column('role')[rows]].tolist(),
+            'start_minute': store.column('start_minute')[rows],
+            'end_minute': store.column('end_minute')[rows],
+            'worked_minutes': store.column('worked_minutes')[rows],
+            'control_room': (store.column('flags')[rows] & FLAG_CONTROL_ROOM) != 0,
+            'pay': store.column('pay')[rows],
+            'travel_charge': store.column('travel_charge')[rows],
+        }
+
+
+
+def payroll_store_totals(store):
+    return list(store.employee_totals().items()) + [(TEAM_TOTAL_LABEL, store.total())]
+
+
+
+def _weekday_names(dates):
+    # 1970-01-01 was a Thursday
+    return DAY_NAMES[(dates.astype(np.int64) + 3) % 7]
+
+
+
+def _total_row(name, totals):
+    return [name, totals.shifts, f"{totals.minutes / 60:.2f}", format_agorot(totals.pay),
+            format_agorot(totals.travel_charge), format_agorot(totals.pay + totals.travel_charge)]
+
+
+
+def _write_csv(path, chunks, totals):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(SHIFT_FIELDS)
+        for chunk in chunks:
+            writer.writerows(zip(
+                chunk['employee'],
+                np.datetime_as_string(chunk['date']).tolist(),
+                _weekday_names(chunk['date']).tolist(),
+                chunk['role'],
+                TIME_LABELS[chunk['start_minute']].tolist(),
+                TIME_LABELS[chunk['end_minute']].tolist(),
+                np.where(chunk['control_room'], 'Yes', 'No').tolist(),
+                [f"{minutes / 60:.2f}" for minutes in chunk['worked_minutes'].tolist()],
+                [format_agorot(pay) for pay in chunk['pay'].tolist()],
+                [format_agorot(charge) for charge in chunk['travel_charge'].tolist()],
+            ))
+
+        writer.writerow([])
+        writer.writerow(TOTAL_FIELDS)
+        writer.writerows(_total_row(name, total) for name, total in totals)
+
+
+
+def _write_xlsx(path, chunks, totals):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Shifts')
+
+    def money(value):
+        cell = WriteOnlyCell(sheet, value=value / AGOROT_PER_SHEKEL)
+        cell.number_format = '0.00'
+        return cell
+
+    sheet.append(SHIFT_FIELDS)
+    for chunk in chunks:
+        for row in zip(
+            chunk['employee'],
+            chunk['date'].tolist(),
+            _weekday_names(chunk['date']).tolist(),
+            chunk['role'],
+            TIME_LABELS[chunk['start_minute']].tolist(),
+            TIME_LABELS[chunk['end_minute']].tolist(),
+            np.where(chunk['control_room'], 'Yes', 'No').tolist(),
+            (chunk['worked_minutes'] / 60).round(2).tolist(),
+            chunk['pay'].tolist(),
+            chunk['travel_charge'].tolist(),
+        ):
+            sheet.append(row[:8] + (money(row[8]), money(row[9])))
+
+    totals_sheet = workbook.create_sheet('Totals')
+    totals_sheet.append(TOTAL_FIELDS)
+    for name, total in totals:
+        totals_sheet.append([name, total.shifts, round(total.minutes / 60, 2), money(total.pay),
+                             money(total.travel_charge), money(total.pay + total.travel_charge)])
+    workbook.save(path)
+
+
+
+def _write_parquet(path, chunks, totals):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow, please install it.") from None
+
+    metadata = {'payroll_totals': json.dumps({name: total._asdict() for name, total in totals})}
+    schema = pa.schema([
+        ('employee', pa.string()),
+        ('date', pa.date32()),
+        ('role', pa.string()),
+        ('entry_minute', pa.int16()),
+        ('exit_minute', pa.int16()),
+        ('control_room', pa.bool_()),
+        ('worked_minutes', pa.int16()),
+        ('pay_agorot', pa.int64()),
+        ('travel_charge_agorot', pa.int64()),
+    ], metadata=metadata)
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.table([
+                pa.array(chunk['employee'], pa.string()),
+                pa.array(chunk['date'], pa.date32()),
+                pa.array(chunk['role'], pa.string()),
+                pa.array(chunk['start_minute'], pa.int16()),
+                pa.array(chunk['end_minute'], pa.int16()),
+                pa.array(chunk['control_room'], pa.bool_()),
+                pa.array(chunk['worked_minutes'], pa.int16()),
+                pa.array(chunk['pay'], pa.int64()),
+                pa.array(chunk['travel_charge'], pa.int64()),
+            ], schema=schema))
+
+
+
+WRITERS = {
+    'csv': _write_csv,
+    'xlsx': _write_xlsx,
+    'parquet': _write_parquet,
+}
+
+
+
+def export_format(path):
+    """
+    The export format a file name asks for, from its extension.
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension not in WRITERS:
+        raise ValueError(f"Can't export to '{extension}' files, choose from: {', '.join(WRITERS)}")
+    if extension == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        raise ImportError("Parquet export needs pyarrow, please install it.")
+    return extension
+
+
+
+def export_payroll(path, chunks, totals, file_format=None):
+    """
+    Stream export chunks and totals to a file. The file is written under a temporary
+    name and only replaces path once it's complete.
+    """
+    writer = WRITERS[file_format or export_format(path)]
+    temp_path = f"{path}.tmp"
+    try:
+        writer(temp_path, chunks, totals)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+
+def export_shift_table(path, shifts, employee='', file_format=None):
+    """
+    Export the shifts of one ShiftTable, with its total.
+    """
+    export_payroll(path, shift_table_chunks(shifts, employee), shift_table_totals(shifts), file_format)
+
+
+
+def export_payroll_store(path, store, file_format=None):
+    """
+    Export every shift in a PayrollStore, with each employee's total and the team total.
+    """
+    export_payroll(path, payroll_store_chunks(store), payroll_store_totals(store), file_format)
@@ -0,0 +1,383 @@
+"""
+Local HTTP/JSON service around SalaryCalculator, so other tools can get pay
+figures without the GUI.
+
+    python -m salary_calc serve --port 8765
+
+POST /calculate takes one shift object, a list of them, or {"shifts": [...]}:
+
+    {"date": "2024-05-10", "start": "16:00", "end": "23:30", "control_room": false}
+
+The holiday flags (holiday_eve, holiday, last_day_of_holiday) come from the
+holiday calendar unless they are given. Each shift comes back with its pay and
+travel charge in agorot. GET /health answers {"status": "ok"}.
+
+Requests that arrive together are queued and calculated as one compute_batch
+call, so many small requests cost about as much as one big one.
+"""
+import asyncio
+import json
+import sys
+from http import HTTPStatus
+
+import numpy as np
+
+from holiday_calendar import holiday_calendar
+from payroll_client import DEFAULT_HOST, DEFAULT_PORT
+from rate_tables import default_rate_table
+from salary_calc import SalaryCalculator
+from shift_flags import FLAG_HOLIDAY_EVE, FLAG_HOLIDAY, FLAG_LAST_DAY_OF_HOLIDAY
+from units import parse_clock
+
+# a batch is calculated once it has this many shifts, or this long after its first request arrived
+MAX_BATCH_ROWS = 50000
+MAX_BATCH_DELAY = 0.002
+
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+# shifts can be dated up to this many years past the last rate version or this year, whichever is later,
+# so a request can't make the holiday calendar be built for thousands of years
+MAX_YEARS_AHEAD = 10
+
+HOLIDAY_FIELDS = {
+    'holiday_eve': FLAG_HOLIDAY_EVE,
+    'holiday': FLAG_HOLIDAY,
+    'last_day_of_holiday': FLAG_LAST_DAY_OF_HOLIDAY,
+}
+
+
+
+class BadRequest(ValueError):
+    """
+    Raised for a request the service can't calculate, answered with 400.
+    """
+
+
+
+def _check_dates(dates, rate_table):
+    """
+    Raise BadRequest naming the first shift dated before the first pay rates or too far ahead.
+    """
+    first_day = rate_table.effective_from[0]
+    last_year = max(rate_table.effective_from[-1].astype('datetime64[Y]'), np.datetime64('today', 'Y')) + MAX_YEARS_AHEAD
+    last_day = (last_year + 1).astype('datetime64[D]') - 1
+    outside = np.flatnonzero((dates < first_day) | (dates > last_day))
+    if len(outside):
+        index = int(outside[0])
+        raise BadRequest(f"Shift {index}: date {dates[index]} is outside {first_day} to {last_day}")
+
+
+
+def _flag(shift, field, index):
+    """
+    A true/false field of a shift, false when it's missing or null. Anything but a JSON
+    bool is a BadRequest, so "false" as a string isn't taken as true.
+    """
+    value = shift.get(field)
+    if value is None:
+        return False
+    if not isinstance(value, bool):
+        raise BadRequest(f"Shift {index}: {field} must be true or false, not {value!r}")
+    return value
+
+
+
+def shifts_to_batch(shifts, rate_table=None):
+    """
+    Convert shift objects from a request to the compute_batch arguments, checking the
+    dates against the rate table (the default one if not given).
+    Raises BadRequest naming the first shift that isn't valid.
+    """
+    count = len(shifts)
+    dates = np.empty(count, dtype='datetime64[D]')
+    start = np.empty(count, dtype=np.int64)
+    end = np.empty(count, dtype=np.int64)
+    control_room = np.zeros(count, dtype=bool)
+    given = {field: np.zeros(count, dtype=bool) for field in HOLIDAY_FIELDS}
+    given_values = {field: np.zeros(count, dtype=bool) for field in HOLIDAY_FIELDS}
+
+    for index, shift in enumerate(shifts):
+        try:
+            # None and "NaT" would both become NaT, which has no year for the calendar
+            if not isinstance(shift['date'], str):
+                raise TypeError(f"date must be a string, not {shift['date']!r}")
+            dates[index] = np.datetime64(shift['date'], 'D')
+            if np.isnat(dates[index]):
+                raise ValueError(f"date {shift['date']!r} is not a date")
+            start[index] = parse_clock(shift['start'])
+            end[index] = parse_clock(shift['end'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise BadRequest(f"Shift {index}: needs a date (YYYY-MM-DD), a start and an end (HH:MM): {e}") from e
+        control_room[index] = _flag(shift, 'control_room', index)
+        for field in HOLIDAY_FIELDS:
+            if shift.get(field) is not None:
+                given[field][index] = True
+                given_values[field][index] = _flag(shift, field, index)
+
+    if count:
+        _check_dates(dates, rate_table or default_rate_table())
+
+    # the calendar fills in the holiday flags the request didn't set
+    if count:
+        years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+        calendar_flags = holiday_calendar(int(years.min()), int(years.max())).flags_for(dates)
+    else:
+        calendar_flags = np.zeros(0, dtype=np.uint8)
+    holiday_flags = [
+        np.where(given[field], given_values[field], (calendar_flags & flag) != 0)
+        for field, flag in HOLIDAY_FIELDS.items()
+    ]
+    return (dates, start, end, control_room, *holiday_flags)
+
+
+
+def parse_shifts(body):
+    """
+    The list of shift objects in a request body, and whether it was a single shift.
+    """
+    try:
+        payload = json.loads(body)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise BadRequest(f"Body is not valid JSON: {e}") from e
+
+    if isinstance(payload, dict) and 'shifts' in payload:
+        payload = payload['shifts']
+    elif isinstance(payload, dict):
+        return [payload], True
+    if not isinstance(payload, list) or not all(isinstance(shift, dict) for shift in payload):
+        raise BadRequest("Body must be a shift object, a list of shifts or {\"shifts\": [...]}")
+    return payload, False
+
+
+
+class ShiftBatcher:
+    """
+    Groups the shifts of concurrent requests into one compute_batch call.
+    The first request to arrive opens a batch, which is calculated after MAX_BATCH_DELAY
+    or as soon as it holds MAX_BATCH_ROWS shifts, on a worker thread so the event loop
+    keeps accepting requests meanwhile.
+    """
+
+    def __init__(self, salary_calculator, max_rows=MAX_BATCH_ROWS, max_delay=MAX_BATCH_DELAY):
+        self.salary_calculator = salary_calculator
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.pending = []  # (batch arguments, future)
+        self.pending_rows = 0
+        self.flush_handle = None
+        self.batches = 0
+        self.requests = 0
+
+
+
+
+    async def calculate(self, batch):
+        """
+        Queue the compute_batch arguments of one request and wait for its (pay, travel_charge).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((batch, future))
+        self.pending_rows += len(batch[0])
+        self.requests += 1
+
+        if self.pending_rows >= self.max_rows:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+
+
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        pending, self.pending, self.pending_rows = self.pending, [], 0
+        if pending:
+            self.batches += 1
+            asyncio.get_running_loop().create_task(self._run(pending))
+
+
+
+
+    async def _run(self, pending):
+        """
+        Calculate a batch and hand every request its slice of the results.
+        """
+        arguments = [np.concatenate(column) for column in zip(*(batch for batch, _ in pending))]
+        try:
+            pay, travel_charge = await asyncio.get_running_loop().run_in_executor(
+                None, self.salary_calculator.compute_batch, *arguments)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for batch, future in pending:
+            rows = slice(offset, offset + len(batch[0]))
+            offset = rows.stop
+            if not future.done():  # the client may have gone away
+                future.set_result((pay[rows], travel_charge[rows]))
+
+
+
+class PayrollService:
+    """
+    The HTTP side: a minimal HTTP/1.1 server with keep-alive on asyncio streams.
+    """
+
+    def __init__(self, salary_calculator=None, batcher=None):
+        self.batcher = batcher or ShiftBatcher(salary_calculator or SalaryCalculator())
+
+
+
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self.handle_request(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except BadRequest as e:
+            self._write_response(writer, HTTPStatus.BAD_REQUEST, {'error': str(e)}, keep_alive=False)
+        finally:
+            writer.close()
+
+
+
+
+    async def _read_request(self, reader):
+        """
+        Read one request, or return None when the client closed the connection.
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise BadRequest("Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise BadRequest("Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(f"Body is larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method, path.split('?', 1)[0], headers, body
+
+
+
+
+    async def handle_request(self, method, path, body):
+        """
+        Route a request, returns (status, JSON payload).
+        """
+        if path == '/health':
+            return HTTPStatus.OK, {'status': 'ok', 'requests': self.batcher.requests, 'batches': self.batcher.batches}
+        if path != '/calculate':
+            return HTTPStatus.NOT_FOUND, {'error': f"Unknown path {path}"}
+        if method != 'POST':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Use POST"}
+
+        try:
+            # parsing is a Python loop over the shifts plus the holiday calendar, done on a worker
+            # thread so a big request doesn't hold up the other clients
+            shifts, single, batch = await asyncio.get_running_loop().run_in_executor(None, self._read_shifts, body)
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        except Exception as e:
+            # answered rather than dropping the connection
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"Error reading the shifts: {e}"}
+
+        try:
+            pay, travel_charge = await self.batcher.calculate(batch) if shifts else ([], [])
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"Error calculating pay: {e}"}
+
+        results = [
+            {'pay_agorot': shift_pay, 'travel_charge_agorot': shift_travel_charge}
+            for shift_pay, shift_travel_charge in zip(np.asarray(pay).tolist(), np.asarray(travel_charge).tolist())
+        ]
+        return HTTPStatus.OK, results[0] if single else {'shifts': results}
+
+
+
+
+    def _read_shifts(self, body):
+        """
+        The shifts of a request body, whether it was a single shift, and their compute_batch arguments.
+        """
+        shifts, single = parse_shifts(body)
+        # the dates are checked against the rates here, so one request with a date before the
+        # first pay rates can't fail the other requests batched with it
+        return shifts, single, shifts_to_batch(shifts, self.batcher.salary_calculator.rate_table)
+
+
+
+
+    @staticmethod
+    def _write_response(writer, status, payload, keep_alive=True):
+        body = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n".encode('latin-1') + body
+        )
+
+
+
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Start listening, returns the asyncio server. Port 0 picks a free port.
+        """
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Run the service until it's interrupted.
+    """
+    server = await PayrollService().start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Payroll service listening on http://{address[0]}:{address[1]}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+
+def run_service(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Blocking entry point for `python -m salary_calc serve`.
+    """
+    try:
+        asyncio.run(serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,291 @@
+"""
+Calculated shifts of many employees in one columnar store.
+
+Shifts are appended to typed numpy columns (about 31 bytes a shift), and the
+per-employee, per-week and per-month totals are kept up to date as they are
+added, so totals and group-by queries never walk the shifts.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from units import MINUTES_PER_DAY
+
+INITIAL_CAPACITY = 1024
+
+# minutes and money are in minutes and agorot, like the rest of the calculation
+PayrollTotals = namedtuple('PayrollTotals', ['shifts', 'minutes', 'pay', 'travel_charge'])
+
+EMPTY_TOTALS = PayrollTotals(0, 0, 0, 0)
+
+TEAM_TOTAL_LABEL = 'Team Total'
+
+COLUMN_TYPES = {
+    'employee': np.int32,
+    'role': np.int32,  # index into PayrollStore.roles
+    'day': np.int32,  # days since 1970-01-01
+    'start_minute': np.int16,
+    'end_minute': np.int16,
+    'worked_minutes': np.int16,
+    'flags': np.uint8,  # the shift_flags bits
+    'pay': np.int64,
+    'travel_charge': np.int32,
+}
+
+
+
+def week_start(days):
+    """
+    The Sunday that starts the week of each day, in days since 1970-01-01.
+    """
+    # 1970-01-01 was a Thursday, 3 days after a Sunday
+    days = np.asarray(days, dtype=np.int64)
+    return days - (days + 4) % 7
+
+
+
+def month_index(days):
+    """
+    Months since January 1970 of each day.
+    """
+    return np.asarray(days, dtype='datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+
+class PayrollStore:
+    """
+    Append-only store of calculated shifts for a team. Employees and roles are added
+    by name and get a small integer id, which is what the columns hold.
+    """
+
+    def __init__(self):
+        self.employees = []
+        self._employee_ids = {}
+        self.roles = []
+        self._role_ids = {}
+        self._size = 0
+        self._columns = {name: np.zeros(INITIAL_CAPACITY, dtype=dtype) for name, dtype in COLUMN_TYPES.items()}
+
+        # running sums of [shifts, minutes, pay, travel_charge]
+        self._team = [0, 0, 0, 0]
+        self._by_employee = {}
+        self._by_week = {}  # employee id -> {week start day: sums}
+        self._by_month = {}  # employee id -> {months since 1970-01: sums}
+
+
+
+
+    def __len__(self):
+        return self._size
+
+
+
+
+    def column(self, name):
+        """
+        A read-only view of one column, trimmed to the stored shifts.
+        """
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+
+
+
+    def nbytes(self):
+        """
+        Memory used by the stored shifts, not counting spare capacity.
+        """
+        return sum(np.dtype(dtype).itemsize for dtype in COLUMN_TYPES.values()) * self._size
+
+
+
+
+    def employee_id(self, name):
+        """
+        The id of an employee, added on first use.
+        """
+        if name not in self._employee_ids:
+            self._employee_ids[name] = len(self.employees)
+            self.employees.append(name)
+        return self._employee_ids[name]
+
+
+
+
+    def role_id(self, name):
+        """
+        The id of a role, added on first use.
+        """
+        if name not in self._role_ids:
+            self._role_ids[name] = len(self.roles)
+            self.roles.append(name)
+        return self._role_ids[name]
+
+
+
+
+    def _reserve(self, extra):
+        """
+        Grow the columns, doubling their size, so there is room for extra more shifts.
+        """
+        needed = self._size + extra
+        capacity = len(self._columns['day'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, values in self._columns.items():
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+
+
+
+    def add_shifts(self, employee, dates, start_minutes, end_minutes, pay, travel_charge, flags=None, roles=None):
+        """
+        Append calculated shifts of one employee and fold them into the totals.
+        The arguments are arrays of the same length, pay and travel charge in agorot,
+        flags are the shift_flags bits of each shift (none by default) and roles the
+        role names (empty by default).
+        Updating the totals costs one pass over the new shifts plus one step per
+        week and month they fall in.
+        """
+        days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+        start = np.asarray(start_minutes, dtype=np.int64)
+        end = np.asarray(end_minutes, dtype=np.int64)
+        pay = np.asarray(pay, dtype=np.int64)
+        travel_charge = np.asarray(travel_charge, dtype=np.int64)
+        count = len(days)
+        if not count:
+            return
+
+        worked_minutes = (end - start) % MINUTES_PER_DAY
+        worked_minutes[worked_minutes == 0] = MINUTES_PER_DAY
+
+        employee = self.employee_id(employee)
+        self._reserve(count)
+        new = slice(self._size, self._size + count)
+        self._columns['employee'][new] = employee
+        self._columns['day'][new] = days
+        self._columns['start_minute'][new] = start
+        self._columns['end_minute'][new] = end
+        self._columns['worked_minutes'][new] = worked_minutes
+        self._columns['flags'][new] = 0 if flags is None else np.asarray(flags, dtype=np.uint8)
+        # a role id per distinct name, not per shift
+        role_names, role_index = np.unique(np.asarray([''] if roles is None else list(roles), dtype=str),
+                                           return_inverse=True)
+        role_ids = np.array([self.role_id(name) for name in role_names.tolist()], dtype=np.int32)
+        self._columns['role'][new] = role_ids[role_index.reshape(-1)]
+        self._columns['pay'][new] = pay
+        self._columns['travel_charge'][new] = travel_charge
+        self._size += count
+
+        sums = (count, int(worked_minutes.sum()), int(pay.sum()), int(travel_charge.sum()))
+        self._add_to(self._team, sums)
+        self._add_to(self._by_employee.setdefault(employee, [0, 0, 0, 0]), sums)
+        self._add_groups(self._by_week, employee, week_start(days), worked_minutes, pay, travel_charge)
+        self._add_groups(self._by_month, employee, month_index(days), worked_minutes, pay, travel_charge)
+
+
+
+
+    def add_shift_table(self, employee, shifts):
+        """
+        Append every calculated row of a ShiftTable. Rows that still need calculating are left out.
+        """
+        rows = np.flatnonzero(~shifts.dirty)
+        self.add_shifts(employee, shifts.date[rows], shifts.start_minute[rows], shifts.end_minute[rows],
+                        shifts.pay[rows], shifts.travel_charge[rows], shifts.flags[rows],
+                        [shifts.role[row] for row in rows.tolist()])
+
+
+
+
+    @staticmethod
+    def _add_to(running, sums):
+        for index, value in enumerate(sums):
+            running[index] += value
+
+
+
+
+    def _add_groups(self, groups, employee, keys, worked_minutes, pay, travel_charge):
+        """
+        Sum the new shifts per key and add the sums to the running totals of each group.
+        """
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        shifts = np.bincount(inverse)
+        minutes = np.bincount(inverse, weights=worked_minutes)
+        # bincount weights are floats, agorot sums are exact in float64 far beyond any payroll
+        pay_sums = np.bincount(inverse, weights=pay).round().astype(np.int64)
+        travel_sums = np.bincount(inverse, weights=travel_charge).round().astype(np.int64)
+        employee_groups = groups.setdefault(employee, {})
+        for group, key in enumerate(unique_keys.tolist()):
+            running = employee_groups.setdefault(key, [0, 0, 0, 0])
+            self._add_to(running, (int(shifts[group]), int(minutes[group]), int(pay_sums[group]), int(travel_sums[group])))
+
+
+
+
+    def total(self):
+        """
+        Totals for the whole team.
+        """
+        return PayrollTotals(*self._team)
+
+
+
+
+    def employee_total(self, employee):
+        """
+        Totals for one employee, by name.
+        """
+        employee_id = self._employee_ids.get(employee)
+        if employee_id is None:
+            return EMPTY_TOTALS
+        return PayrollTotals(*self._by_employee.get(employee_id, EMPTY_TOTALS))
+
+
+
+
+    def employee_totals(self):
+        """
+        {employee name: PayrollTotals} for every employee, in the order they were added.
+        """
+        return {name: PayrollTotals(*self._by_employee.get(employee_id, EMPTY_TOTALS))
+                for employee_id, name in enumerate(self.employees)}
+
+
+
+
+    def weekly_totals(self, employee=None):
+        """
+        {(employee name, week start date): PayrollTotals}, for one employee or everyone.
+        Weeks start on Sunday.
+        """
+        return self._group_totals(self._by_week, employee, lambda week: np.datetime64(week, 'D').item())
+
+
+
+
+    def monthly_totals(self, employee=None):
+        """
+        {(employee name, 'YYYY-MM'): PayrollTotals}, for one employee or everyone.
+        """
+        return self._group_totals(self._by_month, employee, lambda month: str(np.datetime64(month, 'M')))
+
+
+
+
+    def _group_totals(self, groups, employee, format_key):
+        if employee is None:
+            employee_ids = sorted(groups)
+        else:
+            employee_ids = [self._employee_ids[employee]] if employee in self._employee_ids else []
+        return {
+            (self.employees[employee_id], format_key(key)): PayrollTotals(*sums)
+            for employee_id in employee_ids
+            for key, sums in sorted(groups.get(employee_id, {}).items())
+        }
@@ -0,0 +1,185 @@
+"""
+Timing spans and counters for the hot paths: Excel parse, normalization,
+Treeview population, pay and travel charge calculation.
+
+Tracing is off unless $SALARY_CALC_TRACE is set. While it's off, span() hands
+back a shared do-nothing context manager and count() returns right away, so the
+instrumented code runs at practically full speed. Set the variable to 1 to
+collect in memory (shown in the GUI's diagnostics panel), or to a file path to
+also write a Chrome trace there when the program exits. Chrome traces open in
+chrome://tracing or https://ui.perfetto.dev.
+
+    with perf_trace.span('pay', rows=len(dates)):
+        ...
+    perf_trace.count('cache.hits')
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# the most recent span events kept for the trace, the per-name stats count every span
+MAX_EVENTS = 100000
+
+_enabled = False
+_lock = threading.Lock()
+_events = deque(maxlen=MAX_EVENTS)  # (name, start us, duration us, thread id, args)
+_span_stats = {}  # name -> [count, total us, max us]
+_counters = {}
+_start = time.perf_counter()
+
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+
+_NULL_SPAN = _NullSpan()
+
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        start_us = (self.start - _start) * 1e6
+        duration_us = (end - self.start) * 1e6
+        with _lock:
+            _events.append((self.name, start_us, duration_us, threading.get_ident(), self.args))
+            stats = _span_stats.setdefault(self.name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += duration_us
+            stats[2] = max(stats[2], duration_us)
+        return False
+
+
+
+def enabled():
+    return _enabled
+
+
+
+def set_enabled(value):
+    """
+    Turn tracing on or off at runtime, for example from the diagnostics panel.
+    """
+    global _enabled
+    _enabled = bool(value)
+
+
+
+def span(name, **args):
+    """
+    Context manager that times a block as a span called name. args are shown in the trace.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+
+def count(name, value=1):
+    """
+    Add value to the counter called name.
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+
+def reset():
+    """
+    Forget every span and counter collected so far.
+    """
+    with _lock:
+        _events.clear()
+        _span_stats.clear()
+        _counters.clear()
+
+
+
+def stats():
+    """
+    Per-span totals and the counters, as a dict ready for JSON.
+    """
+    with _lock:
+        spans = {
+            name: {
+                'count': span_count,
+                'total_ms': total_us / 1000,
+                'mean_ms': total_us / span_count / 1000,
+                'max_ms': max_us / 1000,
+            }
+            for name, (span_count, total_us, max_us) in sorted(_span_stats.items())
+        }
+        return {'enabled': _enabled, 'spans': spans, 'counters': dict(sorted(_counters.items()))}
+
+
+
+def dump_json(path):
+    """
+    Write stats() to a JSON file.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(stats(), f, indent=2)
+
+
+
+def chrome_trace():
+    """
+    The collected spans and counters in the Chrome trace event format.
+    """
+    pid = os.getpid()
+    with _lock:
+        events = [
+            {'name': name, 'ph': 'X', 'ts': start_us, 'dur': duration_us, 'pid': pid, 'tid': thread_id,
+             'args': args}
+            for name, start_us, duration_us, thread_id, args in _events
+        ]
+        now_us = (time.perf_counter() - _start) * 1e6
+        events.extend(
+            {'name': name, 'ph': 'C', 'ts': now_us, 'pid': pid, 'args': {name: value}}
+            for name, value in _counters.items()
+        )
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+
+def dump_chrome_trace(path):
+    """
+    Write the trace to a file that chrome://tracing and Perfetto can open.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(), f)
+
+
+
+def _enable_from_env():
+    setting = os.environ.get('SALARY_CALC_TRACE', '')
+    if not setting or setting == '0':
+        return
+    set_enabled(True)
+    if setting != '1':
+        atexit.register(dump_chrome_trace, setting)
+
+
+
+_enable_from_env()
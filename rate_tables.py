@@ -0,0 +1,107 @@
+"""
+Effective-dated pay rates, loaded from rate_tables.json.
+
+Each version has the hourly base rate, the control room rate and the premium
+multiplier, and applies from its effective_from date until the next version starts.
+Versions are kept sorted, so a shift's rates are found with a binary search
+(searchsorted for a whole batch), and a month with a rate change is calculated in
+one run.
+"""
+import bisect
+import json
+import os
+
+import numpy as np
+
+from resources import resource_path
+from units import to_agorot
+
+RATES_FILE_NAME = 'rate_tables.json'
+
+
+
+def default_rates_path():
+    """
+    $SALARY_CALC_RATES if set, otherwise the rate_tables.json shipped with the app.
+    """
+    return os.environ.get('SALARY_CALC_RATES') or resource_path(RATES_FILE_NAME)
+
+
+
+class RateTable:
+    """
+    Rate versions as parallel arrays sorted by effective date. The hourly rates are
+    kept in agorot and the premium multiplier as a percentage (1.5 -> 150), so pay
+    is calculated in integers.
+    """
+
+    def __init__(self, versions):
+        if not versions:
+            raise ValueError("A rate table needs at least one version")
+        versions = sorted(versions, key=lambda version: version['effective_from'])
+
+        self.effective_from = np.array([version['effective_from'] for version in versions], dtype='datetime64[D]')
+        if len(np.unique(self.effective_from)) != len(self.effective_from):
+            raise ValueError("Two rate versions have the same effective date")
+        self.base = np.array([to_agorot(version['base']) for version in versions], dtype=np.int64)
+        self.control_room = np.array([to_agorot(version['control_room']) for version in versions], dtype=np.int64)
+        self.premium_percent = np.array([int(round(float(version.get('premium_multiplier', 1.5)) * 100))
+                                         for version in versions], dtype=np.int64)
+
+        # plain ints for bisect on single dates
+        self._effective_days = self.effective_from.astype(np.int64).tolist()
+
+
+
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load a rate table from a JSON file.
+        """
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        try:
+            return cls(config['versions'])
+        except (KeyError, ValueError, TypeError) as e:
+            raise ValueError(f"Invalid rate table in {path}: {e}") from e
+
+
+
+
+    def version_indices(self, dates):
+        """
+        Index of the version in effect on each date.
+        Raises ValueError for dates before the first version.
+        """
+        indices = np.searchsorted(self.effective_from, np.asarray(dates, dtype='datetime64[D]'), side='right') - 1
+        if len(indices) and indices.min() < 0:
+            raise ValueError(f"No pay rates before {self.effective_from[0]}")
+        return indices
+
+
+
+
+    def rates_for(self, date):
+        """
+        (base, control_room, premium_percent) in effect on a single date, the rates in agorot per hour.
+        """
+        index = bisect.bisect_right(self._effective_days, np.datetime64(date, 'D').astype(np.int64)) - 1
+        if index < 0:
+            raise ValueError(f"No pay rates before {self.effective_from[0]}")
+        return int(self.base[index]), int(self.control_room[index]), int(self.premium_percent[index])
+
+
+
+_default_rates = None
+
+
+
+def default_rate_table():
+    """
+    The rate table from default_rates_path(), loaded on first use.
+    """
+    global _default_rates
+    if _default_rates is None:
+        _default_rates = RateTable.from_file(default_rates_path())
+    return _default_rates
@@ -0,0 +1,15 @@
+"""
+Locating files that ship with the app.
+"""
+import os
+import sys
+
+
+
+def resource_path(file_name):
+    """
+    Path of a file bundled with the app: next to the sources when running locally,
+    or in the directory PyInstaller unpacks to (_MEIPASS) in the built executable.
+    """
+    base_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, file_name)
@@ -1,86 +1,165 @@
-from datetime import datetime, timedelta
+import argparse
+import sys
+import numpy as np
+
+import perf_trace
+from rate_tables import default_rate_table
+from travel_rules import default_travel_rules
+from units import AGOROT_PER_SHEKEL, MINUTES_PER_DAY, format_agorot, format_minutes
+
+
+
+def _merge_windows(windows):
+    """
+    Merge overlapping or touching (start, end) minute windows into a sorted tuple.
+    """
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+
+
+def _build_premium_windows():
+    """
+    Precompute the premium windows for every kind of shift date.
+    A shift starts on its date and ends at most a day later, so the windows cover
+    two days in minutes from the midnight of the shift date (0-2880).
+    - Friday or holiday eve: from 4 PM to midnight.
+    - Saturday: the entire day.
+    - Sunday or last day of holiday: before 4 AM.
+    The holiday flags belong to the shift, so like the weekday rules they are applied
+    on both days the shift touches.
+    Keyed by (weekday, is_holiday_eve, is_last_day_of_holiday), 0 = Monday.
+    """
+    windows = {}
+    for weekday in range(7):
+        for is_holiday_eve in (False, True):
+            for is_last_day_of_holiday in (False, True):
+                day_windows = []
+                for day in range(2):
+                    day_start = day * 1440
+                    day_weekday = (weekday + day) % 7
+                    if day_weekday == 4 or is_holiday_eve:
+                        day_windows.append((day_start + 16 * 60, day_start + 1440))
+                    if day_weekday == 5:
+                        day_windows.append((day_start, day_start + 1440))
+                    if day_weekday == 6 or is_last_day_of_holiday:
+                        day_windows.append((day_start, day_start + 4 * 60))
+                windows[(weekday, is_holiday_eve, is_last_day_of_holiday)] = _merge_windows(day_windows)
+    return windows
+
+
+
+def _build_premium_window_array(premium_windows):
+    """
+    Pack the premium windows into an array indexed [weekday, eve, last_day, window].
+    Dates with fewer windows are padded with empty (0, 0) windows so compute_batch
+    can intersect every shift with the same number of windows.
+    """
+    max_windows = max(len(windows) for windows in premium_windows.values())
+    window_array = np.zeros((7, 2, 2, max_windows, 2), dtype=np.int64)
+    for (weekday, is_holiday_eve, is_last_day_of_holiday), windows in premium_windows.items():
+        if windows:
+            window_array[weekday, int(is_holiday_eve), int(is_last_day_of_holiday), :len(windows)] = windows
+    return window_array
+
+
+
+def shift_pay(hourly_rate, premium_percent, worked_minutes, premium_minutes):
+    """
+    Pay in agorot for a shift, given its hourly rate in agorot and the premium as a
+    percentage. Everything stays in integers and each shift is rounded to the nearest
+    agora once, so totals are exact sums. Works on ints and on numpy arrays.
+    """
+    weighted_minutes = worked_minutes * 100 + (premium_percent - 100) * premium_minutes
+    return (hourly_rate * weighted_minutes + 3000) // 6000
+
+
+
+_PREMIUM_WINDOWS = _build_premium_windows()
+_PREMIUM_WINDOW_ARRAY = _build_premium_window_array(_PREMIUM_WINDOWS)
+
+
 
 class SalaryCalculator:
-    def __init__(self):
+    def __init__(self, travel_rules=None, rate_table=None):
         self.daily_records = []
+        self.travel_rules = travel_rules or default_travel_rules()
+        self.rate_table = rate_table or default_rate_table()
 
 
 
 
     def add_work_day(self, date, start_time, end_time, in_control_room, is_holiday_eve,
                      is_friday, is_saturday, is_holiday, is_last_day_of_holiday):
-        base_rate = 61.6 if in_control_room else 51.3
-
-        # combine date and time
-        start_datetime = datetime.combine(date, start_time)
-        end_datetime = datetime.combine(date, end_time)
-
-        # night shifts that cross midnight, add a day to the end_datetime.
-        if end_datetime <= start_datetime:
-            end_datetime += timedelta(days=1)
-
-        # edge case: if start_time is equal to end_time
-        if start_datetime == end_datetime:
-            raise ValueError("Start time cannot be equal to end time")
-
-        total_pay = 0.0
+        # rates in effect on the shift date, in agorot per hour
+        base_rate, control_room_rate, premium_percent = self.rate_table.rates_for(date)
+        if in_control_room:
+            base_rate = control_room_rate
 
-        # calculate pay for each hour segment
-        current_time = start_datetime
-        while current_time < end_datetime:
-            next_hour = current_time + timedelta(hours=1)
-            if next_hour > end_datetime:
-                next_hour = end_datetime  # for partial hours
+        # minutes from the midnight of the shift date
+        start_minute = start_time.hour * 60 + start_time.minute
+        end_minute = end_time.hour * 60 + end_time.minute
 
-            hour_duration = (next_hour - current_time).total_seconds() / 3600
-            multiplier = self._get_correct_multiplier(current_time, is_holiday, is_holiday_eve, is_last_day_of_holiday)
-            total_pay += base_rate * multiplier * hour_duration
+        # night shifts that cross midnight end on the next day
+        if end_minute <= start_minute:
+            end_minute += MINUTES_PER_DAY
 
-            current_time = next_hour  # Move the loop forward
+        worked_minutes = end_minute - start_minute
+        premium_minutes = self._premium_minutes(date.weekday(), start_minute, end_minute,
+                                                is_holiday, is_holiday_eve, is_last_day_of_holiday)
 
-        # add the record to daily_records with all relevant information
+        # add the record to daily_records with all relevant information, the times in
+        # minutes and the pay in agorot
         self.daily_records.append({
             'date': date,
-            'start_time': start_time,
-            'end_time': end_time,
-            'pay': total_pay
+            'start_minute': start_minute,
+            'end_minute': end_minute % MINUTES_PER_DAY,
+            'pay': shift_pay(base_rate, premium_percent, worked_minutes, premium_minutes)
         })
 
 
 
 
-    def _get_correct_multiplier(self, current_time, is_holiday=False, is_holiday_eve=False, is_last_day_of_holiday=False):
+    def _premium_minutes(self, weekday, start_minute, end_minute, is_holiday=False,
+                         is_holiday_eve=False, is_last_day_of_holiday=False):
         """
-        Determine the pay multiplier based on the day and time.
-        - If it's Friday, the multiplier is 1.5x for the entire day.
-        - If it's Saturday, the multiplier is 1.5x for the entire day.
-        - If it's Sunday before 4 AM, the multiplier is 1.5x.
-        - For other days and times, the multiplier is 1.0x.
+        Count the minutes of a shift that fall inside the premium windows by
+        intersecting it with the precomputed windows of its date.
+        A holiday pays the premium for the whole shift.
         """
         if is_holiday:
-            return 1.5
-        
-        multiplier = 1.0
+            return end_minute - start_minute
+
+        premium_minutes = 0
+        for window_start, window_end in _PREMIUM_WINDOWS[(weekday, bool(is_holiday_eve), bool(is_last_day_of_holiday))]:
+            premium_minutes += max(0, min(end_minute, window_end) - max(start_minute, window_start))
+        return premium_minutes
+
+
+
+
 
-        weekday = current_time.weekday()  # Get the day of the week (0 = Monday, 1 = Tuesday, 2 = Wednesday, 3 = Thursday, 4 = Friday, 5 = Saturday, 6 = Sunday)
-        
-        if (weekday == 4 or is_holiday_eve) and current_time.hour >= 16:
-            multiplier = 1.5
-        elif weekday == 5:  
-            multiplier = 1.5
-        elif is_last_day_of_holiday and current_time.hour < 4:
-            multiplier = 1.5
-        elif weekday == 6 and current_time.hour < 4:  # Sunday before 4am
-            multiplier = 1.5
+    def total_pay_agorot(self):
+        """
+        Total pay of the added days, in agorot.
+        """
+        return sum(record['pay'] for record in self.daily_records)
 
-        return multiplier
 
 
 
 
 
     def total_pay(self):
-        return sum(record['pay'] for record in self.daily_records)
+        """
+        Total pay of the added days in shekels, as it always was. total_pay_agorot is exact.
+        """
+        return self.total_pay_agorot() / AGOROT_PER_SHEKEL
 
 
 
@@ -94,34 +173,157 @@ class SalaryCalculator:
 
         for record in self.daily_records:
             date_str = record['date'].strftime("%Y-%m-%d")
-            start_time_str = record['start_time'].strftime("%H:%M")
-            end_time_str = record['end_time'].strftime("%H:%M")
-            pay = record['pay']
-            print(f"Date: {date_str}, Start Time: {start_time_str}, End Time: {end_time_str}, Pay: {pay:.2f} shekels")
+            start_time_str = format_minutes(record['start_minute'])
+            end_time_str = format_minutes(record['end_minute'])
+            pay = format_agorot(record['pay'])
+            print(f"Date: {date_str}, Start Time: {start_time_str}, End Time: {end_time_str}, Pay: {pay} shekels")
+
+
+
+
+
+
+    def travel_charge_agorot(self, date, start_time, end_time):
+        """
+        Calculate the travel charge in agorot based on the day and time, using the travel rules.
+        """
+        return self.travel_rules.charge(date.weekday(), start_time.hour * 60 + start_time.minute,
+                                        end_time.hour * 60 + end_time.minute)
+
+
+
+
+
+
+    def calculate_travel_charge(self, date, start_time, end_time, is_friday=None, is_saturday=None):
+        """
+        The travel charge in shekels, as it always was. The day of the week comes from the
+        date, is_friday and is_saturday are only kept for older callers.
+        """
+        return self.travel_charge_agorot(date, start_time, end_time) / AGOROT_PER_SHEKEL
+
+
+
+
+
+
+    def compute_batch(self, dates, start_minutes, end_minutes, in_control_room,
+                      is_holiday_eve, is_holiday, is_last_day_of_holiday):
+        """
+        Calculate pay and travel charge for many shifts in one vectorized pass.
+        All arguments are arrays of the same length:
+        - dates: anything numpy can turn into datetime64[D]
+        - start_minutes / end_minutes: minutes since midnight (0-1439), an end at or
+          before the start means the shift crosses midnight
+        - in_control_room and the holiday arguments: boolean flags per shift
+        The rules are the same as add_work_day and travel_charge_agorot, and the
+        cost per shift is constant no matter how long it is.
+        Nothing is added to daily_records. Returns (pay, travel_charge) int64 arrays in agorot.
+        """
+        days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+        start = np.asarray(start_minutes, dtype=np.int64)
+        end_raw = np.asarray(end_minutes, dtype=np.int64)
+        control_room = np.asarray(in_control_room, dtype=bool)
+
+        with perf_trace.span('pay', rows=len(days)):
+            worked_minutes, premium_minutes = self.batch_minutes(days, start, end_raw, is_holiday_eve,
+                                                                 is_holiday, is_last_day_of_holiday)
+
+            # rates in effect on each shift date, found with one searchsorted
+            version = self.rate_table.version_indices(days.astype('datetime64[D]'))
+            base_rate = np.where(control_room, self.rate_table.control_room[version], self.rate_table.base[version])
+            pay = shift_pay(base_rate, self.rate_table.premium_percent[version], worked_minutes, premium_minutes)
 
+        with perf_trace.span('travel', rows=len(days)):
+            # 1970-01-01 was a Thursday, so this gives 0 = Monday ... 6 = Sunday
+            travel_charge = self.travel_rules.charges((days + 3) % 7, start, end_raw)
+        perf_trace.count('shifts.calculated', len(days))
 
+        return pay, travel_charge
 
 
 
 
-    def calculate_travel_charge(self, date, start_time, end_time, is_friday, is_saturday):
+    def batch_minutes(self, dates, start_minutes, end_minutes, is_holiday_eve, is_holiday, is_last_day_of_holiday):
         """
-        Calculate the travel charge based on the day and time.
+        The worked and premium minutes of many shifts, the part of compute_batch that
+        doesn't depend on the rates. Takes the same arrays as compute_batch and returns
+        two int64 arrays.
         """
-        travel_charge = 12  
-        
-        # friday charge 
-        if is_friday:
-            if start_time < datetime.strptime("15:00", "%H:%M").time():
-                travel_charge = 12  # 6 shekels each way
-            else:
-                travel_charge = 40  # 40 shekels after 3:00 p.m for both way, 20 each.
-        
-        # saturday charge
-        elif is_saturday:
-            if start_time >= datetime.strptime("23:00", "%H:%M").time() and end_time <= datetime.strptime("07:00", "%H:%M").time():
-                travel_charge = 20 + 6  # 20 shekels to work, 6 shekels return.
-            else:
-                travel_charge = 12  # 12 shekels total.
-        
-        return travel_charge
\ No newline at end of file
+        days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+        start = np.asarray(start_minutes, dtype=np.int64)
+        end = np.asarray(end_minutes, dtype=np.int64)
+        holiday_eve = np.asarray(is_holiday_eve, dtype=bool)
+        holiday = np.asarray(is_holiday, dtype=bool)
+        last_day = np.asarray(is_last_day_of_holiday, dtype=bool)
+
+        # night shifts that cross midnight end on the next day
+        end = np.where(end <= start, end + MINUTES_PER_DAY, end)
+
+        # intersect every shift with the premium windows of its date, 1970-01-01 was a Thursday
+        weekday = (days + 3) % 7
+        windows = _PREMIUM_WINDOW_ARRAY[weekday, holiday_eve.astype(np.int64), last_day.astype(np.int64)]
+        overlap = np.minimum(end[:, None], windows[:, :, 1]) - np.maximum(start[:, None], windows[:, :, 0])
+        premium_minutes = np.clip(overlap, 0, None).sum(axis=1)
+
+        worked_minutes = end - start
+        return worked_minutes, np.where(holiday, worked_minutes, premium_minutes)
+
+
+
+def main(argv=None):
+    """
+    Command line entry point for headless runs, e.g. `python -m salary_calc batch <dir>`,
+    `python -m salary_calc query --ytd` or `python -m salary_calc serve`.
+    """
+    parser = argparse.ArgumentParser(prog='salary_calc', description='Salary Calculator for team 3')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch_parser = subparsers.add_parser('batch', help='calculate pay for every ShiftOrganizer export in a directory')
+    batch_parser.add_argument('directory', help='directory with the Excel exports, one file per employee')
+    batch_parser.add_argument('-o', '--output', help='summary CSV to write (default: <directory>/team_summary.csv)')
+    batch_parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes (default: all cores)')
+    batch_parser.add_argument('--control-room', action='store_true', help='treat every shift as a control room shift')
+    batch_parser.add_argument('--engine', default='auto', help='Excel reader: auto, calamine, openpyxl or pandas')
+    batch_parser.add_argument('--no-cache', action='store_true', help='always parse the files instead of using the parse cache')
+    batch_parser.add_argument('--no-holidays', action='store_true', help="don't mark holidays from the built-in holiday calendar")
+    batch_parser.add_argument('--group-by', choices=('employee', 'week', 'month'), default='employee',
+                              help='one summary row per employee, or per employee and week or month')
+    batch_parser.add_argument('--export', help='also export every calculated shift to this .csv, .xlsx or .parquet file')
+    batch_parser.add_argument('--archive', action='store_true',
+                              help='also add the calculated shifts to the payroll archive, replacing the same days')
+    batch_parser.add_argument('--merge-overlaps', action='store_true',
+                              help='merge duplicate and overlapping shifts into one before calculating them')
+
+    query_parser = subparsers.add_parser('query', help='totals from the payroll archive between two dates')
+    query_parser.add_argument('--from', dest='first_date', help='first date, YYYY-MM-DD (default: the first archived)')
+    query_parser.add_argument('--to', dest='last_date', help='last date, YYYY-MM-DD (default: the last archived)')
+    query_parser.add_argument('--ytd', action='store_true', help='from January 1st to --to (default: today)')
+    query_parser.add_argument('--employee', help='only this employee (default: everyone)')
+
+    serve_parser = subparsers.add_parser('serve', help='run the local HTTP/JSON payroll service')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: localhost only)')
+    serve_parser.add_argument('--port', type=int, default=8765, help='port to listen on (default: 8765)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'batch':
+        # imported here so the GUI doesn't pay for the batch module
+        from payroll_batch import run_batch
+        failures = run_batch(args.directory, args.output, args.workers, args.control_room,
+                             args.engine, not args.no_cache, not args.no_holidays, args.group_by, args.export,
+                             args.archive, args.merge_overlaps)
+        return 1 if failures else 0
+
+    if args.command == 'query':
+        from payroll_archive import run_query
+        return run_query(args.first_date, args.last_date, args.employee, args.ytd)
+
+    if args.command == 'serve':
+        from payroll_service import run_service
+        return run_service(args.host, args.port)
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+What-if window: build flag and rate variants, then price the loaded shifts under every
+combination of them at once, with the pay of each day and the totals side by side.
+"""
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+import numpy as np
+
+from scenarios import FlagChange, FlagVariant, RateVariant, simulate
+from shift_flags import FLAG_CONTROL_ROOM, FLAG_HOLIDAY_EVE, FLAG_HOLIDAY, FLAG_LAST_DAY_OF_HOLIDAY
+from units import format_agorot
+
+FLAG_NAMES = {
+    "Control Room": FLAG_CONTROL_ROOM,
+    "Holiday Eve": FLAG_HOLIDAY_EVE,
+    "Holiday": FLAG_HOLIDAY,
+    "Last Day of Holiday": FLAG_LAST_DAY_OF_HOLIDAY,
+}
+FLAG_LABELS = {flag: name for name, flag in FLAG_NAMES.items()}
+BASELINE_NAME = 'As loaded'
+
+
+
+def parse_dates(text):
+    """
+    Comma separated YYYY-MM-DD dates, or None (every shift) when the text is empty.
+    """
+    parts = [part.strip() for part in text.split(',') if part.strip()]
+    if not parts:
+        return None
+    return [np.datetime64(part, 'D') for part in parts]
+
+
+
+def parse_percent(text, default):
+    text = text.strip()
+    return default if not text else int(text)
+
+
+
+class ScenarioPanel(tk.Toplevel):
+    """
+    Flag variants on the left, rate variants on the right, and the comparison below.
+    The first flag variant is always the shifts as they are in the table, and the first
+    rate variant is the current rates, so the first column is what the table says and
+    every other column is compared against it. The shifts are read from the app when
+    Compare is pressed, so edits made in the meantime are counted.
+    """
+
+    def __init__(self, master, app):
+        super().__init__(master)
+        self.app = app
+        self.title('What If')
+        self.geometry('900x600')
+        self.flag_variants = [FlagVariant(BASELINE_NAME)]
+        self.rate_variants = [RateVariant('Current rates')]
+
+        inputs = ttk.Frame(self)
+        inputs.pack(fill='x', padx=10, pady=5)
+        self._create_flag_inputs(inputs)
+        self._create_rate_inputs(inputs)
+
+        buttons = ttk.Frame(self)
+        buttons.pack(fill='x', padx=10)
+        ttk.Button(buttons, text="Compare", command=self.compare).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Clear Variants", command=self.clear_variants).pack(side=tk.LEFT, padx=5)
+
+        self.tree = ttk.Treeview(self, show='headings', height=14)
+        self.tree.pack(fill='both', expand=True, padx=10, pady=10)
+
+
+
+
+    def _create_flag_inputs(self, parent):
+        frame = ttk.LabelFrame(parent, text="Flag Variants")
+        frame.pack(side=tk.LEFT, fill='both', expand=True, padx=5)
+
+        self.flag_name_var = tk.StringVar()
+        self.flag_var = tk.StringVar(value="Control Room")
+        self.flag_value_var = tk.BooleanVar(value=True)
+        self.flag_dates_var = tk.StringVar()
+        for row, (label, widget) in enumerate((
+            ("Name:", ttk.Entry(frame, textvariable=self.flag_name_var)),
+            ("Flag:", ttk.Combobox(frame, textvariable=self.flag_var, values=list(FLAG_NAMES), state='readonly')),
+            ("Dates (empty = all):", ttk.Entry(frame, textvariable=self.flag_dates_var)),
+        )):
+            ttk.Label(frame, text=label).grid(row=row, column=0, sticky='w', padx=5, pady=2)
+            widget.grid(row=row, column=1, sticky='ew', padx=5, pady=2)
+        ttk.Checkbutton(frame, text="Set (unchecked clears it)", variable=self.flag_value_var).grid(
+            row=3, column=0, columnspan=2, sticky='w', padx=5)
+        ttk.Button(frame, text="Add Change", command=self.add_flag_change).grid(row=4, column=0, columnspan=2, pady=2)
+        self.flag_list = tk.Listbox(frame, height=4)
+        self.flag_list.grid(row=5, column=0, columnspan=2, sticky='ew', padx=5, pady=2)
+        frame.columnconfigure(1, weight=1)
+
+
+
+
+    def _create_rate_inputs(self, parent):
+        frame = ttk.LabelFrame(parent, text="Rate Variants")
+        frame.pack(side=tk.LEFT, fill='both', expand=True, padx=5)
+
+        self.rate_name_var = tk.StringVar()
+        self.base_percent_var = tk.StringVar(value="100")
+        self.control_room_percent_var = tk.StringVar(value="100")
+        self.premium_percent_var = tk.StringVar()
+        for row, (label, variable) in enumerate((
+            ("Name:", self.rate_name_var),
+            ("Base rate %:", self.base_percent_var),
+            ("Control room rate %:", self.control_room_percent_var),
+            ("Premium % (empty = as now):", self.premium_percent_var),
+        )):
+            ttk.Label(frame, text=label).grid(row=row, column=0, sticky='w', padx=5, pady=2)
+            ttk.Entry(frame, textvariable=variable).grid(row=row, column=1, sticky='ew', padx=5, pady=2)
+        ttk.Button(frame, text="Add Rates", command=self.add_rate_variant).grid(row=4, column=0, columnspan=2, pady=2)
+        self.rate_list = tk.Listbox(frame, height=4)
+        self.rate_list.grid(row=5, column=0, columnspan=2, sticky='ew', padx=5, pady=2)
+        frame.columnconfigure(1, weight=1)
+        self._refresh_lists()
+
+
+
+
+    def _refresh_lists(self):
+        self.flag_list.delete(0, tk.END)
+        for variant in self.flag_variants:
+            changes = ', '.join(
+                f"{'set' if change.value else 'clear'} {FLAG_LABELS[change.flag]} on "
+                f"{'all' if change.dates is None else ' '.join(str(day) for day in change.dates)}"
+                for change in variant.changes
+            )
+            self.flag_list.insert(tk.END, f"{variant.name}: {changes or 'no changes'}")
+        self.rate_list.delete(0, tk.END)
+        for variant in self.rate_variants:
+            premium = 'as now' if variant.premium_percent is None else f"{variant.premium_percent}%"
+            self.rate_list.insert(tk.END, f"{variant.name}: base {variant.base_percent}%, "
+                                          f"CR {variant.control_room_percent}%, premium {premium}")
+
+
+
+
+    def add_flag_change(self):
+        """
+        Add a change to the flag variant of that name, creating the variant if it's new,
+        so a variant can set and clear several flags together.
+        """
+        name = self.flag_name_var.get().strip()
+        if not name or name == BASELINE_NAME:
+            messagebox.showerror("Invalid Input", "Please give the variant a name.", parent=self)
+            return
+        try:
+            dates = parse_dates(self.flag_dates_var.get())
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Please enter the dates as YYYY-MM-DD, separated by commas.", parent=self)
+            return
+
+        change = FlagChange(FLAG_NAMES[self.flag_var.get()], self.flag_value_var.get(), dates)
+        for index, variant in enumerate(self.flag_variants):
+            if variant.name == name:
+                self.flag_variants[index] = variant._replace(changes=tuple(variant.changes) + (change,))
+                break
+        else:
+            self.flag_variants.append(FlagVariant(name, (change,)))
+        self._refresh_lists()
+
+
+
+
+    def add_rate_variant(self):
+        name = self.rate_name_var.get().strip()
+        if not name or any(variant.name == name for variant in self.rate_variants):
+            messagebox.showerror("Invalid Input", "Please give the rates a new name.", parent=self)
+            return
+        try:
+            variant = RateVariant(name, parse_percent(self.base_percent_var.get(), 100),
+                                  parse_percent(self.control_room_percent_var.get(), 100),
+                                  parse_percent(self.premium_percent_var.get(), None))
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Please enter the percentages as whole numbers.", parent=self)
+            return
+        self.rate_variants.append(variant)
+        self._refresh_lists()
+
+
+
+
+    def clear_variants(self):
+        self.flag_variants = self.flag_variants[:1]
+        self.rate_variants = self.rate_variants[:1]
+        self._refresh_lists()
+        self.tree.delete(*self.tree.get_children())
+
+
+
+
+    def compare(self):
+        """
+        Price the loaded shifts under every scenario and fill the table: a row per day,
+        then the totals and how far each one is from the first column.
+        """
+        shifts = self.app.shifts
+        if shifts is None or self.app.salary_calculator is None:
+            messagebox.showerror("No Data", "Please load an Excel file first.", parent=self)
+            return
+        try:
+            result = simulate(shifts, self.app.salary_calculator, self.flag_variants, self.rate_variants)
+        except Exception as e:
+            messagebox.showerror("Error", f"Error comparing scenarios: {e}", parent=self)
+            return
+
+        columns = ["Date"] + result.names
+        self.tree.delete(*self.tree.get_children())
+        self.tree.config(columns=columns)
+        for column in columns:
+            self.tree.heading(column, text=column, anchor='center')
+            self.tree.column(column, anchor='center', width=110 if column == "Date" else 140)
+
+        for day, pay in zip(result.days, result.day_pay.T.tolist()):
+            self.tree.insert('', 'end', values=[str(day)] + [format_agorot(value) for value in pay])
+        self.tree.insert('', 'end', values=["Total"] + [format_agorot(value) for value in result.total_pay().tolist()])
+        self.tree.insert('', 'end', values=["Difference"] + [
+            ('+' if value > 0 else '') + format_agorot(value) for value in result.difference().tolist()])
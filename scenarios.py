@@ -0,0 +1,136 @@
+"""
+What-if scenarios: the loaded shifts priced under other flags and other rates,
+all side by side, without touching the table itself.
+
+A scenario is one flag variant combined with one rate variant, and every
+combination of the variants given is calculated. The minutes that earn a premium
+depend only on the flags, so they're worked out once per flag variant, with all the
+flag variants stacked into one compute pass. The rate variants are then applied to
+all of them at once by broadcasting, so a 4 x 3 matrix costs about as much as
+calculating the month four times, not twelve.
+
+    variants = [FlagVariant('As loaded'),
+                FlagVariant('All CR', [FlagChange(FLAG_CONTROL_ROOM, True)]),
+                FlagVariant('14th eve', [FlagChange(FLAG_HOLIDAY_EVE, True, ['2024-05-14'])])]
+    result = simulate(shifts, calculator, variants, [RateVariant('Current'), RateVariant('+5%', 105, 105)])
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from salary_calc import shift_pay
+from shift_flags import FLAG_CONTROL_ROOM, FLAG_HOLIDAY_EVE, FLAG_HOLIDAY, FLAG_LAST_DAY_OF_HOLIDAY
+
+# set (value=True) or clear a flag on the shifts of some dates, or on every shift when dates is None
+FlagChange = namedtuple('FlagChange', ['flag', 'value', 'dates'], defaults=(None,))
+
+# a set of flag changes applied together on top of the loaded flags
+FlagVariant = namedtuple('FlagVariant', ['name', 'changes'], defaults=((),))
+
+# the base and control room rates scaled by a percentage, and optionally another premium (150 = x1.5)
+RateVariant = namedtuple('RateVariant', ['name', 'base_percent', 'control_room_percent', 'premium_percent'],
+                         defaults=(100, 100, None))
+
+
+
+class ScenarioResult:
+    """
+    The pay of every scenario:
+    - names: one per scenario, "<flag variant> / <rate variant>", flag variants first
+    - pay: int64 agorot, one row per scenario and one column per shift
+    - days: the dates that have shifts, and day_pay, one row per scenario and one column per day
+    - travel_charge: per shift, the same in every scenario since it doesn't depend on flags or rates
+    """
+
+    def __init__(self, names, dates, pay, travel_charge):
+        self.names = names
+        self.pay = pay
+        self.travel_charge = travel_charge
+        self.days, day_index = np.unique(dates, return_inverse=True)
+
+        # shifts sorted by day, so each day's pay is one reduceat segment
+        order = np.argsort(day_index, kind='stable')
+        starts = np.flatnonzero(np.r_[True, np.diff(day_index[order]) != 0]) if len(order) else np.zeros(0, dtype=np.int64)
+        self.day_pay = (np.add.reduceat(pay[:, order], starts, axis=1) if len(order)
+                        else np.zeros((len(names), 0), dtype=np.int64))
+
+
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+
+
+    def total_pay(self):
+        """
+        Total pay of each scenario in agorot.
+        """
+        return self.pay.sum(axis=1)
+
+
+
+
+    def difference(self, baseline=0):
+        """
+        How much more (or less) each scenario pays in total than the baseline scenario.
+        """
+        totals = self.total_pay()
+        return totals - totals[baseline]
+
+
+
+def variant_flags(shifts, variant):
+    """
+    The flags of every shift after a flag variant's changes, leaving the table as it is.
+    """
+    flags = shifts.flags.copy()
+    for change in variant.changes:
+        rows = slice(None) if change.dates is None else np.isin(shifts.date, np.asarray(change.dates, dtype='datetime64[D]'))
+        if change.value:
+            flags[rows] |= change.flag
+        else:
+            flags[rows] &= ~np.uint8(change.flag)
+    return flags
+
+
+
+def simulate(shifts, salary_calculator, flag_variants, rate_variants):
+    """
+    Calculate every combination of the flag and rate variants against a ShiftTable,
+    with the calculator's rate table and travel rules. Returns a ScenarioResult.
+    """
+    flag_variants = list(flag_variants) or [FlagVariant('As loaded')]
+    rate_variants = list(rate_variants) or [RateVariant('Current rates')]
+    count = len(shifts)
+
+    # all the flag variants stacked, for one pass over the premium windows
+    flags = np.concatenate([variant_flags(shifts, variant) for variant in flag_variants])
+    dates = np.tile(shifts.date, len(flag_variants))
+    worked_minutes, premium_minutes = salary_calculator.batch_minutes(
+        dates, np.tile(shifts.start_minute, len(flag_variants)), np.tile(shifts.end_minute, len(flag_variants)),
+        flags & FLAG_HOLIDAY_EVE, flags & FLAG_HOLIDAY, flags & FLAG_LAST_DAY_OF_HOLIDAY)
+
+    # the rates of every shift, with the rate variants on the first axis
+    rate_table = salary_calculator.rate_table
+    version = rate_table.version_indices(shifts.date)
+    base_percent = np.array([variant.base_percent for variant in rate_variants], dtype=np.int64)[:, None]
+    control_room_percent = np.array([variant.control_room_percent for variant in rate_variants], dtype=np.int64)[:, None]
+    base = rate_table.base[version] * base_percent // 100
+    control_room = rate_table.control_room[version] * control_room_percent // 100
+    premium = np.stack([rate_table.premium_percent[version] if variant.premium_percent is None
+                        else np.full(count, variant.premium_percent, dtype=np.int64) for variant in rate_variants])
+
+    # (rate variants, flag variants, shifts)
+    in_control_room = ((flags & FLAG_CONTROL_ROOM) != 0).reshape(len(flag_variants), count)
+    hourly_rate = np.where(in_control_room[None], control_room[:, None], base[:, None])
+    pay = shift_pay(hourly_rate, premium[:, None], worked_minutes.reshape(len(flag_variants), count)[None],
+                     premium_minutes.reshape(len(flag_variants), count)[None])
+
+    travel_charge = salary_calculator.travel_rules.charges(shifts.weekday(), shifts.start_minute.astype(np.int64),
+                                                           shifts.end_minute.astype(np.int64))
+    names = [f"{flag_variant.name} / {rate_variant.name}" if len(rate_variants) > 1 else flag_variant.name
+             for flag_variant in flag_variants for rate_variant in rate_variants]
+    # flag variant major, so the scenarios of one flag variant sit next to each other
+    return ScenarioResult(names, shifts.date, pay.transpose(1, 0, 2).reshape(-1, count), travel_charge)
@@ -0,0 +1,210 @@
+"""
+Control room and holiday marks set by hand, saved in a local SQLite database so
+they survive closing the app and come back when the same month is opened again.
+
+A mark belongs to a shift by (employee, date, entry time), not by its row in the
+table, so it lands on the right shift even if the file comes back in another
+order. Each mark holds the flag bits that were set by hand (the mask) and their
+values, and only those bits replace what the calendar or the file said.
+"""
+import os
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+
+from units import MINUTES_PER_DAY
+
+SESSION_FILE_NAME = 'sessions.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shift_marks (
+    employee TEXT NOT NULL,
+    day INTEGER NOT NULL,           -- days since 1970-01-01
+    start_minute INTEGER NOT NULL,  -- entry time, minutes since midnight
+    flags INTEGER NOT NULL,         -- the shift_flags bits, only the ones in mask count
+    mask INTEGER NOT NULL,          -- which bits were set by hand
+    PRIMARY KEY (employee, day, start_minute)
+) WITHOUT ROWID;
+-- the primary key already serves lookups by employee, this one is for date ranges across employees
+CREATE INDEX IF NOT EXISTS shift_marks_day ON shift_marks (day);
+"""
+
+# new bits replace the stored ones, the bits the new mark doesn't cover are kept
+UPSERT = """
+INSERT INTO shift_marks (employee, day, start_minute, flags, mask) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (employee, day, start_minute) DO UPDATE SET
+    flags = (flags & ~excluded.mask) | excluded.flags,
+    mask = mask | excluded.mask
+"""
+
+
+
+def default_session_path():
+    """
+    Where the marks are saved: $SALARY_CALC_SESSION_DB if set, otherwise the user's data directory.
+    """
+    if os.environ.get('SALARY_CALC_SESSION_DB'):
+        return os.environ['SALARY_CALC_SESSION_DB']
+    if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+        return os.path.join(os.environ['LOCALAPPDATA'], 'SalaryCalculator', SESSION_FILE_NAME)
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(data_home, 'salary-calculator', SESSION_FILE_NAME)
+
+
+
+def employee_name(file_path):
+    """
+    The employee an export belongs to, taken from its file name. Marks are saved under it.
+    """
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+
+class SessionStore:
+    """
+    The marks database. One connection is shared by the GUI and its loader thread,
+    behind a lock, and every save is a single transaction however many shifts it covers.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_session_path()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.executescript(SCHEMA)
+
+
+
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+
+
+    def save_marks(self, employee, dates, start_minutes, flags, mask):
+        """
+        Save the hand-set bits of many shifts at once. mask is one value or one per shift,
+        and only those bits of flags are saved. Saving the same shift again updates it.
+        """
+        days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+        mask = np.broadcast_to(np.asarray(mask, dtype=np.int64), days.shape)
+        flags = np.asarray(flags, dtype=np.int64) & mask
+        rows = zip([employee] * len(days), days.tolist(), np.asarray(start_minutes, dtype=np.int64).tolist(),
+                   flags.tolist(), mask.tolist())
+        with self.lock, self.connection:
+            self.connection.executemany(UPSERT, rows)
+
+
+
+
+    def save_table_marks(self, employee, shifts, rows, mask):
+        """
+        Save the given bits of some rows of a ShiftTable, after they were set by hand.
+        """
+        self.save_marks(employee, shifts.date[rows], shifts.start_minute[rows], shifts.flags[rows], mask)
+
+
+
+
+    def load_marks(self, employee=None, first_date=None, last_date=None):
+        """
+        The saved marks, optionally of one employee and between two dates (both included),
+        as columns: employee (list), day, start_minute, flags and mask (int64 arrays).
+        """
+        conditions, parameters = [], []
+        if employee is not None:
+            conditions.append('employee = ?')
+            parameters.append(employee)
+        if first_date is not None:
+            conditions.append('day >= ?')
+            parameters.append(int(np.datetime64(first_date, 'D').astype(np.int64)))
+        if last_date is not None:
+            conditions.append('day <= ?')
+            parameters.append(int(np.datetime64(last_date, 'D').astype(np.int64)))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT employee, day, start_minute, flags, mask FROM shift_marks {where}", parameters).fetchall()
+        employees, days, start_minutes, flags, masks = zip(*rows) if rows else ((), (), (), (), ())
+        return {
+            'employee': list(employees),
+            'day': np.array(days, dtype=np.int64),
+            'start_minute': np.array(start_minutes, dtype=np.int64),
+            'flags': np.array(flags, dtype=np.int64),
+            'mask': np.array(masks, dtype=np.int64),
+        }
+
+
+
+
+    def restore(self, employee, shifts):
+        """
+        Put an employee's saved marks back on a ShiftTable, matching shifts by date and
+        entry time. Only the rows whose flags change become dirty. Returns how many
+        shifts had a mark.
+        """
+        if not len(shifts):
+            return 0
+        marks = self.load_marks(employee, shifts.date.min(), shifts.date.max())
+        if not len(marks['day']):
+            return 0
+
+        # one sortable key per shift, and the marks are looked up with a binary search
+        mark_keys = marks['day'] * MINUTES_PER_DAY + marks['start_minute']
+        order = np.argsort(mark_keys)
+        mark_keys = mark_keys[order]
+        shift_keys = shifts.date.astype(np.int64) * MINUTES_PER_DAY + shifts.start_minute
+        position = np.minimum(np.searchsorted(mark_keys, shift_keys), len(mark_keys) - 1)
+        found = mark_keys[position] == shift_keys
+
+        flags = np.where(found, marks['flags'][order][position], 0)
+        mask = np.where(found, marks['mask'][order][position], 0)
+        shifts.set_flags(flags, mask)
+        return int(found.sum())
+
+
+
+
+    def move_mark(self, employee, old_date, old_start_minute, new_date, new_start_minute):
+        """
+        Move a shift's mark after its date or entry time was edited, so it isn't left behind
+        under the old key. The moved bits are merged into a mark already at the new key.
+        """
+        old_day = int(np.datetime64(old_date, 'D').astype(np.int64))
+        new_day = int(np.datetime64(new_date, 'D').astype(np.int64))
+        if (old_day, int(old_start_minute)) == (new_day, int(new_start_minute)):
+            return
+        key = (employee, old_day, int(old_start_minute))
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                'SELECT flags, mask FROM shift_marks WHERE employee = ? AND day = ? AND start_minute = ?', key).fetchone()
+            if row is None:
+                return
+            self.connection.execute(
+                'DELETE FROM shift_marks WHERE employee = ? AND day = ? AND start_minute = ?', key)
+            self.connection.execute(UPSERT, (employee, new_day, int(new_start_minute)) + row)
+
+
+
+
+    def forget(self, employee, first_date=None, last_date=None):
+        """
+        Remove an employee's marks, optionally only between two dates.
+        """
+        query, parameters = 'DELETE FROM shift_marks WHERE employee = ?', [employee]
+        if first_date is not None:
+            query += ' AND day >= ?'
+            parameters.append(int(np.datetime64(first_date, 'D').astype(np.int64)))
+        if last_date is not None:
+            query += ' AND day <= ?'
+            parameters.append(int(np.datetime64(last_date, 'D').astype(np.int64)))
+        with self.lock, self.connection:
+            self.connection.execute(query, parameters)
@@ -0,0 +1,228 @@
+"""
+On-disk cache of parsed ShiftOrganizer files.
+Entries are keyed by the file's content hash, the Excel reader that parsed it and
+the parser version, and hold the shift records as columns in an uncompressed .npz
+file, so reopening a file that hasn't changed skips the Excel parse entirely.
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import zipfile
+
+import numpy as np
+
+import perf_trace
+from shift_reader import PARSER_VERSION, ShiftRecord, iter_shift_records, choose_engine
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+CACHE_SUFFIX = '.npz'
+
+# stored instead of None in the integer columns
+MISSING_MINUTE = -1
+MISSING_ROW = -1
+
+
+
+def default_cache_dir():
+    """
+    Where the cache lives: $SALARY_CALC_CACHE_DIR if set, otherwise the user's cache directory.
+    """
+    if os.environ.get('SALARY_CALC_CACHE_DIR'):
+        return os.environ['SALARY_CALC_CACHE_DIR']
+    if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+        return os.path.join(os.environ['LOCALAPPDATA'], 'SalaryCalculator', 'cache')
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'salary-calculator')
+
+
+
+def file_digest(file_path):
+    """
+    SHA-256 of the file's content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+
+def records_to_columns(records):
+    """
+    Convert ShiftRecords to a dict of numpy columns.
+    """
+    dates, roles, entry_minutes, exit_minutes, summaries, rows, problems = [], [], [], [], [], [], []
+    for record in records:
+        dates.append(record.date if record.date is not None else 'NaT')
+        roles.append(record.role)
+        entry_minutes.append(MISSING_MINUTE if record.entry_minute is None else record.entry_minute)
+        exit_minutes.append(MISSING_MINUTE if record.exit_minute is None else record.exit_minute)
+        summaries.append('' if record.summary is None else record.summary)
+        rows.append(MISSING_ROW if record.row is None else record.row)
+        problems.append('' if record.problem is None else record.problem)
+
+    return {
+        'date': np.array(dates, dtype='datetime64[D]'),
+        'role': np.array(roles, dtype=str),
+        'entry_minute': np.array(entry_minutes, dtype=np.int16),
+        'exit_minute': np.array(exit_minutes, dtype=np.int16),
+        'summary': np.array(summaries, dtype=str),
+        'row': np.array(rows, dtype=np.int32),
+        'problem': np.array(problems, dtype=str),
+    }
+
+
+
+def columns_to_records(columns):
+    """
+    Convert a dict of numpy columns back to ShiftRecords.
+    """
+    dates = columns['date'].tolist()  # NaT comes out as None
+    entry_minutes = columns['entry_minute'].tolist()
+    exit_minutes = columns['exit_minute'].tolist()
+    return [
+        ShiftRecord(
+            date=shift_date,
+            role=role,
+            entry_minute=None if entry_minute == MISSING_MINUTE else entry_minute,
+            exit_minute=None if exit_minute == MISSING_MINUTE else exit_minute,
+            summary=summary or None,
+            row=None if row == MISSING_ROW else row,
+            problem=problem or None,
+        )
+        for shift_date, role, entry_minute, exit_minute, summary, row, problem
+        in zip(dates, columns['role'].tolist(), entry_minutes, exit_minutes, columns['summary'].tolist(),
+               columns['row'].tolist(), columns['problem'].tolist())
+    ]
+
+
+
+class ShiftCache:
+    """
+    Size-bounded cache of parsed files. The least recently used entries are removed
+    once the cache grows past max_bytes.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+
+
+
+    def _entry_path(self, digest, engine):
+        # the readers don't always agree on a cell (pandas gives NaT where openpyxl gives None),
+        # so each engine gets its own entry and choosing another one really parses again
+        return os.path.join(self.directory, f"{digest}-{engine}-v{PARSER_VERSION}{CACHE_SUFFIX}")
+
+
+
+
+    def load(self, file_path, engine='auto'):
+        """
+        Return the ShiftRecords of a file, from the cache if the same content was parsed before
+        with the same engine. 'auto' shares the entries of the engine it picks.
+        Returns a list, not a stream: the entry is written from every record, and the callers
+        build the whole table from them anyway. The workbook is still read row by row.
+        """
+        if engine == 'auto':
+            engine = choose_engine(file_path)
+        entry_path = self._entry_path(file_digest(file_path), engine)
+
+        try:
+            with np.load(entry_path, allow_pickle=False) as entry:
+                records = columns_to_records(entry)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # not cached yet, or a broken entry that gets overwritten below
+            records = None
+
+        if records is not None:
+            self.hits += 1
+            perf_trace.count('cache.hits')
+            try:
+                os.utime(entry_path)  # mark as recently used
+            except OSError:
+                pass
+            return records
+
+        self.misses += 1
+        perf_trace.count('cache.misses')
+        with perf_trace.span('parse', engine=engine):
+            records = list(iter_shift_records(file_path, engine))
+        perf_trace.count('parse.rows', len(records))
+        self._store(entry_path, records)
+        return records
+
+
+
+
+    def _store(self, entry_path, records):
+        """
+        Write an entry atomically so a crash or a parallel run never leaves half a file behind.
+        """
+        temp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **records_to_columns(records))
+            os.replace(temp_path, entry_path)
+        except OSError:
+            # caching is best effort, the records are still returned
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.evict()
+
+
+
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # already removed by another process
+            total_bytes -= size
+
+
+
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_SUFFIX):
+                os.remove(os.path.join(self.directory, name))
+
+
+
+
+    def stats(self):
+        """
+        Hit and miss counts since the cache was created.
+        """
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,9 @@
+"""
+The bits of ShiftTable.flags.
+Kept apart from shift_table so the GUI can use them without importing numpy at startup.
+"""
+
+FLAG_CONTROL_ROOM = 1
+FLAG_HOLIDAY_EVE = 2
+FLAG_HOLIDAY = 4
+FLAG_LAST_DAY_OF_HOLIDAY = 8
@@ -0,0 +1,267 @@
+"""
+Turning the raw date and time cells of an export into days and minutes, a column
+at a time, with a reason for every row that can't be used.
+
+The cells come in whatever type the Excel reader produced: dates as datetime or
+date objects, YYYY-MM-DD strings or Excel serial numbers, times as datetime.time
+objects, HH:MM or HH:MM:SS strings or Excel serial fractions of a day. The values
+are sorted by type once, and each type is converted with numpy over all of its
+cells together instead of trying one format after another per cell.
+"""
+from collections import namedtuple
+from datetime import date, datetime, time
+
+import numpy as np
+
+from units import MINUTES_PER_DAY
+
+VALID = 0
+MISSING = 1
+INVALID = 2
+
+# the minutes of a time cell that is missing or invalid
+NO_MINUTE = -1
+
+# Excel's day 0, serial dates count from here (1900-03-01 and later, which covers every export)
+EXCEL_EPOCH = np.datetime64('1899-12-30', 'D')
+
+# the longest time string, HH:MM:SS
+MAX_CLOCK_LENGTH = 8
+
+# the worksheet row a record came from and why it can't be calculated
+RejectedRow = namedtuple('RejectedRow', ['row', 'reason'])
+
+# the kinds of cell the columns are split into
+_STRING, _NUMBER, _DATETIME, _DATE, _TIME, _NONE, _OTHER = range(7)
+
+# the ordinal of 1970-01-01, where datetime64 days count from
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+
+def _kind_of_type(cell_type):
+    if cell_type is type(None):
+        return _NONE
+    if issubclass(cell_type, bool):
+        return _OTHER
+    for base, kind in ((datetime, _DATETIME), (date, _DATE), (time, _TIME), (str, _STRING),
+                       ((int, float, np.number), _NUMBER)):  # datetime before date, it's a subclass
+        if issubclass(cell_type, base):
+            return kind
+    return _OTHER
+
+
+
+def _sort_cells(values):
+    """
+    The kind of each cell, worked out once per type rather than once per cell, and which
+    cells are missing: None, NaN, NaT and blank strings.
+    """
+    types = list(map(type, values))
+    kind_of = {cell_type: _kind_of_type(cell_type) for cell_type in set(types)}
+    kinds = np.fromiter(map(kind_of.__getitem__, types), dtype=np.uint8, count=len(values))
+
+    # NaN and NaT are the only values that aren't equal to themselves. Checked for every kind,
+    # pandas' NaT is a datetime subclass and would otherwise reach the date and time branches
+    missing = (kinds == _NONE) | np.fromiter((value != value for value in values), dtype=bool, count=len(values))
+    rows = np.flatnonzero(kinds == _STRING)
+    if len(rows):
+        missing[rows] = np.char.str_len(np.char.strip(np.array([values[row] for row in rows], dtype=str))) == 0
+    return kinds, missing
+
+
+
+def _character_codes(texts, width):
+    """
+    The stripped strings as a (rows, width) array of code points, zero padded, and their lengths.
+    Strings longer than width are cut, their length tells them apart.
+    """
+    texts = np.char.strip(np.asarray(texts, dtype=str))
+    lengths = np.char.str_len(texts)
+    codes = texts.astype(f'U{width}').view(np.uint32).reshape(len(texts), width)
+    return codes.astype(np.int32), lengths
+
+
+
+def _parse_clock_strings(texts):
+    """
+    Vectorized units.parse_clock: minutes since midnight of HH:MM or HH:MM:SS strings,
+    seconds dropped, and whether each one was valid.
+    """
+    codes, lengths = _character_codes(texts, MAX_CLOCK_LENGTH)
+    count = len(codes)
+    parts = [np.zeros(count, dtype=np.int32) for _ in range(3)]
+    part_lengths = [np.zeros(count, dtype=np.int32) for _ in range(3)]
+    part = np.zeros(count, dtype=np.int32)
+    valid = lengths <= MAX_CLOCK_LENGTH
+
+    # one pass per character position, over every string at once
+    for position in range(MAX_CLOCK_LENGTH):
+        code = np.ascontiguousarray(codes[:, position])
+        in_text = position < lengths
+        colon = in_text & (code == ord(':'))
+        digit = in_text & (code >= ord('0')) & (code <= ord('9'))
+        valid &= ~in_text | colon | digit
+        part += colon
+        valid &= part <= 2
+        for index in range(3):
+            in_part = digit & (part == index)
+            parts[index] = np.where(in_part, parts[index] * 10 + (code - ord('0')), parts[index])
+            part_lengths[index] += in_part
+
+    # 2 or 3 parts of 1 or 2 digits each, like parse_clock
+    valid &= (part >= 1) & (part_lengths[0] >= 1) & (part_lengths[1] >= 1) & (part_lengths[0] <= 2) \
+        & (part_lengths[1] <= 2) & ((part < 2) | ((part_lengths[2] >= 1) & (part_lengths[2] <= 2)))
+    valid &= (parts[0] <= 23) & (parts[1] <= 59) & (parts[2] <= 59)
+    return parts[0] * 60 + parts[1], valid
+
+
+
+def _parse_date_strings(texts):
+    """
+    Days of YYYY-MM-DD strings, and whether each one is a real date.
+    """
+    codes, lengths = _character_codes(texts, 10)
+    digits = codes - ord('0')
+    digit_positions = [0, 1, 2, 3, 5, 6, 8, 9]
+    valid = (lengths == 10) & (codes[:, 4] == ord('-')) & (codes[:, 7] == ord('-'))
+    valid &= np.all((digits[:, digit_positions] >= 0) & (digits[:, digit_positions] <= 9), axis=1)
+
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+    valid &= (year >= 1900) & (month >= 1) & (month <= 12) & (day >= 1)
+
+    # the first of the month plus the day, checked against the length of the month
+    month_start = np.where(valid, (year - 1970) * 12 + month - 1, 0).astype('datetime64[M]')
+    month_days = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    valid &= day <= month_days
+    return month_start.astype('datetime64[D]') + np.where(valid, day - 1, 0), valid
+
+
+
+def _numbers(values):
+    return np.array([float(value) for value in values], dtype=np.float64)
+
+
+
+def normalize_times(values):
+    """
+    Convert time cells to minutes since midnight. Returns the minutes (int16, NO_MINUTE
+    where there's no valid time) and a status per cell: VALID, MISSING or INVALID.
+    """
+    values = list(values)
+    kinds, missing = _sort_cells(values)
+    minutes = np.full(len(values), NO_MINUTE, dtype=np.int64)
+    valid = np.zeros(len(values), dtype=bool)
+
+    rows = np.flatnonzero(~missing & (kinds == _STRING))
+    if len(rows):
+        minutes[rows], valid[rows] = _parse_clock_strings([values[row] for row in rows])
+
+    rows = np.flatnonzero(~missing & ((kinds == _TIME) | (kinds == _DATETIME)))
+    if len(rows):
+        minutes[rows] = [values[row].hour * 60 + values[row].minute for row in rows]
+        valid[rows] = True
+
+    # Excel keeps a time as a fraction of a day, rounded to the second here so 0.3333.. is 08:00
+    rows = np.flatnonzero(~missing & (kinds == _NUMBER))
+    if len(rows):
+        numbers = _numbers([values[row] for row in rows])
+        usable = (numbers >= 0) & (numbers < 1)
+        seconds = np.rint(np.where(usable, numbers, 0) * MINUTES_PER_DAY * 60).astype(np.int64)
+        minutes[rows] = seconds % (MINUTES_PER_DAY * 60) // 60
+        valid[rows] = usable
+
+    status = np.where(missing, MISSING, np.where(valid, VALID, INVALID)).astype(np.uint8)
+    return np.where(valid, minutes, NO_MINUTE).astype(np.int16), status
+
+
+
+def normalize_dates(values):
+    """
+    Convert date cells to datetime64[D]. Returns the dates (NaT where there's no valid
+    date) and a status per cell: VALID, MISSING or INVALID.
+    """
+    values = list(values)
+    kinds, missing = _sort_cells(values)
+    dates = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+    valid = np.zeros(len(values), dtype=bool)
+
+    rows = np.flatnonzero(~missing & (kinds == _STRING))
+    if len(rows):
+        dates[rows], valid[rows] = _parse_date_strings([values[row] for row in rows])
+
+    # the ordinal is the day, the time of day of datetimes is dropped
+    rows = np.flatnonzero(~missing & ((kinds == _DATE) | (kinds == _DATETIME)))
+    if len(rows):
+        dates[rows] = np.array([values[row].toordinal() for row in rows], dtype=np.int64) - _EPOCH_ORDINAL
+        valid[rows] = True
+
+    rows = np.flatnonzero(~missing & (kinds == _NUMBER))
+    if len(rows):
+        numbers = _numbers([values[row] for row in rows])
+        usable = np.isfinite(numbers) & (numbers >= 61)  # serial 60 is Excel's 1900-02-29, which never was
+        dates[rows] = EXCEL_EPOCH + np.where(usable, np.floor(numbers), 0).astype(np.int64)
+        valid[rows] = usable
+
+    status = np.where(missing, MISSING, np.where(valid, VALID, INVALID)).astype(np.uint8)
+    dates[~valid] = np.datetime64('NaT')
+    return dates, status
+
+
+
+def _describe(name, status, value):
+    if status == MISSING:
+        return f"missing {name}"
+    return f"invalid {name} '{value}'"
+
+
+
+def normalize_columns(dates, entry_times, exit_times):
+    """
+    Normalize the date, entry and exit columns of some rows together. Returns the dates,
+    entry and exit minutes, and a problem per row: None for rows that can be calculated,
+    otherwise why not (for example "invalid entry time '25:00'").
+    """
+    dates = list(dates)
+    entry_times = list(entry_times)
+    exit_times = list(exit_times)
+    days, date_status = normalize_dates(dates)
+    entry_minutes, entry_status = normalize_times(entry_times)
+    exit_minutes, exit_status = normalize_times(exit_times)
+
+    problems = [None] * len(dates)
+    for row in np.flatnonzero((date_status != VALID) | (entry_status != VALID) | (exit_status != VALID)).tolist():
+        problems[row] = '; '.join(
+            _describe(name, status[row], values[row])
+            for name, status, values in (('date', date_status, dates), ('entry time', entry_status, entry_times),
+                                         ('exit time', exit_status, exit_times))
+            if status[row] != VALID
+        )
+    return days, entry_minutes, exit_minutes, problems
+
+
+
+def rejection_report(records):
+    """
+    The ShiftRecords that can't be calculated, as RejectedRows.
+    """
+    return [
+        RejectedRow(record.row, record.problem or "incomplete")
+        for record in records
+        if record.date is None or record.entry_minute is None or record.exit_minute is None
+    ]
+
+
+
+def format_rejections(rejected, limit=15):
+    """
+    A short text listing the rejected rows, for a message box or the console.
+    """
+    lines = [f"{len(rejected)} rows were skipped because they can't be calculated:"]
+    lines.extend(f"Row {rejection.row}: {rejection.reason}" if rejection.row is not None else rejection.reason
+                 for rejection in rejected[:limit])
+    if len(rejected) > limit:
+        lines.append(f"... and {len(rejected) - limit} more")
+    return '\n'.join(lines)
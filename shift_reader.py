@@ -0,0 +1,227 @@
+"""
+Reading ShiftOrganizer Excel exports.
+The file is read by one of several backends and comes out as a stream of
+ShiftRecord tuples, so callers can start working before the whole file is read.
+The date and time cells are converted in chunks of rows by shift_normalize.
+"""
+from collections import namedtuple
+import importlib.util
+
+# ShiftOrganizer exports have 4 title rows before the header row
+HEADER_ROWS_TO_SKIP = 4
+
+COLUMN_MAPPING = {
+    'תאריך': 'Date',
+    'תפקיד': 'Role',
+    'כניסה': 'Entry Time',
+    'יציאה': 'Exit Time',
+    'סיכום': 'Summary'
+}
+
+REQUIRED_COLUMNS = {'Date', 'Role'}
+
+# bump when the records produced for the same file change, so cached parses are rebuilt
+PARSER_VERSION = 2
+
+# rows normalized together, big enough for numpy to pay off and small enough to keep streaming
+NORMALIZE_CHUNK_ROWS = 10000
+
+# date is a datetime.date, the times are minutes since midnight, missing or invalid values are None.
+# row is the worksheet row number, and problem says why the record can't be calculated (None if it can)
+ShiftRecord = namedtuple('ShiftRecord', ['date', 'role', 'entry_minute', 'exit_minute', 'summary', 'row', 'problem'],
+                         defaults=(None, None))
+
+
+
+class InvalidShiftFileError(ValueError):
+    """
+    Raised when a file doesn't look like a ShiftOrganizer export.
+    """
+
+
+
+def _is_missing(value):
+    # NaN is the only value that isn't equal to itself
+    return value is None or value != value
+
+
+
+def _column_positions(header):
+    """
+    Find where each of the columns we use sits in the header row.
+    """
+    positions = {}
+    for index, name in enumerate(header):
+        column = COLUMN_MAPPING.get(str(name).strip()) if name is not None else None
+        if column and column not in positions:
+            positions[column] = index
+
+    if not REQUIRED_COLUMNS.issubset(positions):
+        current_columns = ', '.join(str(name) for name in header if name is not None)
+        raise InvalidShiftFileError(f"Excel file must contain columns: {', '.join(REQUIRED_COLUMNS)}. "
+                                    f"Current columns are: {current_columns}")
+    return positions
+
+
+
+def _normalized_records(chunk):
+    """
+    The ShiftRecords of a chunk of raw cells, with the dates and times of all of them converted together.
+    """
+    # numpy is only loaded once a file is read, the GUI imports this module at startup
+    from shift_normalize import normalize_columns
+
+    dates, entry_minutes, exit_minutes, problems = normalize_columns(chunk['date'], chunk['entry'], chunk['exit'])
+    entry_minutes = [None if minute < 0 else minute for minute in entry_minutes.tolist()]
+    exit_minutes = [None if minute < 0 else minute for minute in exit_minutes.tolist()]
+    for fields in zip(dates.tolist(), chunk['role'], entry_minutes, exit_minutes, chunk['summary'], chunk['row'], problems):
+        yield ShiftRecord(*fields)
+
+
+
+def _records_from_rows(rows):
+    """
+    Turn raw worksheet rows (header first) into ShiftRecords.
+    Rows without a role are skipped, they are the empty days in the export.
+    """
+    header = next(rows, None)
+    if header is None:
+        raise InvalidShiftFileError("Excel file is empty.")
+    positions = _column_positions(header)
+
+    def cell(row, column):
+        index = positions.get(column)
+        if index is None or index >= len(row):
+            return None
+        return row[index]
+
+    def new_chunk():
+        return {'row': [], 'date': [], 'role': [], 'entry': [], 'exit': [], 'summary': []}
+
+    chunk = new_chunk()
+    # the data starts on the row after the header
+    for row_number, row in enumerate(rows, start=HEADER_ROWS_TO_SKIP + 2):
+        role = cell(row, 'Role')
+        if _is_missing(role) or role == 'N/A':
+            continue
+
+        summary = cell(row, 'Summary')
+        chunk['row'].append(row_number)
+        chunk['date'].append(cell(row, 'Date'))
+        chunk['role'].append(str(role))
+        chunk['entry'].append(cell(row, 'Entry Time'))
+        chunk['exit'].append(cell(row, 'Exit Time'))
+        chunk['summary'].append(None if _is_missing(summary) else str(summary))
+        if len(chunk['row']) == NORMALIZE_CHUNK_ROWS:
+            yield from _normalized_records(chunk)
+            chunk = new_chunk()
+
+    yield from _normalized_records(chunk)
+
+
+
+def _openpyxl_rows(file_path):
+    """
+    Stream the rows with openpyxl in read-only mode, reading only the columns we use.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        header_row = HEADER_ROWS_TO_SKIP + 1
+        header = next(sheet.iter_rows(min_row=header_row, max_row=header_row, values_only=True), None)
+        if header is None:
+            return
+        positions = _column_positions(header)
+
+        # only ask openpyxl for the span of columns that holds our five
+        first_column = min(positions.values())
+        last_column = max(positions.values())
+        yield header[first_column:last_column + 1]
+        yield from sheet.iter_rows(min_row=header_row + 1, min_col=first_column + 1,
+                                   max_col=last_column + 1, values_only=True)
+    finally:
+        workbook.close()
+
+
+
+def _calamine_rows(file_path):
+    """
+    Stream the rows with python-calamine, which parses in Rust and handles .xls too.
+    """
+    from python_calamine import CalamineWorkbook
+
+    sheet = CalamineWorkbook.from_path(file_path).get_sheet_by_index(0)
+    rows = sheet.iter_rows() if hasattr(sheet, 'iter_rows') else iter(sheet.to_python(skip_empty_area=False))
+    for _ in range(HEADER_ROWS_TO_SKIP):
+        next(rows, None)
+    yield from rows
+
+
+
+def _pandas_rows(file_path):
+    """
+    Read the file with pandas. Not streaming, but works with any engine pandas has installed.
+    """
+    import pandas as pd
+
+    df = pd.read_excel(file_path, skiprows=HEADER_ROWS_TO_SKIP, header=0,
+                       usecols=lambda column: str(column).strip() in COLUMN_MAPPING)
+    yield tuple(df.columns)
+    yield from df.itertuples(index=False, name=None)
+
+
+
+# backends in order of preference, with the module each one needs
+ENGINES = {
+    'calamine': ('python_calamine', _calamine_rows),
+    'openpyxl': ('openpyxl', _openpyxl_rows),
+    'pandas': ('pandas', _pandas_rows),
+}
+
+
+
+def available_engines():
+    """
+    The reader backends that can be used in this environment, fastest first.
+    """
+    return [name for name, (module, _) in ENGINES.items() if importlib.util.find_spec(module) is not None]
+
+
+
+def choose_engine(file_path):
+    """
+    The engine 'auto' means for a file: the fastest installed one that can read it.
+    """
+    engines = available_engines()
+    if file_path.lower().endswith('.xls'):
+        # openpyxl can't read the old binary format
+        engines = [engine for engine in engines if engine != 'openpyxl']
+    if not engines:
+        raise ImportError("No Excel reader is installed, please install openpyxl.")
+    return engines[0]
+
+
+
+def iter_shift_records(file_path, engine='auto'):
+    """
+    Yield a ShiftRecord for every row with a role in a ShiftOrganizer export.
+    engine is one of ENGINES or 'auto' to use the fastest one installed.
+    Raises InvalidShiftFileError if the file doesn't have the required columns.
+    """
+    if engine == 'auto':
+        engine = choose_engine(file_path)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown Excel engine '{engine}', choose from: {', '.join(ENGINES)}")
+
+    _, read_rows = ENGINES[engine]
+    yield from _records_from_rows(read_rows(file_path))
+
+
+
+def is_complete(record):
+    """
+    True if the record has everything needed to calculate its pay.
+    """
+    return record.date is not None and record.entry_minute is not None and record.exit_minute is not None
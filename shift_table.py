@@ -0,0 +1,368 @@
+"""
+The loaded shifts as one typed, columnar table.
+The GUI keeps its data here and the Treeview only renders it, so calculations
+work on arrays and never parse display strings back.
+"""
+import calendar
+from collections import namedtuple
+
+import numpy as np
+
+import perf_trace
+from shift_flags import FLAG_CONTROL_ROOM, FLAG_HOLIDAY_EVE, FLAG_HOLIDAY, FLAG_LAST_DAY_OF_HOLIDAY
+from shift_reader import is_complete
+from units import MINUTES_PER_DAY, format_agorot, format_minutes
+
+# what a reload changed: row counts, and for each row of the reloaded table the row it was in before (-1 if new)
+ReloadDiff = namedtuple('ReloadDiff', ['unchanged', 'changed', 'added', 'removed', 'previous_index'])
+
+
+
+class ShiftTable:
+    """
+    One row per shift. Columns:
+    - date: datetime64[D]
+    - role: list of str
+    - start_minute / end_minute: int16 minutes since midnight, an end at or before
+      the start means the shift crosses midnight
+    - flags: uint8 bitmask of the FLAG_* values
+    - pay / travel_charge: int64 agorot, 0 until calculated
+    Edits mark their rows dirty, and recalculate() only prices the dirty rows. The
+    pay, travel charge and hours totals are kept as running sums that each change
+    adjusts by its difference, so reading them never walks the table.
+    """
+
+    def __init__(self, dates, roles, start_minutes, end_minutes, flags=None):
+        self.date = np.asarray(dates, dtype='datetime64[D]')
+        self.role = list(roles)
+        self.start_minute = np.asarray(start_minutes, dtype=np.int16)
+        self.end_minute = np.asarray(end_minutes, dtype=np.int16)
+        self.flags = np.zeros(len(self.date), dtype=np.uint8) if flags is None else np.asarray(flags, dtype=np.uint8)
+        self.pay = np.zeros(len(self.date), dtype=np.int64)
+        self.travel_charge = np.zeros(len(self.date), dtype=np.int64)
+
+        # rows whose pay is missing or out of date, and a counter of edits per row so results
+        # calculated in the background are only applied if the row didn't change meanwhile
+        self.dirty = np.ones(len(self.date), dtype=bool)
+        self.version = np.zeros(len(self.date), dtype=np.uint32)
+        self._total_pay = 0
+        self._total_travel_charge = 0
+        self._total_minutes = int(self.worked_minutes().sum())
+
+
+
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a table from ShiftRecords, leaving out the ones that can't be calculated.
+        """
+        with perf_trace.span('normalize'):
+            complete = [record for record in records if is_complete(record)]
+            table = cls(
+                [record.date for record in complete],
+                [record.role for record in complete],
+                [record.entry_minute for record in complete],
+                [record.exit_minute for record in complete],
+            )
+        perf_trace.count('normalize.rows', len(table))
+        return table
+
+
+
+
+    def __len__(self):
+        return len(self.date)
+
+
+
+
+    def weekday(self, rows=slice(None)):
+        """
+        Day of the week of each shift, 0 = Monday.
+        """
+        # 1970-01-01 was a Thursday
+        return (self.date[rows].astype(np.int64) + 3) % 7
+
+
+
+
+    def worked_minutes(self, rows=slice(None)):
+        """
+        Length of each shift in minutes, overnight shifts included.
+        """
+        minutes = (self.end_minute[rows].astype(np.int32) - self.start_minute[rows]) % MINUTES_PER_DAY
+        return np.where(minutes == 0, MINUTES_PER_DAY, minutes)
+
+
+
+
+    def has_flag(self, flag, rows=slice(None)):
+        """
+        Boolean array, True where the flag is set.
+        """
+        return (self.flags[rows] & flag) != 0
+
+
+
+
+    def set_flag(self, flag, value, rows=slice(None)):
+        """
+        Set or clear a flag on the given rows (all rows by default).
+        Only the rows where the flag actually changed become dirty.
+        """
+        before = self.flags[rows].copy()
+        if value:
+            self.flags[rows] |= flag
+        else:
+            self.flags[rows] &= ~np.uint8(flag)
+        changed = before != self.flags[rows]
+        self.dirty[rows] |= changed
+        self.version[rows] += changed
+
+
+
+
+    def set_flags(self, flags, mask):
+        """
+        Replace the bits in mask with the matching bits of flags, one value per row.
+        mask is one value for every row or one per row. Only the rows whose flags
+        actually changed become dirty.
+        """
+        mask = np.asarray(mask, dtype=np.uint8)
+        new_flags = (self.flags & ~mask) | (np.asarray(flags, dtype=np.uint8) & mask)
+        changed = new_flags != self.flags
+        self.flags = new_flags
+        self.dirty |= changed
+        self.version += changed
+
+
+
+
+    def update_shift(self, index, date, role, start_minute, end_minute):
+        """
+        Replace the date, role and times of one shift, and mark it dirty.
+        """
+        old_minutes = int(self.worked_minutes(index))
+        self.date[index] = date
+        self.role[index] = role
+        self.start_minute[index] = start_minute
+        self.end_minute[index] = end_minute
+        self._total_minutes += int(self.worked_minutes(index)) - old_minutes
+        self.dirty[index] = True
+        self.version[index] += 1
+
+
+
+
+    def dirty_rows(self):
+        """
+        Indices of the rows that need to be calculated.
+        """
+        return np.flatnonzero(self.dirty)
+
+
+
+
+    def batch_inputs(self, rows):
+        """
+        Copy the compute_batch arguments for the given rows, so they can be calculated
+        on another thread while the table keeps being edited.
+        """
+        return (
+            self.date[rows],
+            self.start_minute[rows],
+            self.end_minute[rows],
+            self.has_flag(FLAG_CONTROL_ROOM, rows),
+            self.has_flag(FLAG_HOLIDAY_EVE, rows),
+            self.has_flag(FLAG_HOLIDAY, rows),
+            self.has_flag(FLAG_LAST_DAY_OF_HOLIDAY, rows),
+        )
+
+
+
+
+    def apply_results(self, rows, versions, pay, travel_charge):
+        """
+        Store calculated pay for the given rows and adjust the running totals by how much
+        each of them changed. Rows edited since their inputs were copied (their version
+        moved on) are skipped and stay dirty.
+        """
+        current = self.version[rows] == versions
+        rows, pay, travel_charge = rows[current], pay[current], travel_charge[current]
+
+        old_pay = self.pay[rows]
+        old_travel_charge = self.travel_charge[rows]
+        self.pay[rows] = pay
+        self.travel_charge[rows] = travel_charge
+        self._total_pay += int((pay - old_pay).sum())
+        self._total_travel_charge += int((travel_charge - old_travel_charge).sum())
+        self.dirty[rows] = False
+        return rows
+
+
+
+
+    def recalculate(self, salary_calculator):
+        """
+        Calculate pay and travel charge for the dirty rows only.
+        Returns the indices of the rows that were recalculated.
+        """
+        rows = self.dirty_rows()
+        if not len(rows):
+            return rows
+
+        pay, travel_charge = salary_calculator.compute_batch(*self.batch_inputs(rows))
+        return self.apply_results(rows, self.version[rows], pay, travel_charge)
+
+
+
+
+    def calculate(self, salary_calculator):
+        """
+        Calculate every row from scratch.
+        """
+        self.dirty[:] = True
+        return self.recalculate(salary_calculator)
+
+
+
+
+    def total_pay(self):
+        """
+        Sum of the calculated pay in agorot. Dirty rows count with their last calculated pay.
+        """
+        return self._total_pay
+
+
+
+
+    def total_travel_charge(self):
+        """
+        Sum of the calculated travel charges in agorot. Dirty rows count with their last calculated charge.
+        """
+        return self._total_travel_charge
+
+
+
+
+    def total_minutes(self):
+        """
+        Sum of the minutes worked on every shift.
+        """
+        return self._total_minutes
+
+
+
+
+    def total_hours(self):
+        """
+        Sum of the hours worked on every shift, for display.
+        """
+        return self._total_minutes / 60
+
+
+
+
+    def display_row(self, index):
+        """
+        The Treeview values of one row: Date, Day of Week, Role, Entry Time, Exit Time,
+        Control Room, Pay, Travel Charge and Hours Worked.
+        """
+        # a dirty row shows no pay until it's calculated again
+        dirty = self.dirty[index]
+        return (
+            str(self.date[index]),
+            calendar.day_name[int(self.weekday(index))],
+            self.role[index],
+            format_minutes(int(self.start_minute[index])),
+            format_minutes(int(self.end_minute[index])),
+            "Yes" if self.flags[index] & FLAG_CONTROL_ROOM else "No",
+            "" if dirty else format_agorot(self.pay[index]),
+            "" if dirty else format_agorot(self.travel_charge[index]),
+            f"{int(self.worked_minutes(index)) / 60:.2f}",
+        )
+
+
+
+def _match_keys(current_keys, reloaded_keys):
+    """
+    For every reloaded key, the index of the current row with the same key, or -1.
+    A key that shows up several times is matched in order, the first with the first.
+    """
+    # number the repeats of each key, so (key, repeat) is unique on both sides
+    _, codes = np.unique(np.concatenate([current_keys, reloaded_keys]), return_inverse=True)
+    codes = codes.reshape(-1).astype(np.int64)
+
+    def numbered(key_codes):
+        order = np.argsort(key_codes, kind='stable')
+        sorted_codes = key_codes[order]
+        group_start = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        repeat = np.empty(len(key_codes), dtype=np.int64)
+        repeat[order] = np.arange(len(key_codes)) - np.repeat(group_start, np.diff(np.r_[group_start, len(key_codes)]))
+        return key_codes * (len(codes) + 1) + repeat
+
+    if not len(current_keys):
+        return np.full(len(reloaded_keys), -1, dtype=np.int64)
+    current_numbered = numbered(codes[:len(current_keys)])
+    reloaded_numbered = numbered(codes[len(current_keys):])
+    order = np.argsort(current_numbered)
+    position = np.minimum(np.searchsorted(current_numbered[order], reloaded_numbered), len(order) - 1)
+    candidates = order[position]
+    return np.where(current_numbered[candidates] == reloaded_numbered, candidates, -1).astype(np.int64)
+
+
+
+def merge_reloaded(current, reloaded):
+    """
+    Merge a freshly parsed table into the one being worked on, after the file changed on disk.
+    Rows are matched by (date, role, entry, exit) first, and what's left by (date, role), which
+    is a shift whose times were changed. Matched rows keep their flags (control room and any
+    holiday marks set by hand), and unchanged rows also keep their calculated pay. Changed and
+    added rows come out dirty, with the flags of the reloaded table.
+    Returns the merged table, in the reloaded file's order, and a ReloadDiff.
+    """
+    # one int64 code per role, shared by both tables
+    roles, role_codes = np.unique(np.concatenate([np.asarray(current.role, dtype=object).astype(str),
+                                                  np.asarray(reloaded.role, dtype=object).astype(str)]),
+                                  return_inverse=True)
+    role_codes = role_codes.astype(np.int64)
+    current_day = current.date.astype(np.int64) * len(roles) + role_codes[:len(current)]
+    reloaded_day = reloaded.date.astype(np.int64) * len(roles) + role_codes[len(current):]
+    current_shift = (current_day * MINUTES_PER_DAY + current.start_minute) * MINUTES_PER_DAY + current.end_minute
+    reloaded_shift = (reloaded_day * MINUTES_PER_DAY + reloaded.start_minute) * MINUTES_PER_DAY + reloaded.end_minute
+
+    previous_index = _match_keys(current_shift, reloaded_shift)
+    unchanged = previous_index >= 0
+    current_unmatched = np.ones(len(current), dtype=bool)
+    current_unmatched[previous_index[unchanged]] = False
+
+    # what's left is matched again on the day only
+    left_current = np.flatnonzero(current_unmatched)
+    left_reloaded = np.flatnonzero(~unchanged)
+    day_match = _match_keys(current_day[left_current], reloaded_day[left_reloaded])
+    found = day_match >= 0
+    previous_index[left_reloaded[found]] = left_current[day_match[found]]
+    current_unmatched[left_current[day_match[found]]] = False
+    changed = (previous_index >= 0) & ~unchanged
+
+    merged = ShiftTable(reloaded.date, reloaded.role, reloaded.start_minute, reloaded.end_minute, reloaded.flags.copy())
+    matched = np.flatnonzero(previous_index >= 0)
+    merged.flags[matched] = current.flags[previous_index[matched]]
+    merged.version[matched] = current.version[previous_index[matched]] + changed[matched]
+
+    kept = np.flatnonzero(unchanged)
+    merged.pay[kept] = current.pay[previous_index[kept]]
+    merged.travel_charge[kept] = current.travel_charge[previous_index[kept]]
+    merged.dirty[kept] = current.dirty[previous_index[kept]]
+    merged._total_pay = int(merged.pay.sum())
+    merged._total_travel_charge = int(merged.travel_charge.sum())
+
+    diff = ReloadDiff(
+        unchanged=int(unchanged.sum()),
+        changed=int(changed.sum()),
+        added=int((previous_index < 0).sum()),
+        removed=int(current_unmatched.sum()),
+        previous_index=previous_index,
+    )
+    return merged, diff
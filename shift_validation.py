@@ -0,0 +1,181 @@
+"""
+Checks for shifts that would be paid twice: the same shift exported twice, shifts
+that overlap (an overnight shift running into the next morning's shift counts
+too), and shifts with only a few minutes between them, which is usually one shift
+split in two or a mistyped time.
+
+Every shift is placed on one timeline of absolute minutes (days since 1970 times
+1440 plus the entry time), sorted once by employee and start, and compared only
+with the shift that ends latest among those before it. That's a sort and a single
+vectorized sweep, so a team's whole year is checked in one go instead of comparing
+every pair of shifts.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from units import MINUTES_PER_DAY, format_minutes
+
+DUPLICATE = 1
+OVERLAP = 2
+SHORT_GAP = 3
+
+KIND_NAMES = {DUPLICATE: 'duplicate', OVERLAP: 'overlap', SHORT_GAP: 'short gap'}
+
+# a break shorter than this between two shifts looks like one shift entered as two
+SHORT_GAP_MINUTES = 30
+
+# room for every employee's timeline side by side in one int64, minutes up to the year 10000
+_EMPLOYEE_SPAN = 1 << 32
+# bits for a shift's length under its start in the sort key, a shift is at most a day
+_LENGTH_BITS = 11
+
+# the problems found, one per entry in each array: kind, the row of the later shift, the row
+# it clashes with, and the minutes of overlap or of the gap between them
+ShiftIssues = namedtuple('ShiftIssues', ['kind', 'row', 'other_row', 'minutes'])
+
+
+
+def _timeline(dates, start_minutes, end_minutes):
+    """
+    Absolute start and end minutes of each shift, shifts that cross midnight ending on the next day.
+    """
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    start = np.asarray(start_minutes, dtype=np.int64)
+    end = np.asarray(end_minutes, dtype=np.int64)
+    end = np.where(end <= start, end + MINUTES_PER_DAY, end)
+    return days * MINUTES_PER_DAY + start, days * MINUTES_PER_DAY + end
+
+
+
+def _sweep(dates, start_minutes, end_minutes, employees):
+    """
+    The shifts sorted by employee, start and end, with what each one is compared against.
+    Returns the sort order, the sorted starts and ends, whether each sorted shift has
+    an earlier one of the same employee, the latest end among those earlier shifts and
+    the sorted position of the shift that ends there.
+    """
+    start, end = _timeline(dates, start_minutes, end_minutes)
+    employees = np.zeros(len(start), dtype=np.int64) if employees is None else np.asarray(employees, dtype=np.int64)
+    # one int64 key per shift, so it's a single argsort rather than a lexsort over three columns
+    order = np.argsort(((employees * _EMPLOYEE_SPAN + start) << _LENGTH_BITS) + (end - start))
+    start, end, employees = start[order], end[order], employees[order]
+
+    # each employee on a timeline of their own, so the running latest end never carries over
+    # from one employee to the next
+    offset = employees * _EMPLOYEE_SPAN
+    latest_end = np.maximum.accumulate(end + offset) - offset
+    # where the latest end was set, carried forward
+    holder = np.maximum.accumulate(np.where(end == latest_end, np.arange(len(end)), 0))
+
+    has_previous = np.r_[False, employees[1:] == employees[:-1]]
+    previous_end = np.r_[0, latest_end[:-1]]
+    previous_holder = np.r_[0, holder[:-1]]
+    return order, start, end, has_previous, previous_end, previous_holder
+
+
+
+def find_shift_issues(dates, start_minutes, end_minutes, employees=None, short_gap_minutes=SHORT_GAP_MINUTES):
+    """
+    Find duplicate, overlapping and suspiciously close shifts. employees (an id per shift)
+    keeps different employees apart, without it every shift is taken to be the same
+    person's. Returns ShiftIssues sorted by employee and time, with table rows.
+    """
+    order, start, end, has_previous, previous_end, previous_holder = _sweep(
+        dates, start_minutes, end_minutes, employees)
+    if not len(order):
+        empty = np.zeros(0, dtype=np.int64)
+        return ShiftIssues(empty.astype(np.uint8), empty, empty, empty)
+
+    # sorted by start and end, an identical shift is always right before its copy
+    duplicate = has_previous & np.r_[False, (start[1:] == start[:-1]) & (end[1:] == end[:-1])]
+    overlap = has_previous & ~duplicate & (start < previous_end)
+    gap = start - previous_end
+    short_gap = has_previous & (gap > 0) & (gap < short_gap_minutes)
+
+    kind = np.zeros(len(order), dtype=np.uint8)
+    kind[short_gap] = SHORT_GAP
+    kind[overlap] = OVERLAP
+    kind[duplicate] = DUPLICATE
+    found = np.flatnonzero(kind)
+
+    # a duplicate is compared with the shift right before it, the rest with the one that ends latest
+    other = np.where(duplicate[found], found - 1, previous_holder[found])
+    minutes = np.where(kind[found] == SHORT_GAP, gap[found], np.minimum(end[found], previous_end[found]) - start[found])
+    return ShiftIssues(kind[found], order[found], order[other], minutes)
+
+
+
+def merge_plan(dates, start_minutes, end_minutes, employees=None):
+    """
+    How to merge the duplicate and overlapping shifts: every run of shifts that overlap
+    one another becomes the first of them, stretched to where the last one ends.
+    Shifts that only touch (one ends when the next starts) are left apart, and so are
+    runs that would end up longer than a day. Returns the rows to keep in table order,
+    and the start and end minutes (since midnight) they take.
+    """
+    order, start, end, has_previous, previous_end, _ = _sweep(dates, start_minutes, end_minutes, employees)
+    if not len(order):
+        return order, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # a run starts at every shift that doesn't overlap anything before it
+    run_start = ~has_previous | (start >= previous_end)
+    run = np.cumsum(run_start) - 1
+    first = np.flatnonzero(run_start)
+    run_end = np.maximum.reduceat(end, first)
+
+    # runs too long for one shift stay as they are
+    too_long = run_end - start[first] > MINUTES_PER_DAY
+    keep = run_start | too_long[run]
+    merged_end = np.where(too_long[run] | ~run_start, end, run_end[run])
+
+    rows = order[keep]
+    kept_order = np.argsort(rows, kind='stable')
+    start_minute = start[keep] % MINUTES_PER_DAY
+    end_minute = merged_end[keep] % MINUTES_PER_DAY
+    return rows[kept_order], start_minute[kept_order], end_minute[kept_order]
+
+
+
+def check_shift_table(shifts, short_gap_minutes=SHORT_GAP_MINUTES):
+    """
+    find_shift_issues over the rows of a ShiftTable.
+    """
+    return find_shift_issues(shifts.date, shifts.start_minute, shifts.end_minute, short_gap_minutes=short_gap_minutes)
+
+
+
+def merge_shift_table(shifts):
+    """
+    A new ShiftTable with the duplicate and overlapping shifts merged, see merge_plan. A merged
+    shift keeps the date, role and marks of the shift that started first, and is calculated again.
+    """
+    rows, start_minute, end_minute = merge_plan(shifts.date, shifts.start_minute, shifts.end_minute)
+    return type(shifts)(shifts.date[rows], [shifts.role[row] for row in rows.tolist()],
+                        start_minute, end_minute, shifts.flags[rows])
+
+
+
+def format_shift_issues(issues, dates, start_minutes, end_minutes, limit=15, row_label=None):
+    """
+    A short text listing the issues, for a message box or the console. row_label is a function
+    naming a row (for example by its employee), by default rows are shown counted from 1.
+    """
+    def describe(row):
+        label = row_label(row) if row_label is not None else f"row {row + 1}"
+        return (f"{label} ({dates[row]} {format_minutes(int(start_minutes[row]))}-"
+                f"{format_minutes(int(end_minutes[row]))})")
+
+    counts = ', '.join(f"{int(np.count_nonzero(issues.kind == kind))} {name}"
+                       for kind, name in KIND_NAMES.items() if np.any(issues.kind == kind))
+    lines = [f"{len(issues.kind)} shifts look wrong: {counts}"]
+    for kind, row, other_row, minutes in list(zip(*issues))[:limit]:
+        if kind == DUPLICATE:
+            lines.append(f"{describe(row)} is the same as {describe(other_row)}")
+        elif kind == OVERLAP:
+            lines.append(f"{describe(row)} overlaps {describe(other_row)} by {minutes} minutes")
+        else:
+            lines.append(f"{describe(row)} starts {minutes} minutes after {describe(other_row)} ends")
+    if len(issues.kind) > limit:
+        lines.append(f"... and {len(issues.kind) - limit} more")
+    return '\n'.join(lines)
@@ -0,0 +1,217 @@
+"""
+Startup profiling: how long until the window shows up, and what each import costs.
+
+Set SALARY_CALC_PROFILE_STARTUP=1 to print a report to stderr when the window
+first appears, or set it to a file path to write the report there (the built
+app has no console). `python -m startup_profile` times importing the GUI
+without opening a window, and fails if it takes longer than the target.
+
+Times are measured from when Python starts running the app, so the unpacking
+done by the --onefile build before that isn't included.
+"""
+import argparse
+import builtins
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+PROCESS_START = time.perf_counter()
+
+# time to first window we want to stay under, can be changed with $SALARY_CALC_STARTUP_TARGET_MS
+STARTUP_TARGET_MS = 1000
+
+_profiler = None
+
+
+
+class StartupProfiler:
+    """
+    Records milestones since startup, and the time of every module imported while
+    it's installed. Each import gets its cumulative time (with the modules it
+    imported) and its self time (without them).
+    """
+
+    def __init__(self, start_time=PROCESS_START):
+        self.start_time = start_time
+        self.milestones = []  # (label, ms since start)
+        self.imports = {}  # module name -> (cumulative ms, self ms)
+        self._original_import = None
+        self._local = threading.local()  # per-thread stack of child import time
+
+
+
+
+    def install(self):
+        """
+        Start timing imports.
+        """
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+
+
+
+    def uninstall(self):
+        """
+        Stop timing imports.
+        """
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+
+
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original_import = self._original_import or builtins.__import__
+        module_name = name
+        if level:
+            try:
+                module_name = importlib.util.resolve_name('.' * level + name, (globals or {}).get('__package__'))
+            except (ImportError, ValueError):
+                pass
+        if module_name in sys.modules:
+            # already imported, nothing to time
+            return original_import(name, globals, locals, fromlist, level)
+
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.imports.setdefault(module_name, (elapsed * 1000, (elapsed - children) * 1000))
+
+
+
+
+    def mark(self, label):
+        """
+        Record a milestone, returns the ms since startup.
+        """
+        elapsed_ms = (time.perf_counter() - self.start_time) * 1000
+        self.milestones.append((label, elapsed_ms))
+        return elapsed_ms
+
+
+
+
+    def report(self, limit=15, target_ms=None):
+        """
+        The milestones and the most expensive imports as text.
+        """
+        lines = ["Startup profile (ms since startup):"]
+        for label, elapsed_ms in self.milestones:
+            lines.append(f"  {elapsed_ms:9.1f}  {label}")
+        if target_ms is not None and self.milestones:
+            elapsed_ms = self.milestones[-1][1]
+            status = "OK" if elapsed_ms <= target_ms else "OVER TARGET"
+            lines.append(f"  target {target_ms} ms: {status}")
+
+        lines.append(f"Slowest imports by self time (of {len(self.imports)}), cumulative / self ms:")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        for module_name, (cumulative_ms, self_ms) in slowest:
+            lines.append(f"  {cumulative_ms:9.1f} {self_ms:9.1f}  {module_name}")
+        return '\n'.join(lines)
+
+
+
+def target_ms():
+    """
+    The startup target in ms, from $SALARY_CALC_STARTUP_TARGET_MS if set.
+    """
+    try:
+        return int(os.environ.get('SALARY_CALC_STARTUP_TARGET_MS', STARTUP_TARGET_MS))
+    except ValueError:
+        return STARTUP_TARGET_MS
+
+
+
+def start_from_env():
+    """
+    Start profiling if $SALARY_CALC_PROFILE_STARTUP is set. Call it before the other imports.
+    """
+    global _profiler
+    if _profiler is None and os.environ.get('SALARY_CALC_PROFILE_STARTUP'):
+        _profiler = StartupProfiler()
+        _profiler.install()
+    return _profiler
+
+
+
+def mark(label):
+    """
+    Record a milestone if profiling is on.
+    """
+    if _profiler is not None:
+        _profiler.mark(label)
+
+
+
+def report_when_shown(root):
+    """
+    Finish profiling once the Tk root window is first mapped: record time to first
+    window, stop timing imports and write the report.
+    """
+    if _profiler is None:
+        return
+
+    def on_map(event):
+        if event.widget is not root:
+            return
+        root.unbind('<Map>', binding)
+        _profiler.mark('first window shown')
+        _profiler.uninstall()
+        _write_report(_profiler.report(target_ms=target_ms()))
+
+    binding = root.bind('<Map>', on_map, add='+')
+
+
+
+def _write_report(text):
+    destination = os.environ.get('SALARY_CALC_PROFILE_STARTUP')
+    if destination in (None, '', '1'):
+        print(text, file=sys.stderr)
+        return
+    try:
+        with open(destination, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    except OSError as e:
+        print(f"Could not write the startup profile to {destination}: {e}", file=sys.stderr)
+
+
+
+def main(argv=None):
+    """
+    Time importing the GUI module, without opening a window.
+    """
+    parser = argparse.ArgumentParser(prog='startup_profile', description='Time importing the Salary Calculator GUI')
+    parser.add_argument('--target-ms', type=int, default=target_ms(), help='fail if the import takes longer than this')
+    parser.add_argument('--limit', type=int, default=15, help='number of imports to list')
+    args = parser.parse_args(argv)
+
+    # gui imports this module by name, make sure it gets this instance and not a second copy
+    global _profiler
+    sys.modules.setdefault('startup_profile', sys.modules[__name__])
+    _profiler = StartupProfiler(time.perf_counter())
+    _profiler.install()
+    try:
+        import gui  # noqa: F401
+    finally:
+        _profiler.uninstall()
+    elapsed_ms = _profiler.mark('gui imported')
+
+    print(_profiler.report(args.limit, args.target_ms))
+    return 0 if elapsed_ms <= args.target_ms else 1
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+from datetime import date
+
+from holiday_calendar import holiday_calendar, holidays_in_year
+from shift_flags import FLAG_HOLIDAY, FLAG_HOLIDAY_EVE, FLAG_LAST_DAY_OF_HOLIDAY
+
+
+
+def test_holidays_in_2024():
+    assert holidays_in_year(2024) == [
+        (date(2024, 4, 23), 'Pesach'),
+        (date(2024, 4, 29), 'Last Day of Pesach'),
+        (date(2024, 5, 14), "Yom Ha'atzmaut"),
+        (date(2024, 6, 12), 'Shavuot'),
+        (date(2024, 10, 3), 'Rosh Hashana'),
+        (date(2024, 10, 4), 'Rosh Hashana'),
+        (date(2024, 10, 12), 'Yom Kippur'),
+        (date(2024, 10, 17), 'Sukkot'),
+        (date(2024, 10, 24), 'Shemini Atzeret'),
+    ]
+
+
+
+def test_flags_around_a_holiday():
+    calendar = holiday_calendar(2024, 2024)
+    flags = calendar.flags_for(['2024-10-02', '2024-10-03', '2024-10-04', '2024-10-05', '2023-12-31']).tolist()
+    assert flags == [FLAG_HOLIDAY_EVE, FLAG_HOLIDAY, FLAG_HOLIDAY, FLAG_LAST_DAY_OF_HOLIDAY, 0]
@@ -0,0 +1,42 @@
+import numpy as np
+
+from payroll_archive import PayrollArchive
+from payroll_store import EMPTY_TOTALS, PayrollTotals
+
+
+
+def _add_month(archive, employee, month, pay=10000):
+    dates = np.arange(f'{month}-01', f'{month}-06', dtype='datetime64[D]')
+    archive.add(employee, dates, [480] * 5, [960] * 5, [pay] * 5, [1200] * 5)
+
+
+
+def test_totals_between_dates(tmp_path):
+    archive = PayrollArchive(str(tmp_path))
+    _add_month(archive, 'dana', '2024-01')
+    _add_month(archive, 'dana', '2024-02')
+    _add_month(archive, 'noam', '2024-02', pay=5000)
+
+    assert archive.employees() == ['dana', 'noam']
+    assert archive.totals(employee='dana') == PayrollTotals(10, 4800, 100000, 12000)
+    assert archive.totals('2024-01-03', '2024-02-02') == PayrollTotals(7, 3360, 60000, 8400)
+    assert archive.year_to_date('2024-02-01') == PayrollTotals(7, 3360, 65000, 8400)
+    assert archive.totals('2023-01-01', '2023-12-31') == EMPTY_TOTALS
+
+
+
+def test_adding_the_same_days_replaces_them(tmp_path):
+    archive = PayrollArchive(str(tmp_path))
+    _add_month(archive, 'dana', '2024-01')
+    _add_month(archive, 'dana', '2024-02')
+    # a corrected January without the 4th
+    archive.add('dana', ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-05'],
+                [480] * 4, [960] * 4, [20000] * 4, [0] * 4)
+
+    assert archive.totals('2024-01-01', '2024-01-31', 'dana') == PayrollTotals(4, 1920, 80000, 0)
+    # the running totals after the replaced days were worked out again
+    assert archive.totals(employee='dana') == PayrollTotals(9, 4320, 130000, 6000)
+    assert archive.shifts('dana', '2024-02-01', '2024-02-01')['pay'].tolist() == [10000]
+
+    # a fresh archive reads the same from disk
+    assert PayrollArchive(str(tmp_path)).totals(employee='dana') == PayrollTotals(9, 4320, 130000, 6000)
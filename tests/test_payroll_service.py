@@ -0,0 +1,52 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+from payroll_service import PayrollService
+
+SHIFT = {'date': '2024-05-10', 'start': '16:00', 'end': '23:30'}
+
+
+
+def _post(body):
+    service = PayrollService()
+    return asyncio.run(service.handle_request('POST', '/calculate', body if isinstance(body, bytes) else
+                                              json.dumps(body).encode('utf-8')))
+
+
+
+def test_calculates_a_shift():
+    status, payload = _post(dict(SHIFT, control_room=False))
+    assert status == HTTPStatus.OK
+    assert set(payload) == {'pay_agorot', 'travel_charge_agorot'}
+    status, payload = _post({'shifts': [SHIFT, SHIFT]})
+    assert status == HTTPStatus.OK and len(payload['shifts']) == 2
+
+
+
+@pytest.mark.parametrize('body', [
+    b'not json',
+    b'42',
+    [SHIFT, 'x'],
+    {'start': '16:00', 'end': '23:30'},
+    dict(SHIFT, date='10/05/2024'),
+    dict(SHIFT, date=None),
+    dict(SHIFT, date='1900-01-01'),
+    dict(SHIFT, date='9999-01-01'),
+    dict(SHIFT, start='25:00'),
+    dict(SHIFT, control_room='false'),
+    dict(SHIFT, holiday=1),
+])
+def test_bad_requests_get_400(body):
+    status, payload = _post(body)
+    assert status == HTTPStatus.BAD_REQUEST
+    assert payload['error']
+
+
+
+def test_unknown_path_and_method():
+    service = PayrollService()
+    assert asyncio.run(service.handle_request('POST', '/nope', b''))[0] == HTTPStatus.NOT_FOUND
+    assert asyncio.run(service.handle_request('GET', '/calculate', b''))[0] == HTTPStatus.METHOD_NOT_ALLOWED
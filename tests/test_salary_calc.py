@@ -0,0 +1,46 @@
+from datetime import date, time, timedelta
+
+import numpy as np
+
+from salary_calc import SalaryCalculator
+
+# a week around a holiday, with day, evening, night and overnight shifts
+SHIFT_TIMES = [(time(7, 0), time(15, 0)), (time(14, 30), time(23, 0)), (time(22, 0), time(6, 30)),
+               (time(16, 0), time(16, 0)), (time(0, 0), time(8, 0))]
+
+
+
+def _shifts():
+    first = date(2024, 4, 18)
+    for offset in range(9):
+        day = first + timedelta(days=offset)
+        for index, (start, end) in enumerate(SHIFT_TIMES):
+            yield day, start, end, (offset + index) % 2 == 0, offset == 4, offset == 5, offset == 6
+
+
+
+def test_compute_batch_matches_add_work_day():
+    calculator = SalaryCalculator()
+    shifts = list(_shifts())
+    for day, start, end, control_room, holiday_eve, holiday, last_day in shifts:
+        calculator.add_work_day(day, start, end, control_room, holiday_eve, day.weekday() == 4,
+                                day.weekday() == 5, holiday, last_day)
+
+    columns = list(zip(*shifts))
+    pay, travel_charge = calculator.compute_batch(
+        columns[0], [start.hour * 60 + start.minute for start in columns[1]],
+        [end.hour * 60 + end.minute for end in columns[2]], *columns[3:])
+
+    assert pay.tolist() == [record['pay'] for record in calculator.daily_records]
+    assert travel_charge.tolist() == [calculator.travel_charge_agorot(day, start, end)
+                                      for day, start, end, *_ in shifts]
+    assert int(pay.sum()) == calculator.total_pay_agorot()
+
+
+
+def test_shekel_amounts_stay_shekels():
+    calculator = SalaryCalculator()
+    calculator.add_work_day(date(2024, 5, 10), time(16, 0), time(23, 30), False, False, True, False, False, False)
+    assert calculator.total_pay() == calculator.total_pay_agorot() / 100
+    assert calculator.calculate_travel_charge(date(2024, 5, 10), time(16, 0), time(23, 30)) == \
+        calculator.travel_charge_agorot(date(2024, 5, 10), time(16, 0), time(23, 30)) / 100
@@ -0,0 +1,54 @@
+import numpy as np
+
+from session_store import SessionStore, employee_name
+from shift_flags import FLAG_CONTROL_ROOM, FLAG_HOLIDAY
+from shift_table import ShiftTable
+
+
+
+def _table():
+    return ShiftTable(['2024-05-01', '2024-05-02', '2024-05-03'], ['Guard'] * 3, [480, 480, 1320], [960, 960, 420])
+
+
+
+def test_marks_come_back_on_a_reloaded_table(tmp_path):
+    store = SessionStore(str(tmp_path / 'marks.sqlite3'))
+    shifts = _table()
+    shifts.set_flag(FLAG_CONTROL_ROOM, True, 0)
+    shifts.set_flag(FLAG_HOLIDAY, True, 2)
+    store.save_table_marks('dana', shifts, [0], FLAG_CONTROL_ROOM)
+    store.save_table_marks('dana', shifts, [1, 2], FLAG_HOLIDAY)
+    store.close()
+
+    # the same month in another order, from a new connection
+    store = SessionStore(str(tmp_path / 'marks.sqlite3'))
+    reloaded = ShiftTable(['2024-05-03', '2024-05-01', '2024-05-02'], ['Guard'] * 3, [1320, 480, 480], [420, 960, 960])
+    assert store.restore('dana', reloaded) == 3
+    assert reloaded.has_flag(FLAG_CONTROL_ROOM).tolist() == [False, True, False]
+    assert reloaded.has_flag(FLAG_HOLIDAY).tolist() == [True, False, False]
+    assert store.restore('noam', _table()) == 0
+
+
+
+def test_unmarked_bits_are_kept():
+    store = SessionStore(':memory:')
+    store.save_marks('dana', ['2024-05-01'], [480], [FLAG_CONTROL_ROOM], FLAG_CONTROL_ROOM)
+    store.save_marks('dana', ['2024-05-01'], [480], [0], FLAG_HOLIDAY)
+    marks = store.load_marks('dana')
+    assert marks['flags'].tolist() == [FLAG_CONTROL_ROOM]
+    assert marks['mask'].tolist() == [FLAG_CONTROL_ROOM | FLAG_HOLIDAY]
+
+
+
+def test_move_mark_leaves_nothing_behind():
+    store = SessionStore(':memory:')
+    store.save_marks('dana', ['2024-05-01'], [480], [FLAG_CONTROL_ROOM], FLAG_CONTROL_ROOM)
+    store.move_mark('dana', '2024-05-01', 480, np.datetime64('2024-05-02'), 540)
+    marks = store.load_marks('dana')
+    assert marks['day'].astype('datetime64[D]').tolist() == [np.datetime64('2024-05-02').item()]
+    assert marks['start_minute'].tolist() == [540]
+
+
+
+def test_employee_name():
+    assert employee_name('/exports/May/dana levi.xlsx') == 'dana levi'
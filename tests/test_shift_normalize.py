@@ -0,0 +1,49 @@
+from datetime import date, datetime, time
+
+import numpy as np
+import pytest
+
+from shift_normalize import NO_MINUTE, normalize_columns, normalize_dates, normalize_times, VALID, MISSING, INVALID
+
+
+
+def test_blank_pandas_cells_are_missing():
+    pd = pytest.importorskip('pandas')
+    days, entry, exit_, problems = normalize_columns(
+        [pd.NaT, datetime(2024, 5, 2), '2024-05-03', float('nan')],
+        [time(8, 0), pd.NaT, '08:00', time(8, 0)],
+        [time(16, 0), time(16, 0), float('nan'), time(16, 0)],
+    )
+    assert problems == ['missing date', 'missing entry time', 'missing exit time', 'missing date']
+    assert np.isnat(days[0])
+    assert days[1] == np.datetime64('2024-05-02') and days[2] == np.datetime64('2024-05-03')
+    assert entry.tolist() == [480, NO_MINUTE, 480, 480]
+    assert exit_.tolist() == [960, 960, NO_MINUTE, 960]
+
+
+
+def test_missing_and_invalid_cells_get_a_reason():
+    days, entry, exit_, problems = normalize_columns(
+        [date(2024, 5, 1), None, '2024-02-30', '  ', 45413],
+        ['08:00', '25:00', '8:00:59', '08:00', 1 / 3],
+        ['16:00', '16:00', None, 'soon', 0.75],
+    )
+    assert problems == [
+        None,
+        "missing date; invalid entry time '25:00'",
+        "invalid date '2024-02-30'; missing exit time",
+        "missing date; invalid exit time 'soon'",
+        None,
+    ]
+    assert days[0] == np.datetime64('2024-05-01')
+    assert days[4] == np.datetime64('2024-05-01')  # Excel serial
+    assert entry.tolist() == [480, NO_MINUTE, 480, 480, 480]
+    assert exit_.tolist() == [960, 960, NO_MINUTE, NO_MINUTE, 1080]
+
+
+
+def test_status_per_cell():
+    _, status = normalize_times([None, '', '07:30', 'x', 1.5, float('nan')])
+    assert status.tolist() == [MISSING, MISSING, VALID, INVALID, INVALID, MISSING]
+    _, status = normalize_dates([60, 61, '2024-1-01', datetime(2024, 1, 1, 23, 59)])
+    assert status.tolist() == [INVALID, VALID, INVALID, VALID]
@@ -0,0 +1,48 @@
+import numpy as np
+
+from shift_validation import DUPLICATE, OVERLAP, SHORT_GAP, find_shift_issues, merge_plan
+
+DATES = ['2024-05-01', '2024-05-01', '2024-05-01', '2024-05-02', '2024-05-03', '2024-05-03', '2024-05-03']
+STARTS = [480, 480, 900, 1320, 360, 600, 600]
+ENDS = [960, 960, 1020, 420, 540, 720, 720]
+
+
+
+def test_finds_duplicates_overlaps_and_short_gaps():
+    # rows 0 and 1 are the same shift, 2 overlaps them, 3 crosses midnight into 4,
+    # and the last two belong to different employees
+    employees = [0, 0, 0, 0, 0, 0, 1]
+    issues = find_shift_issues(DATES, STARTS, ENDS, employees)
+    assert issues.kind.tolist() == [DUPLICATE, OVERLAP, OVERLAP]
+    assert issues.row.tolist() == [1, 2, 4]
+    assert issues.other_row.tolist() == [0, 1, 3]
+    assert issues.minutes.tolist() == [480, 60, 60]
+
+
+
+def test_short_gap():
+    issues = find_shift_issues(['2024-05-01', '2024-05-01'], [480, 980], [960, 1200])
+    assert issues.kind.tolist() == [SHORT_GAP]
+    assert issues.row.tolist() == [1] and issues.minutes.tolist() == [20]
+
+
+
+def test_merge_plan_joins_overlapping_runs():
+    rows, start, end = merge_plan(DATES, STARTS, ENDS, [0, 0, 0, 0, 0, 0, 1])
+    assert rows.tolist() == [0, 3, 5, 6]
+    assert start.tolist() == [480, 1320, 600, 600]
+    assert end.tolist() == [1020, 540, 720, 720]
+
+
+
+def test_merge_plan_leaves_touching_shifts_apart():
+    rows, start, end = merge_plan(['2024-05-01', '2024-05-01'], [480, 960], [960, 1200])
+    assert rows.tolist() == [0, 1]
+    assert end.tolist() == [960, 1200]
+
+
+
+def test_empty():
+    issues = find_shift_issues(np.zeros(0, dtype='datetime64[D]'), [], [])
+    assert len(issues.kind) == 0
+    assert len(merge_plan(np.zeros(0, dtype='datetime64[D]'), [], [])[0]) == 0
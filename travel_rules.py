@@ -0,0 +1,119 @@
+"""
+Travel charge rules, loaded from travel_rules.json.
+
+Each rule can limit the shift's weekday, its start time (start_from <= start < start_before)
+and its end time (end <= end_until). The first rule that matches a shift sets its charge,
+and shifts no rule matches get the default.
+The rules are compiled once into arrays, so a whole batch of shifts is evaluated with a
+few vectorized comparisons instead of parsing times on every call.
+"""
+import calendar
+import json
+import os
+
+import numpy as np
+
+from resources import resource_path
+from units import parse_clock, to_agorot
+
+RULES_FILE_NAME = 'travel_rules.json'
+
+WEEKDAYS = {name.lower(): index for index, name in enumerate(calendar.day_name)}
+
+
+
+def _parse_minutes(text, default):
+    return default if text is None else parse_clock(text)
+
+
+
+def default_rules_path():
+    """
+    $SALARY_CALC_TRAVEL_RULES if set, otherwise the travel_rules.json shipped with the app.
+    """
+    return os.environ.get('SALARY_CALC_TRAVEL_RULES') or resource_path(RULES_FILE_NAME)
+
+
+
+class TravelRules:
+    """
+    Compiled travel charge rules: one array entry per rule, in priority order.
+    Amounts are kept in agorot.
+    """
+
+    def __init__(self, default, rules):
+        self.default = to_agorot(default)
+        self.descriptions = [rule.get('description', '') for rule in rules]
+
+        # bit n set = the rule applies on weekday n (0 = Monday), no weekdays = every day
+        self.weekday_bits = np.array([
+            sum(1 << WEEKDAYS[day.lower()] for day in rule['weekdays']) if rule.get('weekdays') else 0b1111111
+            for rule in rules
+        ], dtype=np.int64)
+        self.start_from = np.array([_parse_minutes(rule.get('start_from'), 0) for rule in rules], dtype=np.int64)
+        self.start_before = np.array([_parse_minutes(rule.get('start_before'), 1440) for rule in rules], dtype=np.int64)
+        self.end_until = np.array([_parse_minutes(rule.get('end_until'), 1440) for rule in rules], dtype=np.int64)
+        self.amount = np.array([to_agorot(rule['amount']) for rule in rules], dtype=np.int64)
+
+
+
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load and compile rules from a JSON file.
+        """
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        try:
+            return cls(config['default'], config.get('rules', []))
+        except (KeyError, ValueError, AttributeError) as e:
+            raise ValueError(f"Invalid travel rules in {path}: {e}") from e
+
+
+
+
+    def charges(self, weekdays, start_minutes, end_minutes):
+        """
+        Travel charge of each shift in agorot. Takes arrays of weekdays (0 = Monday) and start and
+        end minutes since midnight, the end as written on the shift (not moved past midnight).
+        """
+        weekdays = np.asarray(weekdays, dtype=np.int64)
+        start = np.asarray(start_minutes, dtype=np.int64)
+        end = np.asarray(end_minutes, dtype=np.int64)
+        if not len(self.amount):
+            return np.full(len(weekdays), self.default, dtype=np.int64)
+
+        # rules x shifts
+        matches = (
+            ((self.weekday_bits[:, None] >> weekdays) & 1).astype(bool)
+            & (start >= self.start_from[:, None])
+            & (start < self.start_before[:, None])
+            & (end <= self.end_until[:, None])
+        )
+        first_match = matches.argmax(axis=0)
+        return np.where(matches.any(axis=0), self.amount[first_match], self.default)
+
+
+
+
+    def charge(self, weekday, start_minute, end_minute):
+        """
+        Travel charge of a single shift in agorot.
+        """
+        return int(self.charges([weekday], [start_minute], [end_minute])[0])
+
+
+
+_default_rules = None
+
+
+
+def default_travel_rules():
+    """
+    The rules from default_rules_path(), loaded and compiled on first use.
+    """
+    global _default_rules
+    if _default_rules is None:
+        _default_rules = TravelRules.from_file(default_rules_path())
+    return _default_rules
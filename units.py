@@ -0,0 +1,53 @@
+"""
+The units the calculation works in, and the conversions to and from them.
+
+Times are integer minutes since the midnight of the shift date and money is
+integer agorot, so the calculation never allocates datetime objects and totals
+add up exactly. Strings and shekel floats only appear at the edges: reading
+files and config, the entry fields, and what gets displayed or written out.
+"""
+
+MINUTES_PER_DAY = 1440
+AGOROT_PER_SHEKEL = 100
+
+
+
+def parse_clock(text):
+    """
+    Convert an HH:MM or HH:MM:SS string to minutes since midnight, dropping the seconds.
+    Raises ValueError if it isn't a valid time of day.
+    """
+    parts = str(text).split(':')
+    if len(parts) not in (2, 3) or not all(part.isdigit() and len(part) <= 2 for part in parts):
+        raise ValueError(f"Invalid time '{text}', expected HH:MM")
+    hours, minutes = int(parts[0]), int(parts[1])
+    seconds = int(parts[2]) if len(parts) == 3 else 0
+    if hours > 23 or minutes > 59 or seconds > 59:
+        raise ValueError(f"Invalid time '{text}', expected HH:MM")
+    return hours * 60 + minutes
+
+
+
+def format_minutes(minutes):
+    """
+    Format minutes since midnight as HH:MM.
+    """
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+
+def to_agorot(shekels):
+    """
+    Convert a shekel amount from a config file to whole agorot.
+    """
+    return int(round(float(shekels) * AGOROT_PER_SHEKEL))
+
+
+
+def format_agorot(agorot):
+    """
+    Format agorot as shekels with two decimals, without going through a float.
+    """
+    sign = '-' if agorot < 0 else ''
+    shekels, agorot = divmod(abs(int(agorot)), AGOROT_PER_SHEKEL)
+    return f"{sign}{shekels}.{agorot:02d}"
@@ -0,0 +1,217 @@
+"""
+A Treeview that only creates items for the rows that are on screen.
+The rows live in the caller's model and are fetched through row_getter as the
+user scrolls, so loading and scrolling cost the same for 100 rows or 100,000.
+"""
+from tkinter import ttk
+
+import perf_trace
+
+
+
+class VirtualTreeview(ttk.Treeview):
+    """
+    Drop-in Treeview for flat tables. Rows are addressed by their index in the model
+    instead of by item id, and the selected row is kept in selected_index even while
+    it is scrolled out of view.
+    Generates <<RowSelect>> when the user selects a different row.
+    """
+
+    def __init__(self, master=None, row_getter=None, **kw):
+        # the scrollbar follows the model, not the handful of items that exist
+        self._yscrollcommand = kw.pop('yscrollcommand', None)
+        super().__init__(master, **kw)
+        self.row_getter = row_getter or (lambda index: ())
+        self.row_count = 0
+        self.offset = 0
+        self.selected_index = None
+
+        self.bind('<<TreeviewSelect>>', self._on_treeview_select, add='+')
+        self.bind('<MouseWheel>', self._on_mouse_wheel, add='+')
+        self.bind('<Button-4>', lambda event: self._scroll_by(-3), add='+')  # Linux wheel up
+        self.bind('<Button-5>', lambda event: self._scroll_by(3), add='+')  # Linux wheel down
+        self.bind('<Up>', lambda event: self._move_selection(-1))
+        self.bind('<Down>', lambda event: self._move_selection(1))
+        self.bind('<Prior>', lambda event: self._move_selection(-self.visible_rows()))
+        self.bind('<Next>', lambda event: self._move_selection(self.visible_rows()))
+
+
+
+
+    def visible_rows(self):
+        """
+        How many rows fit in the widget, which is also how many items are created.
+        """
+        return max(1, int(self.cget('height')))
+
+
+
+
+    def set_row_count(self, row_count):
+        """
+        Tell the widget how many rows the model has now and redraw.
+        """
+        self.row_count = row_count
+        if self.selected_index is not None and self.selected_index >= row_count:
+            self.selected_index = None
+        self.offset = self._clamp_offset(self.offset)
+        self.refresh()
+
+
+
+
+    def refresh(self):
+        """
+        Fill the visible items from the model.
+        """
+        with perf_trace.span('treeview'):
+            shown = max(0, min(self.visible_rows(), self.row_count - self.offset))
+            items = list(self.get_children())
+            if len(items) > shown:
+                self.delete(*items[shown:])
+                items = items[:shown]
+            while len(items) < shown:
+                items.append(self.insert('', 'end'))
+
+            for position, item in enumerate(items):
+                self.item(item, values=self.row_getter(self.offset + position))
+        perf_trace.count('treeview.rows', shown)
+
+        self._sync_selection()
+        if self._yscrollcommand:
+            self._yscrollcommand(*self.yview())
+
+
+
+
+    def refresh_row(self, index):
+        """
+        Redraw a single row after it changed in the model, if it's on screen.
+        """
+        position = index - self.offset
+        items = self.get_children()
+        if 0 <= position < len(items):
+            self.item(items[position], values=self.row_getter(index))
+
+
+
+
+    def row_index(self, item):
+        """
+        The model index of a visible item.
+        """
+        return self.offset + self.index(item)
+
+
+
+
+    def select_row(self, index):
+        """
+        Select a row by model index, scrolling it into view.
+        """
+        if not 0 <= index < self.row_count:
+            return
+        self.see_row(index)
+        if index != self.selected_index:
+            self.selected_index = index
+            self._sync_selection()
+            self.event_generate('<<RowSelect>>')
+
+
+
+
+    def see_row(self, index):
+        """
+        Scroll just enough for a row to be visible.
+        """
+        if index < self.offset:
+            self._scroll_to(index)
+        elif index >= self.offset + self.visible_rows():
+            self._scroll_to(index - self.visible_rows() + 1)
+
+
+
+
+    def yview(self, *args):
+        """
+        Scrollbar protocol: with no arguments return the visible fraction, otherwise
+        handle 'moveto fraction' and 'scroll n units|pages'.
+        """
+        if not args:
+            if not self.row_count:
+                return 0.0, 1.0
+            return self.offset / self.row_count, min(1.0, (self.offset + self.visible_rows()) / self.row_count)
+
+        if args[0] == 'moveto':
+            self._scroll_to(round(float(args[1]) * self.row_count))
+        elif args[0] == 'scroll':
+            step = self.visible_rows() if args[2] == 'pages' else 1
+            self._scroll_by(int(args[1]) * step)
+
+
+
+
+    def _clamp_offset(self, offset):
+        return max(0, min(offset, self.row_count - self.visible_rows()))
+
+
+
+
+    def _scroll_to(self, offset):
+        offset = self._clamp_offset(offset)
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+
+
+
+    def _scroll_by(self, rows):
+        self._scroll_to(self.offset + rows)
+        return 'break'
+
+
+
+
+    def _on_mouse_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS reports small deltas
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_by(-3 * notches)
+
+
+
+
+    def _move_selection(self, rows):
+        if not self.row_count:
+            return 'break'
+        current = self.offset if self.selected_index is None else self.selected_index
+        self.select_row(max(0, min(current + rows, self.row_count - 1)))
+        return 'break'
+
+
+
+
+    def _sync_selection(self):
+        """
+        Highlight the item that shows the selected row, if it's on screen.
+        """
+        items = self.get_children()
+        position = None if self.selected_index is None else self.selected_index - self.offset
+        if position is not None and 0 <= position < len(items):
+            if self.selection() != (items[position],):
+                self.selection_set(items[position])
+        elif self.selection():
+            self.selection_remove(*self.selection())
+
+
+
+
+    def _on_treeview_select(self, event):
+        selection = self.selection()
+        if not selection:
+            # the selected row was scrolled out of view, it stays selected in the model
+            return
+        index = self.row_index(selection[0])
+        if index != self.selected_index:
+            self.selected_index = index
+            self.event_generate('<<RowSelect>>')